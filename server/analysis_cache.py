@@ -0,0 +1,98 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Optional, Dict
+
+# Default size bound for the cache: plenty for tens of thousands of analyses
+DEFAULT_MAX_BYTES = int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+class AnalysisCache:
+    """Persistent SQLite cache for VideoAnalysis results with LRU eviction.
+
+    Entries are keyed by (video digest, prompt hash, model name, temperature) so
+    changing the prompt or model invalidates old results automatically. The
+    total stored payload is kept under max_bytes by evicting the least
+    recently used entries.
+    """
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS analyses (
+                key TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS analyses_last_access ON analyses(last_access);
+        """)
+        self._db.commit()
+
+    @staticmethod
+    def make_key(digest: str, prompt_sha: str, model: str, temperature: float) -> str:
+        return hashlib.sha256(f"{digest}|{prompt_sha}|{model}|{temperature!r}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute("SELECT payload FROM analyses WHERE key = ?", (key,)).fetchone()
+            if not row:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._db.execute("UPDATE analyses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+        return json.loads(row[0])
+
+    def put(self, key: str, digest: str, analysis: Dict) -> None:
+        payload = json.dumps(analysis, separators=(",", ":"))
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO analyses (key, digest, payload, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, digest, payload, len(payload), now, now)
+            )
+            self._evict()
+            self._db.commit()
+
+    def _evict(self) -> None:
+        """Drops least recently used entries until the cache fits in max_bytes."""
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM analyses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._db.execute("SELECT key, size FROM analyses ORDER BY last_access ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM analyses WHERE key = ?", (key,))
+            total -= size
+            self.evictions += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM analyses").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "bytes": total,
+            "maxBytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hitRate": self.hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,69 @@
+"""Benchmark: BM25 course index build and query time vs. catalogue size.
+
+Builds catalogues of 10 to 500 courses by copying the course-content files
+under new IDs, then times ContentRegistry loading, CourseIndex construction,
+and catalogue-wide and single-course queries.
+
+    python benchmarks/bench_course_search.py
+"""
+import os
+import sys
+import time
+import glob
+import shutil
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from content_registry import ContentRegistry
+from course_search import CourseIndex
+
+CONTENT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "public", "course-content")
+QUERIES = [
+    "how to develop self-awareness",
+    "journaling and meditation to reduce stress",
+    "ask for feedback from colleagues",
+    "strengths and weaknesses SWOT analysis",
+    "emotional intelligence manage emotions"
+]
+
+
+def build_catalogue(directory: str, courses: int) -> None:
+    sources = sorted(glob.glob(os.path.join(CONTENT_DIR, "self-awareness-*.txt")))
+    for i in range(courses):
+        shutil.copy(sources[i % len(sources)], os.path.join(directory, f"self-awareness-{i + 1:02d}.txt"))
+
+
+def median_us(fn, repeat: int = 200) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1e6)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    print(f"{'courses':>8} {'chunks':>8} {'load ms':>9} {'index ms':>9} {'query us':>9} {'course us':>10}")
+    for courses in (10, 50, 100, 500):
+        with tempfile.TemporaryDirectory() as directory:
+            build_catalogue(directory, courses)
+            registry = ContentRegistry(directory)
+            started = time.perf_counter()
+            registry.refresh()
+            load_ms = (time.perf_counter() - started) * 1000
+
+            snapshot = registry.snapshot()
+            chunks = [chunk for record in snapshot.courses.values() for chunk in record.chunks]
+            started = time.perf_counter()
+            index = CourseIndex(chunks, version=snapshot.version)
+            index_ms = (time.perf_counter() - started) * 1000
+
+            query_us = statistics.median(median_us(lambda: index.search(q, k=5)) for q in QUERIES)
+            course_us = statistics.median(median_us(lambda: index.search(q, k=5, course_id="02")) for q in QUERIES)
+            print(f"{courses:>8} {len(chunks):>8} {load_ms:>9.1f} {index_ms:>9.1f} {query_us:>9.1f} {course_us:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
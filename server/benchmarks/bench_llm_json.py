@@ -0,0 +1,95 @@
+"""Benchmark: JSON extraction from malformed LLM responses, legacy chain vs. llm_json.
+
+Runs every response in llm_json_corpus.jsonl (fences, prose, '#' and '//'
+comments, '#' inside strings, trailing commas, truncation, Python literals,
+a pathological run of unmatched braces) through the parsing chain main.py
+used before llm_json, and through extract_json. A response counts as parsed
+when the result is an object holding a non-empty value under the expected
+key; anything else would have sent the caller to its text fallback.
+
+The corpus is synthetic: the responses were written by hand to reproduce
+failure modes seen in model output, not captured from production. Each
+failure mode appears about once, so the fallback rates printed here show
+which malformations each parser handles. They are not an estimate of the
+fallback rate on real traffic. Replace the corpus with logged responses to
+measure that.
+
+    python benchmarks/bench_llm_json.py
+"""
+import os
+import re
+import sys
+import json
+import time
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_json import JSONExtractionError, extract_json
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm_json_corpus.jsonl")
+
+
+def legacy_extract(text: str):
+    """Fence strip, then json.loads, then greedy regex, then '#' line stripping."""
+    text = text.strip().replace('```json', '').replace('```', '').strip()
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    match = re.search(r'\{[\s\S]*\}', text)
+    if match:
+        try:
+            return json.loads(match.group())
+        except json.JSONDecodeError:
+            pass
+    lines = [line[:line.find('#')] if '#' in line else line for line in text.split('\n')]
+    return json.loads(' '.join(line.strip() for line in lines if line.strip()))
+
+
+def parsed(extract, text: str, expect: str) -> bool:
+    try:
+        value = extract(text)
+    except (ValueError, JSONExtractionError):
+        return False
+    return isinstance(value, dict) and bool(value.get(expect))
+
+
+def median_us(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1e6)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    with open(CORPUS) as f:
+        cases = [json.loads(line) for line in f]
+
+    print(f"{'case':<32} {'bytes':>7} {'legacy':>7} {'new':>5} {'legacy us':>10} {'new us':>8}")
+    totals = {"legacy": [0, 0.0], "new": [0, 0.0]}
+    for case in cases:
+        text, expect = case["text"], case["expect"]
+        row = []
+        for name, extract in (("legacy", legacy_extract), ("new", extract_json)):
+            ok = parsed(extract, text, expect)
+            us = median_us(lambda: parsed(extract, text, expect), repeat=20)
+            totals[name][0] += ok
+            totals[name][1] += us
+            row.append((ok, us))
+        (legacy_ok, legacy_us), (new_ok, new_us) = row
+        print(f"{case['name']:<32} {len(text):>7} {'ok' if legacy_ok else '-':>7} {'ok' if new_ok else '-':>5} "
+              f"{legacy_us:>10.1f} {new_us:>8.1f}")
+
+    size = sum(len(case["text"]) for case in cases)
+    print()
+    print("Synthetic corpus: one case per failure mode, not a sample of real responses")
+    for name, (ok, us) in totals.items():
+        print(f"{name:<7} parsed {ok}/{len(cases)}, fallback rate {1 - ok / len(cases):.0%}, "
+              f"{size / us:.1f} MB/s over the corpus")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Benchmark: MP4 header probing time vs. file size.
+
+Builds synthetic MP4 files (ftyp + sparse mdat + moov at the end, the layout
+most phone recordings use) from 10 MB to 2 GB and times probe_mp4 on each.
+Parse time should stay flat because only header atoms are read.
+
+    python benchmarks/bench_mp4_probe.py
+"""
+import os
+import sys
+import time
+import struct
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mp4_probe import probe_mp4
+
+
+def box(box_type: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+
+def full_box(box_type: bytes, payload: bytes, version: int = 0) -> bytes:
+    return box(box_type, struct.pack(">I", version << 24) + payload)
+
+
+def track(handler: bytes, sample_entry: bytes, duration: int, width: int = 0, height: int = 0) -> bytes:
+    tkhd = full_box(b"tkhd", b"\0" * 72 + struct.pack(">II", width << 16, height << 16))
+    mdhd = full_box(b"mdhd", struct.pack(">IIII", 0, 0, 1000, duration) + b"\0" * 4)
+    hdlr = full_box(b"hdlr", b"\0" * 4 + handler + b"\0" * 12 + b"handler\0")
+    stsd = full_box(b"stsd", struct.pack(">I", 1) + sample_entry)
+    stbl = box(b"stbl", stsd)
+    minf = box(b"minf", stbl)
+    mdia = box(b"mdia", mdhd + hdlr + minf)
+    return box(b"trak", tkhd + mdia)
+
+
+def build_moov(duration_seconds: int, width: int, height: int) -> bytes:
+    duration = duration_seconds * 1000
+    mvhd = full_box(b"mvhd", struct.pack(">IIII", 0, 0, 1000, duration) + b"\0" * 80)
+    avc1 = box(b"avc1", b"\0" * 6 + struct.pack(">H", 1) + b"\0" * 16 + struct.pack(">HH", width, height) + b"\0" * 50)
+    mp4a = box(b"mp4a", b"\0" * 6 + struct.pack(">H", 1) + b"\0" * 8 + struct.pack(">HHHHI", 2, 16, 0, 0, 48000 << 16))
+    return box(b"moov", mvhd + track(b"vide", avc1, duration, width, height) + track(b"soun", mp4a, duration))
+
+
+def write_sample(path: str, size: int) -> None:
+    ftyp = box(b"ftyp", b"isom" + struct.pack(">I", 512) + b"isomiso2avc1mp41")
+    moov = build_moov(180, 1280, 720)
+    mdat_size = size - len(ftyp) - len(moov)
+    with open(path, "wb") as f:
+        f.write(ftyp)
+        # 64-bit mdat header; the payload is left sparse so large files are cheap to create
+        f.write(struct.pack(">I4sQ", 1, b"mdat", mdat_size))
+        f.seek(mdat_size - 16, os.SEEK_CUR)
+        f.write(moov)
+
+
+def main() -> None:
+    sizes = [10 * 1024 ** 2, 100 * 1024 ** 2, 1024 ** 3, 2 * 1024 ** 3]
+    iterations = 200
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'file size':>12}  {'per probe':>12}")
+        for size in sizes:
+            path = os.path.join(tmp, f"sample-{size}.mp4")
+            write_sample(path, size)
+            info = probe_mp4(path)
+            assert info["duration"] == 180 and info["height"] == 720 and info["hasAudio"], info
+            start = time.perf_counter()
+            for _ in range(iterations):
+                probe_mp4(path)
+            elapsed = (time.perf_counter() - start) / iterations
+            print(f"{size / 1024 ** 2:>9.0f} MB  {elapsed * 1e6:>9.1f} us")
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Benchmark: per-page trim cost of the old trim_prompt vs. the Tokenizer service.
+
+Builds scraped-page-sized texts (20 KB to 2 MB) from the course content and
+trims each to the 25,000-token page limit used in process_serp_result,
+timing the old implementation (get_encoding and a full encode per call),
+Tokenizer.trim on a new page and on a repeated one, and trim_many over a
+batch of five pages as one search returns. Every Tokenizer result is
+checked against the old one.
+
+    python benchmarks/bench_tokenizer.py
+"""
+import os
+import sys
+import glob
+import time
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tiktoken import get_encoding
+
+from tokenizer import Tokenizer, TOKENIZER_ENCODING
+
+CONTENT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "public", "course-content")
+PAGE_TOKENS = 25_000
+PAGE_SIZES = (20_000, 200_000, 2_000_000)
+
+
+def legacy_trim(prompt: str, context_size: int) -> str:
+    encoding = get_encoding(TOKENIZER_ENCODING)
+    tokens = encoding.encode(prompt)
+    if len(tokens) <= context_size:
+        return prompt
+    return encoding.decode(tokens[:context_size])
+
+
+def make_pages(size: int, count: int):
+    text = "\n\n".join(open(path, encoding="utf-8").read() for path in sorted(glob.glob(os.path.join(CONTENT_DIR, "*.txt"))))
+    base = (text * (size // len(text) + 1))[:size]
+    # Distinct pages, so the count cache cannot answer for them
+    return [f"Page {i}\n{base}" for i in range(count)]
+
+
+def median_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    print(f"{'page KB':>8} {'legacy ms':>10} {'trim ms':>8} {'cached ms':>10} {'5 pages legacy':>15} {'trim_many':>10}")
+    for size in PAGE_SIZES:
+        repeat = 5 if size >= 1_000_000 else 20
+        pages = make_pages(size, 5 * repeat + 1)
+        tokenizer = Tokenizer()
+        for page in pages[:3]:
+            assert tokenizer.trim(page, PAGE_TOKENS) == legacy_trim(page, PAGE_TOKENS)
+
+        fresh = iter(pages)
+        legacy_ms = median_ms(lambda: legacy_trim(next(fresh), PAGE_TOKENS), repeat)
+        fresh = iter(pages)
+        trim_ms = median_ms(lambda: tokenizer.trim(next(fresh), PAGE_TOKENS), repeat)
+        short = pages[0][:PAGE_TOKENS]  # Under the limit, so its count is cached
+        tokenizer.trim(short, PAGE_TOKENS)
+        cached_ms = median_ms(lambda: tokenizer.trim(short, PAGE_TOKENS), repeat)
+
+        batches = iter(range(0, len(pages) - 5, 5))
+        batch_legacy_ms = median_ms(lambda: [legacy_trim(p, PAGE_TOKENS) for p in pages[next(batches):][:5]], repeat)
+        tokenizer = Tokenizer()
+        batches = iter(range(0, len(pages) - 5, 5))
+        batch_ms = median_ms(lambda: tokenizer.trim_many(pages[next(batches):][:5], PAGE_TOKENS), repeat)
+        tokenizer.shutdown()
+        print(f"{size // 1000:>8} {legacy_ms:>10.1f} {trim_ms:>8.1f} {cached_ms:>10.2f} {batch_legacy_ms:>15.1f} {batch_ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
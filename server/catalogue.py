@@ -0,0 +1,113 @@
+import json
+import base64
+import bisect
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, List, Tuple, Iterable
+
+# Number of distinct paginated responses kept per catalogue version
+CATALOGUE_PAGE_CACHE_SIZE = 256
+
+
+class CursorError(ValueError):
+    pass
+
+
+def strong_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def encode_cursor(course_id: str) -> str:
+    return base64.urlsafe_b64encode(course_id.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        return base64.b64decode(cursor + "=" * (-len(cursor) % 4), altchars=b"-_", validate=True).decode("utf-8")
+    except (ValueError, UnicodeDecodeError):
+        raise CursorError("Invalid cursor")
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check (weak comparison, as RFC 9110 requires for this header)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+class CourseCatalogue:
+    """Immutable, indexed course catalogue with pre-serialized responses.
+
+    Courses are indexed by id and by category (case-insensitive), both kept
+    in id order so a cursor (the last id of the previous page) resumes with a
+    binary search. Every course, the full listing and each category listing
+    are serialized once with a strong ETag when the catalogue is built, and
+    paginated bodies are assembled from the per-course bytes and cached, so
+    reads return existing bytes instead of re-serializing.
+    """
+
+    def __init__(self, courses: Iterable[Dict]):
+        self._courses: Dict[str, Dict] = {course["id"]: course for course in courses}
+        self._ids: List[str] = sorted(self._courses)
+        self._by_category: Dict[str, List[str]] = {}
+        for course_id in self._ids:
+            self._by_category.setdefault(self._courses[course_id]["category"].lower(), []).append(course_id)
+
+        self._course_bytes: Dict[str, bytes] = {
+            course_id: json.dumps(course, separators=(",", ":")).encode("utf-8")
+            for course_id, course in self._courses.items()
+        }
+        self._course_responses: Dict[str, Tuple[bytes, str]] = {
+            course_id: (body, strong_etag(body)) for course_id, body in self._course_bytes.items()
+        }
+        self._listings: Dict[Optional[str], Tuple[bytes, str]] = {None: self._listing(self._ids, None)}
+        for category, ids in self._by_category.items():
+            self._listings[category] = self._listing(ids, None)
+        self.version = self._listings[None][1]
+        self._pages: "OrderedDict[Tuple, Tuple[bytes, str]]" = OrderedDict()
+        self._pages_lock = threading.Lock()
+
+    def _listing(self, ids: List[str], next_cursor: Optional[str]) -> Tuple[bytes, str]:
+        body = (b'{"courses":[' + b",".join(self._course_bytes[course_id] for course_id in ids)
+                + b'],"nextCursor":' + json.dumps(next_cursor).encode("utf-8") + b"}")
+        return body, strong_etag(body)
+
+    def ids(self) -> List[str]:
+        return list(self._ids)
+
+    def get(self, course_id: str) -> Optional[Dict]:
+        return self._courses.get(course_id)
+
+    def course_response(self, course_id: str) -> Optional[Tuple[bytes, str]]:
+        """(JSON body, ETag) for one course, or None if it does not exist."""
+        return self._course_responses.get(course_id)
+
+    def list_response(self, category: Optional[str] = None, cursor: Optional[str] = None,
+                      limit: Optional[int] = None) -> Tuple[bytes, str]:
+        """(JSON body, ETag) for a listing, optionally filtered by category and paginated."""
+        category = category.lower() if category else None
+        if cursor is None and limit is None:
+            return self._listings.get(category) or self._listing([], None)
+
+        key = (category, cursor, limit)
+        with self._pages_lock:
+            page = self._pages.get(key)
+            if page:
+                self._pages.move_to_end(key)
+                return page
+
+        ids = self._ids if category is None else self._by_category.get(category, [])
+        start = bisect.bisect_right(ids, decode_cursor(cursor)) if cursor else 0
+        end = len(ids) if limit is None else start + limit
+        page_ids = ids[start:end]
+        next_cursor = encode_cursor(page_ids[-1]) if page_ids and end < len(ids) else None
+        page = self._listing(page_ids, next_cursor)
+
+        with self._pages_lock:
+            self._pages[key] = page
+            if len(self._pages) > CATALOGUE_PAGE_CACHE_SIZE:
+                self._pages.popitem(last=False)
+        return page
@@ -0,0 +1,227 @@
+import os
+import re
+import time
+import asyncio
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Optional, Dict, List, Tuple, Mapping, Callable
+
+CONTENT_POLL_SECONDS = float(os.getenv("CONTENT_POLL_SECONDS", "5"))
+# Target size of a course chunk, in words
+CONTENT_CHUNK_WORDS = int(os.getenv("CONTENT_CHUNK_WORDS", "120"))
+
+COURSE_FILE_PATTERN = re.compile(r"^self-awareness-(\d+)\.txt$")
+ASSESSMENTS_FILE = "assessments.txt"
+SECTION_PATTERN = re.compile(r"^Video \d+$")
+TIMESTAMP_PATTERN = re.compile(r"^\[\d{2}:\d{2}:\d{2}\]\s*")
+
+
+@dataclass(frozen=True)
+class CourseChunk:
+    course_id: str
+    section: str
+    index: int
+    text: str
+
+
+@dataclass(frozen=True)
+class CourseRecord:
+    course_id: str
+    path: str
+    version: str
+    title: str
+    category: str
+    key_topics: Tuple[str, ...]
+    text: str
+    chunks: Tuple[CourseChunk, ...]
+
+    @property
+    def topic(self) -> str:
+        """Title and key topics combined for a short prompt."""
+        return f"{self.title}. Focus on: {', '.join(self.key_topics)}"
+
+
+@dataclass(frozen=True)
+class ContentSnapshot:
+    """Immutable view of all course content at one point in time."""
+    version: int = 0
+    courses: Mapping[str, CourseRecord] = field(default_factory=lambda: MappingProxyType({}))
+    assessment_scores: Mapping[str, int] = field(default_factory=lambda: MappingProxyType({}))
+    assessments_version: Optional[str] = None
+
+    def course(self, course_id: str) -> Optional[CourseRecord]:
+        return self.courses.get(course_id.zfill(2))
+
+
+def file_version(stat: os.stat_result) -> str:
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def chunk_section(course_id: str, section: str, lines: List[str], start: int) -> List[CourseChunk]:
+    chunks, current, words = [], [], 0
+    for line in lines:
+        line = TIMESTAMP_PATTERN.sub("", line).strip()
+        if not line:
+            continue
+        current.append(line)
+        words += len(line.split())
+        if words >= CONTENT_CHUNK_WORDS:
+            chunks.append(CourseChunk(course_id, section, start + len(chunks), " ".join(current)))
+            current, words = [], 0
+    if current:
+        chunks.append(CourseChunk(course_id, section, start + len(chunks), " ".join(current)))
+    return chunks
+
+
+def parse_course(course_id: str, path: str, version: str, content: str) -> CourseRecord:
+    title = ""
+    category = ""
+    key_topics = []
+    in_topics = False
+    sections: List[Tuple[str, List[str]]] = [("Overview", [])]
+
+    for line in content.split('\n'):
+        if line.startswith('Course:'):
+            title = line.replace('Course:', '').strip()
+        elif line.startswith('Category:'):
+            category = line.replace('Category:', '').strip()
+        elif line.startswith('Key Topics:'):
+            in_topics = True
+            continue
+        elif in_topics and line.startswith('-'):
+            key_topics.append(line.strip('- ').strip())
+            continue
+        elif in_topics and not line.strip():
+            in_topics = False
+
+        if SECTION_PATTERN.match(line.strip()):
+            sections.append((line.strip(), []))
+        else:
+            sections[-1][1].append(line)
+
+    chunks: List[CourseChunk] = []
+    for section, lines in sections:
+        chunks += chunk_section(course_id, section, lines, len(chunks))
+    return CourseRecord(course_id, path, version, title, category, tuple(key_topics), content, tuple(chunks))
+
+
+def parse_assessments(content: str) -> Dict[str, int]:
+    scores = {}
+    for line in content.split('\n')[2:]:  # Skip header lines
+        if ':' in line:
+            topic, score = line.split(':')
+            scores[topic.strip()] = int(score.strip().split('/')[0])
+    return scores
+
+
+class ContentRegistry:
+    """Course content parsed once and kept in memory as immutable snapshots.
+
+    A background task polls the content directory and reparses only files
+    whose mtime or size changed, then swaps in a new snapshot. Request
+    handlers call snapshot() and never touch the filesystem; a snapshot they
+    hold stays consistent even if a refresh happens meanwhile. Callbacks in
+    on_change run on the refresh thread after each new snapshot, so derived
+    data (such as a search index) is rebuilt off the request path.
+    """
+
+    def __init__(self, content_dir: str, interval: float = CONTENT_POLL_SECONDS):
+        self.content_dir = content_dir
+        self.interval = interval
+        self._snapshot = ContentSnapshot()
+        self._task: Optional[asyncio.Task] = None
+        self.on_change: List[Callable[[ContentSnapshot], None]] = []
+        self.metrics = {"refreshes": 0, "filesParsed": 0, "lastRefreshSeconds": 0.0, "lastChangeAt": None}
+
+    def snapshot(self) -> ContentSnapshot:
+        return self._snapshot
+
+    def refresh(self) -> bool:
+        """Rescans the content directory; returns True if a new snapshot was published."""
+        started = time.monotonic()
+        current = self._snapshot
+        courses: Dict[str, CourseRecord] = {}
+        scores = current.assessment_scores
+        assessments_version = None
+        changed = False
+
+        try:
+            entries = list(os.scandir(self.content_dir))
+        except FileNotFoundError:
+            entries = []
+        for entry in entries:
+            try:
+                if entry.name == ASSESSMENTS_FILE:
+                    assessments_version = file_version(entry.stat())
+                    if assessments_version != current.assessments_version:
+                        with open(entry.path, 'r', encoding='utf-8') as f:
+                            scores = MappingProxyType(parse_assessments(f.read()))
+                        self.metrics["filesParsed"] += 1
+                        changed = True
+                    continue
+                match = COURSE_FILE_PATTERN.match(entry.name)
+                if not match:
+                    continue
+                course_id = match.group(1).zfill(2)
+                version = file_version(entry.stat())
+                record = current.courses.get(course_id)
+                if record is None or record.version != version:
+                    with open(entry.path, 'r', encoding='utf-8') as f:
+                        record = parse_course(course_id, entry.path, version, f.read())
+                    self.metrics["filesParsed"] += 1
+                    changed = True
+                courses[course_id] = record
+            except (OSError, ValueError) as e:
+                print(f"Error reading course content {entry.name}: {str(e)}")
+
+        if assessments_version is None and current.assessments_version is not None:
+            scores = MappingProxyType({})
+            changed = True
+        if set(courses) != set(current.courses):
+            changed = True
+
+        self.metrics["refreshes"] += 1
+        self.metrics["lastRefreshSeconds"] = time.monotonic() - started
+        if not changed:
+            return False
+        self._snapshot = ContentSnapshot(
+            version=current.version + 1,
+            courses=MappingProxyType(courses),
+            assessment_scores=scores,
+            assessments_version=assessments_version
+        )
+        self.metrics["lastChangeAt"] = time.time()
+        for callback in self.on_change:
+            try:
+                callback(self._snapshot)
+            except Exception as e:
+                print(f"Error in course content change callback: {str(e)}")
+        return True
+
+    async def start(self) -> None:
+        await asyncio.to_thread(self.refresh)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                if await asyncio.to_thread(self.refresh):
+                    print(f"Course content reloaded (snapshot {self._snapshot.version})")
+            except Exception as e:
+                print(f"Error refreshing course content: {str(e)}")
+
+    def stats(self) -> Dict:
+        snapshot = self._snapshot
+        return {
+            **self.metrics,
+            "snapshotVersion": snapshot.version,
+            "courses": len(snapshot.courses),
+            "chunks": sum(len(record.chunks) for record in snapshot.courses.values())
+        }
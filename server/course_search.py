@@ -0,0 +1,135 @@
+import re
+import threading
+from collections import Counter
+from typing import Optional, Dict, List, Tuple, Sequence, Callable
+
+import numpy as np
+
+from content_registry import ContentRegistry, ContentSnapshot, CourseChunk
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have he her his how i if in into is it its me my not of on or our she
+so that the their them then there these they this to up us was we were what when where which who why will with
+you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in re.findall(r"[a-z0-9]+", text.lower()) if token not in STOPWORDS]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough model token count (about four characters per token)."""
+    return len(text) // 4 + 1
+
+
+class CourseIndex:
+    """BM25 inverted index over course chunks.
+
+    Postings are stored as NumPy arrays sorted by (term, chunk), with each
+    entry holding the term's precomputed BM25 contribution for that chunk, so
+    a query only adds up a few array slices. Chunks of one course are
+    contiguous, which lets a course-scoped query cut every posting list down
+    to that course's range with a binary search.
+    """
+
+    def __init__(self, chunks: Sequence[CourseChunk], k1: float = BM25_K1, b: float = BM25_B, version: int = 0):
+        self.chunks = sorted(chunks, key=lambda chunk: (chunk.course_id, chunk.index))
+        self.version = version
+        self._vocabulary: Dict[str, int] = {}
+        self._course_ranges: Dict[str, Tuple[int, int]] = {}
+
+        doc_ids: List[int] = []
+        term_ids: List[int] = []
+        frequencies: List[int] = []
+        for doc, chunk in enumerate(self.chunks):
+            start, _ = self._course_ranges.get(chunk.course_id, (doc, doc))
+            self._course_ranges[chunk.course_id] = (start, doc + 1)
+            for term, tf in Counter(tokenize(chunk.text)).items():
+                term_ids.append(self._vocabulary.setdefault(term, len(self._vocabulary)))
+                doc_ids.append(doc)
+                frequencies.append(tf)
+
+        docs = np.array(doc_ids, dtype=np.int64)
+        terms = np.array(term_ids, dtype=np.int64)
+        tf = np.array(frequencies, dtype=np.float64)
+        total = len(self.chunks)
+        lengths = np.bincount(docs, weights=tf, minlength=total)
+        average_length = lengths.mean() if total else 0.0
+        df = np.bincount(terms, minlength=len(self._vocabulary))
+        idf = np.log(1 + (total - df + 0.5) / (df + 0.5))
+        norm = k1 * (1 - b + b * lengths[docs] / average_length) if average_length else np.full(len(tf), k1)
+        weights = idf[terms] * tf * (k1 + 1) / (tf + norm)
+
+        order = np.lexsort((docs, terms))
+        self._docs = docs[order]
+        self._weights = weights[order]
+        self._offsets = np.concatenate(([0], np.cumsum(df)))
+
+    def search(self, query: str, k: int = 5, course_id: Optional[str] = None) -> List[Tuple[float, CourseChunk]]:
+        """Returns the top-k (score, chunk) pairs, optionally within one course."""
+        if course_id is not None:
+            lo, hi = self._course_ranges.get(course_id.zfill(2), (0, 0))
+        else:
+            lo, hi = 0, len(self.chunks)
+        if hi <= lo:
+            return []
+
+        scores = np.zeros(hi - lo)
+        for term in set(tokenize(query)):
+            term_id = self._vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self._offsets[term_id], self._offsets[term_id + 1]
+            docs = self._docs[start:end]
+            weights = self._weights[start:end]
+            if course_id is not None:
+                first, last = np.searchsorted(docs, (lo, hi))
+                docs, weights = docs[first:last], weights[first:last]
+            scores[docs - lo] += weights
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(scores[matched], -k)[-k:]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(float(scores[i]), self.chunks[lo + i]) for i in matched]
+
+    def passages(self, query: str, token_budget: int, course_id: Optional[str] = None, k: int = 8,
+                 count_tokens: Callable[[str], int] = estimate_tokens) -> List[CourseChunk]:
+        """Best-scoring chunks that fit in token_budget, in their order within the course."""
+        selected, used = [], 0
+        for _, chunk in self.search(query, k=k, course_id=course_id):
+            tokens = count_tokens(chunk.text)
+            if used + tokens > token_budget:
+                continue
+            selected.append(chunk)
+            used += tokens
+        return sorted(selected, key=lambda chunk: (chunk.course_id, chunk.index))
+
+
+class CourseSearch:
+    """Keeps a CourseIndex in step with the content registry's snapshots."""
+
+    def __init__(self, registry: ContentRegistry):
+        self.registry = registry
+        self._index = CourseIndex([], version=-1)
+        self._lock = threading.Lock()
+        registry.on_change.append(self.rebuild)
+
+    def rebuild(self, snapshot: ContentSnapshot) -> CourseIndex:
+        chunks = [chunk for record in snapshot.courses.values() for chunk in record.chunks]
+        index = CourseIndex(chunks, version=snapshot.version)
+        with self._lock:
+            if index.version > self._index.version:
+                self._index = index
+        return index
+
+    def index(self) -> CourseIndex:
+        snapshot = self.registry.snapshot()
+        index = self._index
+        if index.version != snapshot.version:
+            index = self.rebuild(snapshot)
+        return index
@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Optional, Dict, List, Sequence
+
+import numpy as np
+
+MSQ_RULES = ("all_or_nothing", "partial", "per_option")
+DEFAULT_MSQ_RULE = os.getenv("GRADING_MSQ_RULE", "partial")
+
+# Number of set bits for every 8-bit answer mask
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.int8)
+
+
+def answer_mask(selected: Sequence[int]) -> int:
+    """Bitmask with bit i set for every selected option index i."""
+    mask = 0
+    for index in selected:
+        if 0 <= index < 8:
+            mask |= 1 << index
+    return mask
+
+
+@dataclass(frozen=True)
+class AnswerKey:
+    """Vectorized answer key for one quiz or exam."""
+    masks: np.ndarray        # (questions,) uint8 mask of correct options
+    option_masks: np.ndarray  # (questions,) uint8 mask of options that exist
+    is_msq: np.ndarray       # (questions,) bool
+    topic_index: np.ndarray  # (questions,) index into topics
+    topics: List[str]
+
+    @classmethod
+    def from_questions(cls, questions: List[Dict]) -> "AnswerKey":
+        topics = list(dict.fromkeys(q.get("topic", "General") for q in questions))
+        return cls(
+            masks=np.array([answer_mask(q["correctAnswers"]) for q in questions], dtype=np.uint8),
+            option_masks=np.array([(1 << min(len(q["options"]), 8)) - 1 for q in questions], dtype=np.uint8),
+            is_msq=np.array([q["type"] == "MSQ" for q in questions], dtype=bool),
+            topic_index=np.array([topics.index(q.get("topic", "General")) for q in questions], dtype=np.int64),
+            topics=topics
+        )
+
+
+def grade_masks(key: AnswerKey, answers: np.ndarray, msq_rule: str = DEFAULT_MSQ_RULE) -> np.ndarray:
+    """Per-question credit in [0, 1] for an (attempts, questions) array of answer masks.
+
+    MCQs earn credit only for exactly the correct option. MSQs follow
+    msq_rule: "all_or_nothing" needs the exact set, "partial" scores
+    (correct picks - wrong picks) / correct options, floored at zero, and
+    "per_option" scores the fraction of options classified correctly.
+    """
+    if msq_rule not in MSQ_RULES:
+        raise ValueError(f"Unknown MSQ rule: {msq_rule}")
+    answers = np.asarray(answers, dtype=np.uint8) & key.option_masks
+    exact = (answers == key.masks).astype(np.float32)
+
+    if msq_rule == "all_or_nothing":
+        msq_credit = exact
+    elif msq_rule == "partial":
+        hits = POPCOUNT[answers & key.masks]
+        wrong = POPCOUNT[answers & ~key.masks]
+        expected = np.maximum(POPCOUNT[key.masks], 1)
+        msq_credit = np.clip((hits - wrong) / expected, 0, 1).astype(np.float32)
+    else:
+        options = POPCOUNT[key.option_masks]
+        msq_credit = ((options - POPCOUNT[answers ^ key.masks]) / options).astype(np.float32)
+    return np.where(key.is_msq, msq_credit, exact)
+
+
+def topic_accuracy(key: AnswerKey, credit: np.ndarray) -> Dict[str, float]:
+    """Mean credit per topic across every attempt in credit."""
+    totals = np.bincount(key.topic_index, weights=credit.sum(axis=0), minlength=len(key.topics))
+    counts = np.bincount(key.topic_index, minlength=len(key.topics)) * credit.shape[0]
+    return {topic: float(totals[i] / counts[i]) if counts[i] else 0.0 for i, topic in enumerate(key.topics)}
+
+
+def grade_cohort(questions: List[Dict], answers: np.ndarray, required_to_pass: Optional[float] = None,
+                 msq_rule: str = DEFAULT_MSQ_RULE) -> Dict:
+    """Grades a batch of attempts given as an (attempts, questions) array of answer masks."""
+    key = AnswerKey.from_questions(questions)
+    answers = np.atleast_2d(np.asarray(answers, dtype=np.int64))
+    if answers.shape[1] != len(questions):
+        raise ValueError(f"Expected {len(questions)} answers per attempt, got {answers.shape[1]}")
+    if answers.min(initial=0) < 0 or answers.max(initial=0) > 255:
+        raise ValueError("Answer masks must be between 0 and 255")
+
+    credit = grade_masks(key, answers, msq_rule)
+    scores = credit.sum(axis=1)
+    result = {
+        "attempts": int(credit.shape[0]),
+        "maxScore": len(questions),
+        "scores": scores.round(4).tolist(),
+        "meanScore": float(scores.mean()) if len(scores) else 0.0,
+        "questionAccuracy": credit.mean(axis=0).round(4).tolist() if len(scores) else [],
+        "topicAccuracy": topic_accuracy(key, credit) if len(scores) else {},
+        "msqRule": msq_rule
+    }
+    if required_to_pass is not None:
+        passed = scores >= required_to_pass
+        result["requiredToPass"] = required_to_pass
+        result["passed"] = passed.tolist()
+        result["passRate"] = float(passed.mean()) if len(scores) else 0.0
+    return result
+
+
+def grade_attempt(questions: List[Dict], selected: List[List[int]], required_to_pass: Optional[float] = None,
+                  msq_rule: str = DEFAULT_MSQ_RULE) -> Dict:
+    """Grades one attempt given as a list of selected option indices per question."""
+    key = AnswerKey.from_questions(questions)
+    if len(selected) != len(questions):
+        raise ValueError(f"Expected {len(questions)} answers, got {len(selected)}")
+    credit = grade_masks(key, np.array([[answer_mask(s) for s in selected]], dtype=np.uint8), msq_rule)[0]
+    score = float(credit.sum())
+    result = {
+        "score": round(score, 4),
+        "maxScore": len(questions),
+        "credit": credit.round(4).tolist(),
+        "topicAccuracy": topic_accuracy(key, credit[np.newaxis, :]),
+        "msqRule": msq_rule
+    }
+    if required_to_pass is not None:
+        result["requiredToPass"] = required_to_pass
+        result["passed"] = score >= required_to_pass
+    return result
+
+
+class AssessmentStore:
+    """SQLite record of every quiz and exam served, so answers can be graded server-side."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS assessments (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                difficulty TEXT NOT NULL,
+                required_to_pass REAL,
+                questions TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+        """)
+        self._db.commit()
+
+    def save(self, kind: str, difficulty: str, questions: List[Dict], required_to_pass: Optional[float] = None) -> str:
+        assessment_id = uuid.uuid4().hex
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO assessments (id, kind, difficulty, required_to_pass, questions, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (assessment_id, kind, difficulty, required_to_pass, json.dumps(questions), time.time())
+            )
+            self._db.commit()
+        return assessment_id
+
+    def get(self, assessment_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT kind, difficulty, required_to_pass, questions FROM assessments WHERE id = ?", (assessment_id,)
+            ).fetchone()
+        if not row:
+            return None
+        return {
+            "id": assessment_id,
+            "kind": row[0],
+            "difficulty": row[1],
+            "requiredToPass": row[2],
+            "questions": json.loads(row[3])
+        }
@@ -0,0 +1,215 @@
+import os
+import time
+import heapq
+import asyncio
+from contextlib import contextmanager
+from typing import Optional, Dict, List, Tuple, Set, Iterable, Callable
+
+from upload_store import UploadStore
+
+UPLOAD_MAX_AGE_HOURS = float(os.getenv("UPLOAD_MAX_AGE_HOURS", "24"))
+UPLOAD_QUOTA_BYTES = int(os.getenv("UPLOAD_QUOTA_BYTES", str(20 * 1024 * 1024 * 1024)))
+JANITOR_INTERVAL_SECONDS = float(os.getenv("JANITOR_INTERVAL_SECONDS", "60"))
+
+# Returns the blob paths referenced by persisted work that has not finished yet (e.g. queued jobs)
+PendingPaths = Callable[[], Iterable[str]]
+
+
+class UploadJanitor:
+    """Background task that enforces a max age and a total-bytes quota on uploads.
+
+    Uploads are kept in a min-heap ordered by creation time, rebuilt from the
+    store index at startup and updated as new uploads arrive, so a sweep only
+    looks at the oldest entries instead of scanning the upload directory.
+    Entries whose upload was already deleted through the API are skipped
+    lazily when they reach the top of the heap. Blobs that running work holds
+    (see hold()) or that pending_paths reports are kept and retried on a
+    later sweep.
+    """
+
+    def __init__(self, store: UploadStore, partial_dirs: List[str], max_age_hours: float = UPLOAD_MAX_AGE_HOURS,
+                 quota_bytes: int = UPLOAD_QUOTA_BYTES, interval: float = JANITOR_INTERVAL_SECONDS,
+                 pending_paths: Optional[PendingPaths] = None):
+        self.store = store
+        self.partial_dirs = partial_dirs
+        self.pending_paths = pending_paths
+        self.max_age_seconds = max_age_hours * 3600
+        self.quota_bytes = quota_bytes
+        self.interval = interval
+        self._heap: List[Tuple[float, str]] = []
+        self._held: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+        self.metrics = {
+            "bytesFreed": 0,
+            "uploadsEvicted": 0,
+            "blobsDeleted": 0,
+            "quotaEvictions": 0,
+            "inUseSkips": 0,
+            "legacyFilesDeleted": 0,
+            "lastEvictionLagSeconds": 0.0,
+            "maxEvictionLagSeconds": 0.0,
+            "lastSweepAt": None,
+            "lastSweepSeconds": 0.0,
+            "sweeps": 0
+        }
+
+    def rebuild(self) -> None:
+        self._heap = self.store.list_uploads()
+        heapq.heapify(self._heap)
+
+    def track(self, file_info: Dict) -> None:
+        """Registers a new upload; wakes the janitor if the quota may be exceeded."""
+        heapq.heappush(self._heap, (time.time(), file_info["id"]))
+        if not file_info.get("deduplicated"):
+            self._wake.set()
+
+    @contextmanager
+    def hold(self, paths: Iterable[str]):
+        """Keeps the blobs at paths from being evicted while the block runs."""
+        digests = [digest for digest in map(self.store.digest_for_path, paths) if digest]
+        for digest in digests:
+            self._held[digest] = self._held.get(digest, 0) + 1
+        try:
+            yield
+        finally:
+            for digest in digests:
+                self._held[digest] -= 1
+                if not self._held[digest]:
+                    del self._held[digest]
+
+    def _pending_digests(self) -> Set[str]:
+        if not self.pending_paths:
+            return set()
+        return {digest for digest in map(self.store.digest_for_path, self.pending_paths()) if digest}
+
+    async def start(self) -> None:
+        await asyncio.to_thread(self.rebuild)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"Error during cleanup: {str(e)}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def _evict(self, upload_id: str, record: Dict) -> int:
+        """Releases one upload off the event loop; returns the bytes freed."""
+        try:
+            removed = await asyncio.to_thread(self.store.release, upload_id)
+        except KeyError:
+            return 0
+        self.metrics["uploadsEvicted"] += 1
+        if removed:
+            self.metrics["blobsDeleted"] += 1
+            self.metrics["bytesFreed"] += record["size"]
+            print(f"Deleted old upload: {upload_id} ({record['size']} bytes)")
+            return record["size"]
+        return 0
+
+    def _remove_stale_partials(self, cutoff: float) -> int:
+        """Deletes abandoned partial uploads; these directories only hold in-flight files."""
+        freed = 0
+        for directory in self.partial_dirs:
+            for entry in os.scandir(directory):
+                try:
+                    if entry.name.endswith(".part"):
+                        stat = entry.stat()
+                        if stat.st_mtime < cutoff:
+                            os.remove(entry.path)
+                            freed += stat.st_size
+                    elif entry.name.endswith(".json"):
+                        # Session metadata is dropped once its data file is gone
+                        if not os.path.exists(entry.path[:-len(".json")] + ".part"):
+                            os.remove(entry.path)
+                except FileNotFoundError:
+                    continue
+        return freed
+
+    def _remove_legacy_files(self, cutoff: float) -> int:
+        """Deletes old files left at the top of the upload directory by the flat layout.
+
+        Only the store index and its SQLite journal files belong there now;
+        blobs, partial files and sessions live in subdirectories, which are
+        never touched here.
+        """
+        freed = 0
+        index_name = os.path.basename(self.store.index_path)
+        for entry in os.scandir(self.store.upload_dir):
+            if entry.name == index_name or entry.name.startswith(index_name + "-"):
+                continue
+            try:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+                if stat.st_mtime < cutoff:
+                    os.remove(entry.path)
+                    freed += stat.st_size
+                    self.metrics["legacyFilesDeleted"] += 1
+                    print(f"Deleted legacy upload: {entry.name} ({stat.st_size} bytes)")
+            except FileNotFoundError:
+                continue
+        return freed
+
+    async def sweep(self) -> None:
+        """Evicts oldest-first until nothing is too old and usage fits the quota."""
+        started = time.monotonic()
+        now = time.time()
+        cutoff = now - self.max_age_seconds
+        total = await asyncio.to_thread(self.store.total_bytes)
+        in_use = await asyncio.to_thread(self._pending_digests)
+        deferred = []
+
+        while self._heap:
+            created_at, upload_id = self._heap[0]
+            expired = created_at < cutoff
+            over_quota = total > self.quota_bytes
+            if not expired and not over_quota:
+                break
+            heapq.heappop(self._heap)
+            record = self.store.get(upload_id)
+            if not record:
+                continue
+            if record["digest"] in in_use or record["digest"] in self._held:
+                # Still needed by a queued job or a running analysis; look again next sweep
+                deferred.append((created_at, upload_id))
+                self.metrics["inUseSkips"] += 1
+                continue
+            freed = await self._evict(upload_id, record)
+            total -= freed
+            if expired:
+                lag = now - (created_at + self.max_age_seconds)
+                self.metrics["lastEvictionLagSeconds"] = lag
+                self.metrics["maxEvictionLagSeconds"] = max(self.metrics["maxEvictionLagSeconds"], lag)
+            elif freed:
+                self.metrics["quotaEvictions"] += 1
+        for entry in deferred:
+            heapq.heappush(self._heap, entry)
+
+        self.metrics["bytesFreed"] += await asyncio.to_thread(self._remove_stale_partials, cutoff)
+        self.metrics["bytesFreed"] += await asyncio.to_thread(self._remove_legacy_files, cutoff)
+        self.metrics["sweeps"] += 1
+        self.metrics["lastSweepAt"] = now
+        self.metrics["lastSweepSeconds"] = time.monotonic() - started
+
+    def stats(self) -> Dict:
+        return {
+            **self.metrics,
+            "trackedUploads": len(self._heap),
+            "heldBlobs": len(self._held),
+            "currentBytes": self.store.total_bytes(),
+            "quotaBytes": self.quota_bytes,
+            "maxAgeHours": self.max_age_seconds / 3600
+        }
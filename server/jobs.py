@@ -0,0 +1,235 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import asyncio
+import threading
+from typing import Optional, Dict, List, Callable, Awaitable, Any
+
+# Number of jobs processed at the same time and the maximum backlog size
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "4"))
+JOB_QUEUE_MAX = int(os.getenv("JOB_QUEUE_MAX", "5000"))
+# Finished jobs (and their results) are deleted this long after they finish; checked every prune interval
+JOB_RETENTION_HOURS = float(os.getenv("JOB_RETENTION_HOURS", "168"))
+JOB_PRUNE_INTERVAL_SECONDS = float(os.getenv("JOB_PRUNE_INTERVAL_SECONDS", "3600"))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED_STATES = (SUCCEEDED, FAILED)
+
+JobHandler = Callable[[Dict], Awaitable[Any]]
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class JobQueue:
+    """Persistent job queue processed by a bounded pool of asyncio workers.
+
+    Jobs are stored in SQLite so queued and interrupted work is picked up again
+    after a restart. Handlers are async functions registered per job kind; they
+    receive the job payload and return a JSON-serialisable result. Every state
+    change is published to subscribers for SSE streaming. Finished jobs are
+    deleted once they are older than the retention period.
+    """
+
+    def __init__(self, path: str, concurrency: int = JOB_CONCURRENCY, max_queued: int = JOB_QUEUE_MAX,
+                 retention_hours: float = JOB_RETENTION_HOURS, prune_interval: float = JOB_PRUNE_INTERVAL_SECONDS):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.concurrency = concurrency
+        self.max_queued = max_queued
+        self.retention_seconds = retention_hours * 3600
+        self.prune_interval = prune_interval
+        self.pruned = 0
+        self._handlers: Dict[str, JobHandler] = {}
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                state TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_state ON jobs(state, created_at);
+            CREATE INDEX IF NOT EXISTS jobs_updated ON jobs(updated_at);
+        """)
+        self._db.commit()
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        self._handlers[kind] = handler
+
+    async def start(self) -> None:
+        """Re-queues unfinished jobs from the database and starts the workers."""
+        self._queue = asyncio.Queue()
+        with self._lock:
+            # Jobs that were running when the process stopped are retried
+            self._db.execute("UPDATE jobs SET state = ? WHERE state = ?", (QUEUED, RUNNING))
+            self._db.commit()
+            rows = self._db.execute("SELECT id FROM jobs WHERE state = ? ORDER BY created_at", (QUEUED,)).fetchall()
+        for row in rows:
+            self._queue.put_nowait(row["id"])
+        if rows:
+            print(f"Restored {len(rows)} queued jobs")
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        self._workers.append(asyncio.create_task(self._prune_loop()))
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, kind: str, payload: Dict) -> Dict:
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if self._queue is None:
+            raise RuntimeError("Job queue is not running")
+        if self._queue.qsize() >= self.max_queued:
+            raise QueueFullError("Job queue is full, try again later")
+
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, kind, state, payload, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, QUEUED, json.dumps(payload), now, now)
+            )
+            self._db.commit()
+        self._queue.put_nowait(job_id)
+        job = self.get(job_id)
+        self._publish(job)
+        return job
+
+    def get(self, job_id: str, include_result: bool = False) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if not row:
+            return None
+        job = {
+            "id": row["id"],
+            "kind": row["kind"],
+            "state": row["state"],
+            "error": row["error"],
+            "attempts": row["attempts"],
+            "createdAt": row["created_at"],
+            "updatedAt": row["updated_at"]
+        }
+        if include_result:
+            job["result"] = json.loads(row["result"]) if row["result"] else None
+        if row["state"] == QUEUED:
+            job["queuePosition"] = self._position(row["created_at"])
+        return job
+
+    def _position(self, created_at: float) -> int:
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE state = ? AND created_at < ?", (QUEUED, created_at)
+            ).fetchone()[0]
+
+    def pending_payloads(self, kind: str) -> List[Dict]:
+        """Payloads of the queued and running jobs of one kind."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT payload FROM jobs WHERE kind = ? AND state IN (?, ?)", (kind, QUEUED, RUNNING)
+            ).fetchall()
+        return [json.loads(row["payload"]) for row in rows]
+
+    def prune(self) -> int:
+        """Deletes finished jobs older than the retention period; returns how many."""
+        cutoff = time.time() - self.retention_seconds
+        with self._lock:
+            deleted = self._db.execute(
+                f"DELETE FROM jobs WHERE state IN ({','.join('?' * len(FINISHED_STATES))}) AND updated_at < ?",
+                (*FINISHED_STATES, cutoff)
+            ).rowcount
+            self._db.commit()
+        self.pruned += deleted
+        return deleted
+
+    async def _prune_loop(self) -> None:
+        while True:
+            try:
+                deleted = await asyncio.to_thread(self.prune)
+                if deleted:
+                    print(f"Pruned {deleted} finished jobs")
+            except Exception as e:
+                print(f"Error pruning jobs: {str(e)}")
+            await asyncio.sleep(self.prune_interval)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            rows = self._db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        counts = {state: count for state, count in rows}
+        counts["concurrency"] = self.concurrency
+        counts["retentionHours"] = self.retention_seconds / 3600
+        counts["pruned"] = self.pruned
+        return counts
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, []).append(queue)
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue) -> None:
+        subscribers = self._subscribers.get(job_id, [])
+        if queue in subscribers:
+            subscribers.remove(queue)
+        if not subscribers:
+            self._subscribers.pop(job_id, None)
+
+    def _publish(self, job: Dict) -> None:
+        for queue in self._subscribers.get(job["id"], []):
+            queue.put_nowait(job)
+
+    def _load(self, job_id: str) -> Optional[sqlite3.Row]:
+        with self._lock:
+            return self._db.execute("SELECT kind, state, payload FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+    def _set_state(self, job_id: str, state: str, result: Any = None, error: Optional[str] = None) -> Dict:
+        """Stores a state change and returns the updated job; runs in a worker thread."""
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET state = ?, result = ?, error = ?, updated_at = ?, "
+                "attempts = attempts + ? WHERE id = ?",
+                (state, json.dumps(result) if result is not None else None, error, time.time(),
+                 1 if state == RUNNING else 0, job_id)
+            )
+            self._db.commit()
+        return self.get(job_id)
+
+    async def _transition(self, job_id: str, state: str, result: Any = None, error: Optional[str] = None) -> None:
+        # SQLite is written off the event loop; subscriber queues are only touched on it
+        self._publish(await asyncio.to_thread(self._set_state, job_id, state, result, error))
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                row = await asyncio.to_thread(self._load, job_id)
+                if not row or row["state"] != QUEUED:
+                    continue
+                await self._transition(job_id, RUNNING)
+                try:
+                    result = await self._handlers[row["kind"]](json.loads(row["payload"]))
+                    await self._transition(job_id, SUCCEEDED, result=result)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"Job {job_id} failed: {str(e)}")
+                    await self._transition(job_id, FAILED, error=str(e))
+            finally:
+                self._queue.task_done()
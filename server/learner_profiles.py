@@ -0,0 +1,94 @@
+import os
+import time
+import sqlite3
+import threading
+from typing import Optional, Dict, List, Tuple, Mapping, Sequence
+
+import numpy as np
+
+# Competency scores are out of this many marks
+MAX_TOPIC_SCORE = 30
+
+
+def allocate_largest_remainder_batch(weights: np.ndarray, total: int) -> np.ndarray:
+    """Row-wise largest-remainder allocation of total across columns.
+
+    weights is a (rows, columns) array; every row of the result sums exactly
+    to total. Rows whose weights sum to zero are split evenly. Ties in the
+    remainder go to the earlier column, matching allocate_largest_remainder.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    weight_sum = weights.sum(axis=1, keepdims=True)
+    weights = np.where(weight_sum > 0, weights, 1.0)
+    weight_sum = weights.sum(axis=1, keepdims=True)
+    quotas = weights / weight_sum * total
+    counts = quotas.astype(np.int64)
+    deficit = total - counts.sum(axis=1, keepdims=True)
+    order = np.argsort(-(quotas - counts), axis=1, kind="stable")
+    ranks = np.argsort(order, axis=1)  # Position of each column in remainder order
+    return counts + (ranks < deficit)
+
+
+def topic_weights_batch(scores: np.ndarray, max_score: int = MAX_TOPIC_SCORE) -> np.ndarray:
+    """Row-wise percentages where lower scores get higher weights, as in AssessmentScores.get_topic_weights."""
+    weights = max_score - np.asarray(scores, dtype=np.float64)
+    weight_sum = weights.sum(axis=1, keepdims=True)
+    return np.divide(weights, weight_sum, out=np.zeros_like(weights), where=weight_sum != 0) * 100
+
+
+class LearnerProfiles:
+    """Per-learner competency scores in SQLite, with a global fallback per topic."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS learner_scores (
+                learner_id TEXT NOT NULL,
+                topic TEXT NOT NULL,
+                score INTEGER NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (learner_id, topic)
+            );
+        """)
+        self._db.commit()
+
+    def get(self, learner_id: str) -> Optional[Dict[str, int]]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT topic, score FROM learner_scores WHERE learner_id = ?", (learner_id,)
+            ).fetchall()
+        return {topic: score for topic, score in rows} if rows else None
+
+    def many(self, learner_ids: Sequence[str]) -> Dict[str, Dict[str, int]]:
+        profiles: Dict[str, Dict[str, int]] = {}
+        with self._lock:
+            # Stay below SQLite's bound-parameter limit
+            for start in range(0, len(learner_ids), 500):
+                batch = learner_ids[start:start + 500]
+                rows = self._db.execute(
+                    f"SELECT learner_id, topic, score FROM learner_scores WHERE learner_id IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchall()
+                for learner_id, topic, score in rows:
+                    profiles.setdefault(learner_id, {})[topic] = score
+        return profiles
+
+    def put(self, learner_id: str, scores: Mapping[str, int]) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO learner_scores (learner_id, topic, score, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(learner_id, topic) DO UPDATE SET score = excluded.score, updated_at = excluded.updated_at",
+                [(learner_id, topic, int(score), now) for topic, score in scores.items()]
+            )
+            self._db.commit()
+
+    def score_matrix(self, learner_ids: Sequence[str], defaults: Mapping[str, int]) -> Tuple[List[str], np.ndarray]:
+        """(topics, learners x topics score array), filling gaps from defaults."""
+        profiles = self.many(list(learner_ids))
+        topics = list(defaults)
+        matrix = np.array([[profiles.get(learner_id, {}).get(topic, defaults[topic]) for topic in topics]
+                           for learner_id in learner_ids], dtype=np.float64).reshape(len(learner_ids), len(topics))
+        return topics, matrix
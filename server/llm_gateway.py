@@ -0,0 +1,197 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, AsyncIterator
+
+from google import generativeai as genai
+
+DEFAULT_MODEL = "gemini-2.0-flash"
+
+# Threads dedicated to blocking SDK calls, separate from the default executor. 0 gives one
+# thread per call-site slot, so a call holding a slot never waits for a thread.
+LLM_MAX_WORKERS = int(os.getenv("LLM_MAX_WORKERS", "0"))
+LLM_DEFAULT_CONCURRENCY = int(os.getenv("LLM_DEFAULT_CONCURRENCY", "8"))
+LLM_DEFAULT_TIMEOUT = float(os.getenv("LLM_TIMEOUT_SECONDS", "120"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+
+# HTTP status codes that are worth retrying
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+def is_retryable(error: Exception) -> bool:
+    code = getattr(error, "code", None)
+    try:
+        return int(code) in RETRYABLE_STATUS
+    except (TypeError, ValueError):
+        return isinstance(error, (TimeoutError, ConnectionError))
+
+
+class LLMGateway:
+    """Single entry point for every Gemini call made by the server.
+
+    Blocking SDK calls run on a dedicated bounded thread pool so they never
+    stall the event loop or starve asyncio.to_thread users. Each call site has
+    its own semaphore, so a burst of one kind of request (e.g. video analysis)
+    cannot take every slot. Model objects are created once and reused, calls
+    time out, and 429/5xx errors are retried with exponential backoff.
+    """
+
+    def __init__(self, max_workers: int = LLM_MAX_WORKERS, limits: Optional[Dict[str, int]] = None,
+                 timeout: float = LLM_DEFAULT_TIMEOUT, max_retries: int = LLM_MAX_RETRIES):
+        self.limits = limits or {}
+        # Plus one default-sized share for call sites without a limit of their own
+        max_workers = max_workers or sum(self.limits.values()) + LLM_DEFAULT_CONCURRENCY
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._models: Dict[str, genai.GenerativeModel] = {}
+        self._models_lock = threading.Lock()
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def model(self, name: str = DEFAULT_MODEL) -> genai.GenerativeModel:
+        with self._models_lock:
+            if name not in self._models:
+                self._models[name] = genai.GenerativeModel(name)
+            return self._models[name]
+
+    def _semaphore(self, call_site: str) -> asyncio.Semaphore:
+        if call_site not in self._semaphores:
+            self._semaphores[call_site] = asyncio.Semaphore(self.limits.get(call_site, LLM_DEFAULT_CONCURRENCY))
+        return self._semaphores[call_site]
+
+    def _site_stats(self, call_site: str) -> Dict[str, Any]:
+        if call_site not in self._stats:
+            self._stats[call_site] = {"calls": 0, "inFlight": 0, "retries": 0, "failures": 0, "timeouts": 0, "totalSeconds": 0.0}
+        return self._stats[call_site]
+
+    async def generate(self, call_site: str, contents: Any, generation_config: Optional[Dict] = None,
+                       model: str = DEFAULT_MODEL, timeout: Optional[float] = None):
+        """Runs model.generate_content for call_site and returns the SDK response."""
+        timeout = timeout or self.timeout
+        stats = self._site_stats(call_site)
+        gemini = self.model(model)
+        loop = asyncio.get_running_loop()
+
+        async with self._semaphore(call_site):
+            stats["calls"] += 1
+            stats["inFlight"] += 1
+            started = time.monotonic()
+            try:
+                for attempt in range(self.max_retries + 1):
+                    try:
+                        call = loop.run_in_executor(
+                            self.executor,
+                            lambda: gemini.generate_content(
+                                contents=contents,
+                                generation_config=generation_config,
+                                request_options={"timeout": timeout}
+                            )
+                        )
+                        return await asyncio.wait_for(call, timeout=timeout)
+                    except asyncio.TimeoutError:
+                        stats["timeouts"] += 1
+                        error = TimeoutError(f"{call_site} call timed out after {timeout:.0f}s")
+                    except Exception as e:
+                        if not is_retryable(e):
+                            stats["failures"] += 1
+                            raise
+                        error = e
+                    if attempt == self.max_retries:
+                        stats["failures"] += 1
+                        raise error
+                    stats["retries"] += 1
+                    delay = random.uniform(0, min(30.0, 2 ** attempt))
+                    print(f"LLM call {call_site} failed ({str(error)}), retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+            finally:
+                stats["inFlight"] -= 1
+                stats["totalSeconds"] += time.monotonic() - started
+
+    async def stream(self, call_site: str, contents: Any, generation_config: Optional[Dict] = None,
+                     model: str = DEFAULT_MODEL, timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """Runs a streaming generate_content call for call_site and yields text chunks.
+
+        The SDK iterator is drained on the gateway's executor and chunks are
+        handed to the event loop through a queue. timeout applies to the wait
+        for each chunk. A failed call is retried only if it failed before
+        producing any text, since the caller may already have used it.
+        """
+        timeout = timeout or self.timeout
+        stats = self._site_stats(call_site)
+        gemini = self.model(model)
+        loop = asyncio.get_running_loop()
+        cancelled = threading.Event()
+
+        def produce(queue: asyncio.Queue, cancelled: threading.Event) -> None:
+            def put(item):
+                try:
+                    loop.call_soon_threadsafe(queue.put_nowait, item)
+                except RuntimeError:
+                    cancelled.set()  # Event loop already closed
+            try:
+                response = gemini.generate_content(
+                    contents=contents,
+                    generation_config=generation_config,
+                    stream=True,
+                    request_options={"timeout": timeout}
+                )
+                for chunk in response:
+                    if cancelled.is_set():
+                        return
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        continue  # Chunk without text parts
+                    put(("chunk", text))
+                put(("done", None))
+            except Exception as e:
+                put(("error", e))
+
+        async with self._semaphore(call_site):
+            stats["calls"] += 1
+            stats["inFlight"] += 1
+            started = time.monotonic()
+            try:
+                for attempt in range(self.max_retries + 1):
+                    queue: asyncio.Queue = asyncio.Queue()
+                    cancelled = threading.Event()
+                    loop.run_in_executor(self.executor, produce, queue, cancelled)
+                    produced = False
+                    while True:
+                        try:
+                            kind, value = await asyncio.wait_for(queue.get(), timeout=timeout)
+                        except asyncio.TimeoutError:
+                            stats["timeouts"] += 1
+                            kind, value = "error", TimeoutError(f"{call_site} stream stalled for {timeout:.0f}s")
+                        if kind == "chunk":
+                            produced = True
+                            yield value
+                        elif kind == "done":
+                            return
+                        else:
+                            break
+                    cancelled.set()
+                    if produced or attempt == self.max_retries or not is_retryable(value):
+                        stats["failures"] += 1
+                        raise value
+                    stats["retries"] += 1
+                    delay = random.uniform(0, min(30.0, 2 ** attempt))
+                    print(f"LLM stream {call_site} failed ({str(value)}), retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+            finally:
+                cancelled.set()
+                stats["inFlight"] -= 1
+                stats["totalSeconds"] += time.monotonic() - started
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            site: {**values, "limit": self.limits.get(site, LLM_DEFAULT_CONCURRENCY)}
+            for site, values in self._stats.items()
+        }
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,217 @@
+import re
+import json
+from typing import Optional, List, Type, TypeVar, Any
+
+from pydantic import BaseModel
+
+Model = TypeVar("Model", bound=BaseModel)
+
+# How many opening brackets to try as the start of the JSON value
+MAX_START_CANDIDATES = 4
+PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+# Run of characters the scanner copies through unchanged
+PLAIN = re.compile(r'[^"#/{}\[\],TFN]+')
+# Rest of a string after its opening quote, up to and including the closing quote
+STRING_BODY = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+
+
+class JSONExtractionError(ValueError):
+    pass
+
+
+def _scan(text: str, start: int) -> str:
+    """Copies the JSON value starting at text[start], repairing it on the way.
+
+    Single linear pass that tracks strings and a bracket stack; string bodies
+    and runs of plain characters are copied with one regex match each.
+    Outside strings it drops '#', '//' and '/* */' comments and trailing
+    commas before a closing bracket, and turns Python's True, False and None
+    into JSON literals. If the text ends before the value is closed, the
+    output is cut back to the last complete element and the open brackets
+    are closed.
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    # Output length after the last complete element; every bracket is one, so the stack needs no copy
+    safe_length = 0
+    i, n = start, len(text)
+
+    while i < n:
+        char = text[i]
+        if char == '"':
+            match = STRING_BODY.match(text, i + 1)
+            end = match.end() if match else n
+            out.append(text[i:end])
+            i = end
+            continue
+        if char == "#" or (char == "/" and text.startswith("//", i)):
+            end = text.find("\n", i)
+            i = n if end == -1 else end
+            continue
+        if char == "/" and text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            i = n if end == -1 else end + 2
+            continue
+        plain = PLAIN.match(text, i)
+        if plain:
+            out.append(plain.group())
+            i = plain.end()
+            continue
+        if char in "TFN":
+            literal = next((word for word in PYTHON_LITERALS if text.startswith(word, i)), None)
+            if literal:
+                out.append(PYTHON_LITERALS[literal])
+                i += len(literal)
+                continue
+
+        if char in "{[":
+            stack.append("}" if char == "{" else "]")
+            out.append(char)
+            safe_length = len(out)
+        elif char in "}]":
+            # Drop a trailing comma before the closing bracket
+            j = len(out) - 1
+            while j >= 0 and out[j].isspace():
+                j -= 1
+            if j >= 0 and out[j] == ",":
+                del out[j]
+            if not stack or stack[-1] != char:
+                raise JSONExtractionError(f"Unbalanced '{char}' at offset {i}")
+            stack.pop()
+            out.append(char)
+            if not stack:
+                return "".join(out)
+            safe_length = len(out)
+        else:
+            if char == ",":
+                safe_length = len(out)
+            out.append(char)
+        i += 1
+
+    if not stack:
+        raise JSONExtractionError("No JSON value found")
+    # Truncated: keep complete elements only and close what is still open
+    out = out[:safe_length]
+    while out and (out[-1].isspace() or out[-1] == ","):
+        out.pop()
+    return "".join(out) + "".join(reversed(stack))
+
+
+def extract_json(text: str) -> Any:
+    """Finds, repairs and parses the outermost JSON object or array in a model response.
+
+    Well-formed output (bare or inside a code fence) goes straight to
+    json.loads; only responses that fail that are scanned and repaired.
+    """
+    start = next((i for i, char in enumerate(text) if char in "{["), -1)
+    if start != -1:
+        end = text.rfind("}" if text[start] == "{" else "]")
+        try:
+            return json.loads(text[start:end + 1], strict=False)
+        except (json.JSONDecodeError, RecursionError):
+            pass
+
+    starts = []
+    for i, char in enumerate(text):
+        if char in "{[":
+            starts.append(i)
+            if len(starts) == MAX_START_CANDIDATES:
+                break
+    last_error: Optional[Exception] = None
+    for start in starts:
+        try:
+            return json.loads(_scan(text, start), strict=False)
+        except (JSONExtractionError, json.JSONDecodeError, RecursionError) as e:
+            last_error = e
+    raise JSONExtractionError(f"Could not extract JSON: {last_error or 'no object or array in response'}")
+
+
+def parse_model(text: str, model: Type[Model]) -> Model:
+    """Extracts the JSON value from a model response and validates it into model."""
+    return model.parse_obj(extract_json(text))
+
+
+class ArrayItemParser:
+    """Incremental parser that yields each object of the first JSON array in a stream.
+
+    feed() takes text as it arrives from the model and returns the objects
+    that became complete, so a caller can use item N while item N+1 is still
+    being generated. Strings (with escapes) are tracked so brackets inside
+    them are ignored, and '#' or '//' comments outside strings are skipped.
+    An array that closes without holding any object (e.g. "[5]" in prose
+    before the JSON) does not count as the first array.
+    Each complete object goes through extract_json, so the same repairs
+    apply; objects that still do not parse are counted and dropped.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.array_depth: Optional[int] = None
+        self.array_closed = False
+        self.in_string = False
+        self.escape = False
+        self.in_comment = False
+        self.capturing = False
+        self.captured = 0
+        self.item: List[str] = []
+        self.invalid = 0
+
+    def _is_item_level(self) -> bool:
+        return self.array_depth is not None and not self.array_closed and self.depth == self.array_depth + 1
+
+    def feed(self, text: str) -> List[dict]:
+        items = []
+        for char in text:
+            if self.in_comment:
+                self.in_comment = char != "\n"
+                continue
+            if self.in_string:
+                if self.capturing:
+                    self.item.append(char)
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                continue
+
+            if char in "#/":
+                # Neither is valid JSON outside a string; treat both as line comments
+                self.in_comment = True
+                continue
+            if char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+                if char == "[" and self.array_depth is None:
+                    self.array_depth = self.depth
+                elif char == "{" and self._is_item_level():
+                    self.capturing = True
+                    self.captured += 1
+                    self.item = []
+            elif char in "}]":
+                if char == "}" and self.capturing and self._is_item_level():
+                    self.item.append(char)
+                    items += self._complete("".join(self.item))
+                    self.capturing = False
+                    self.depth -= 1
+                    continue
+                if char == "]" and self.depth == self.array_depth:
+                    if self.captured:
+                        self.array_closed = True  # Only the first array is read
+                    else:
+                        self.array_depth = None  # No objects in it, keep looking
+                self.depth -= 1
+
+            if self.capturing:
+                self.item.append(char)
+        return items
+
+    def _complete(self, text: str) -> List[dict]:
+        try:
+            value = extract_json(text)
+        except JSONExtractionError:
+            self.invalid += 1
+            return []
+        return [value] if isinstance(value, dict) else []
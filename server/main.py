@@ -1,19 +1,40 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Header, Response, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, Field
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
 import os
 from google import generativeai as genai
-from typing import Optional, List, Tuple, Dict, Literal, Any
+from typing import Optional, List, Tuple, Dict, Literal, Any, AsyncIterator
 import time
 from dotenv import load_dotenv
 import enum
 import json
 import asyncio
 import httpx
-from tiktoken import get_encoding
+import numpy as np
+from tokenizer import Tokenizer
 import datetime
+from contextlib import asynccontextmanager
 from firecrawl import FirecrawlApp
+from llm_gateway import LLMGateway
+from uploads import ResumableUploads, UploadError, stream_upload_to_store
+from upload_store import UploadStore, sha256_file
+from analysis_cache import AnalysisCache, prompt_hash
+from search_cache import SearchCache, search_key
+from research_documents import DocumentRegistry
+from janitor import UploadJanitor
+from mp4_probe import probe_mp4, ProbeError
+from remote_files import RemoteFileClient
+from question_pool import QuizPool
+from question_bank import QuestionBank
+from content_registry import ContentRegistry
+from course_search import CourseSearch
+from catalogue import CourseCatalogue, CursorError, etag_matches
+from llm_json import ArrayItemParser, JSONExtractionError, extract_json, parse_model
+from learner_profiles import LearnerProfiles, allocate_largest_remainder_batch, topic_weights_batch
+from grading import AssessmentStore, grade_attempt, grade_cohort, DEFAULT_MSQ_RULE
+from single_flight import SingleFlight
+from jobs import JobQueue, QueueFullError, FINISHED_STATES, SUCCEEDED, FAILED, JOB_CONCURRENCY
 
 # Load environment variables
 load_dotenv()
@@ -21,6 +42,31 @@ load_dotenv()
 # Configure genai
 genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 
+# Videos analyzed at once by one batch request; the timeout starts once a video has a batch slot
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_ITEM_TIMEOUT = float(os.getenv("BATCH_ITEM_TIMEOUT", "600"))
+# Every video runs one model call per analysis section (len(ANALYSIS_SECTIONS)), all at once
+ANALYSIS_SECTION_COUNT = 5
+
+# Shared gateway for every Gemini call, with per-call-site concurrency limits. By default video
+# analysis has a slot for every section of every video a batch and the job queue run at once, so
+# batch items do not spend their timeout waiting for the gateway.
+llm = LLMGateway(limits={
+    "video_analysis": int(os.getenv("LLM_LIMIT_VIDEO_ANALYSIS", str((BATCH_CONCURRENCY + JOB_CONCURRENCY) * ANALYSIS_SECTION_COUNT))),
+    "quiz": int(os.getenv("LLM_LIMIT_QUIZ", "8")),
+    "exam": int(os.getenv("LLM_LIMIT_EXAM", "8")),
+    "serp_queries": int(os.getenv("LLM_LIMIT_SERP_QUERIES", "4")),
+    "serp_learnings": int(os.getenv("LLM_LIMIT_SERP_LEARNINGS", "8")),
+    "final_report": int(os.getenv("LLM_LIMIT_FINAL_REPORT", "4")),
+    "feedback": int(os.getenv("LLM_LIMIT_FEEDBACK", "4"))
+})
+
+# Identical concurrent generations share one in-flight call. A fan-out above 1
+# spreads callers over that many distinct generations instead.
+single_flight = SingleFlight()
+QUIZ_FANOUT = int(os.getenv("QUIZ_FANOUT", "1"))
+EXAM_FANOUT = int(os.getenv("EXAM_FANOUT", "1"))
+
 # Initialize Firecrawl with configuration
 api_key = os.getenv("FIRECRAWL_API_KEY")
 if not api_key:
@@ -38,7 +84,36 @@ class AnalyzeRequest(BaseModel):
     filePath: str
 
 class DeleteFileRequest(BaseModel):
-    filePath: str
+    filePath: Optional[str] = None
+    uploadId: Optional[str] = None
+
+class BatchAnalyzeRequest(BaseModel):
+    items: List[str] = Field(..., min_length=1, max_length=500)  # Upload IDs or file paths
+    concurrency: Optional[int] = Field(None, ge=1, le=64)
+    itemTimeout: Optional[float] = Field(None, gt=0)
+
+class UploadInitRequest(BaseModel):
+    filename: str
+    size: int
+    contentType: str = "video/mp4"
+
+class GradeRequest(BaseModel):
+    assessmentId: str
+    answers: List[List[int]]  # Selected option indices, one list per question
+    msqRule: Optional[Literal["all_or_nothing", "partial", "per_option"]] = None
+    applyToScores: bool = False
+    learnerId: Optional[str] = None  # Profile updated when applyToScores is set
+
+class LearnerScoresRequest(BaseModel):
+    scores: Dict[str, int]
+
+class ExamAllocationRequest(BaseModel):
+    learnerIds: List[str] = Field(..., min_length=1, max_length=10000)
+
+class CohortGradeRequest(BaseModel):
+    assessmentId: str
+    attempts: List[List[int]] = Field(..., min_length=1)  # One answer bitmask per question (bit i = option i)
+    msqRule: Optional[Literal["all_or_nothing", "partial", "per_option"]] = None
 
 class Course(BaseModel):
     id: str
@@ -106,38 +181,63 @@ courses_db = [
     )
 ]
 
+# Indexed, pre-serialized view of courses_db served by the catalogue endpoints
+course_catalogue = CourseCatalogue(course.dict() for course in courses_db)
+
+# Parsed course content and assessment scores, refreshed in the background
+CONTENT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "public", "course-content")
+content_registry = ContentRegistry(CONTENT_DIR)
+course_search = CourseSearch(content_registry)
+tokenizer = Tokenizer()
+
+# Token budgets for course passages retrieved into prompts
+QUIZ_CONTEXT_TOKENS = int(os.getenv("QUIZ_CONTEXT_TOKENS", "1500"))
+RESEARCH_CONTEXT_TOKENS = int(os.getenv("RESEARCH_CONTEXT_TOKENS", "800"))
+
+# Longest gap between server-sent events on the deep research stream before a keep-alive comment
+DEEP_RESEARCH_HEARTBEAT_SECONDS = float(os.getenv("DEEP_RESEARCH_HEARTBEAT_SECONDS", "15"))
+
+DEFAULT_ASSESSMENT_SCORES = {
+    "Growth Mindset & Entrepreneurial Skills": 13,
+    "Problem Solving & Critical Thinking Skills": 15,
+    "Digital & Technological Skills": 27,
+    "Communication & People Skills": 21,
+    "Self Management Skills": 13
+}
+
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+learner_profiles = LearnerProfiles(os.path.join(CACHE_DIR, "learners.sqlite3"))
+assessment_store = AssessmentStore(os.path.join(CACHE_DIR, "assessments.sqlite3"))
+
+# How much one graded attempt moves the assessment scores
+ASSESSMENT_ACCURACY_WEIGHT = float(os.getenv("ASSESSMENT_ACCURACY_WEIGHT", "0.5"))
+
 # Add new class for assessment scores
 class AssessmentScores:
-    def __init__(self):
+    def __init__(self, learner_id: Optional[str] = None):
+        self.learner_id = learner_id
         self.scores = {}
         self.load_scores()
     
     def load_scores(self):
-        try:
-            # Get the absolute path to the assessments file
-            base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            assessments_file = os.path.join(base_dir, "public", "course-content", "assessments.txt")
-            
-            print(f"Looking for assessments file at: {assessments_file}")  # Debug log
-            
-            with open(assessments_file, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                for line in lines[2:]:  # Skip header lines
-                    if ':' in line:
-                        topic, score = line.split(':')
-                        score_value = int(score.strip().split('/')[0])
-                        self.scores[topic.strip()] = score_value
-        except Exception as e:
-            print(f"Error loading assessment scores: {str(e)}")
-            # Default scores if file can't be read
-            self.scores = {
-                "Growth Mindset & Entrepreneurial Skills": 13,
-                "Problem Solving & Critical Thinking Skills": 15,
-                "Digital & Technological Skills": 27,
-                "Communication & People Skills": 21,
-                "Self Management Skills": 13
-            }
-            print("Using default assessment scores:", self.scores)  # Debug log
+        # Scores come from the content registry snapshot; no file I/O here
+        self.scores = dict(content_registry.snapshot().assessment_scores or DEFAULT_ASSESSMENT_SCORES)
+        if self.learner_id:
+            # The learner's own profile overrides the global scores topic by topic; topics no longer
+            # assessed are ignored, as in learner_profiles.score_matrix
+            profile = learner_profiles.get(self.learner_id) or {}
+            self.scores.update({topic: score for topic, score in profile.items() if topic in self.scores})
+
+    def save(self):
+        if self.learner_id:
+            learner_profiles.put(self.learner_id, self.scores)
+
+    def apply_accuracy(self, accuracy: Dict[str, float], weight: float = ASSESSMENT_ACCURACY_WEIGHT) -> Dict[str, int]:
+        # Blend graded per-topic accuracy (0-1) into the scores (out of 30)
+        for topic, value in accuracy.items():
+            if topic in self.scores:
+                self.scores[topic] = round((1 - weight) * self.scores[topic] + weight * value * 30)
+        return self.scores
 
     def get_topic_weights(self):
         # Convert scores to weights (lower scores get higher weights)
@@ -151,24 +251,31 @@ class AssessmentScores:
             weights[topic] = weight
             total_weight += weight
         
-        # Normalize weights to percentages
+        # Normalize weights to percentages (all zero when every topic has the maximum score)
         for topic in weights:
-            weights[topic] = (weights[topic] / total_weight) * 100
+            weights[topic] = (weights[topic] / total_weight) * 100 if total_weight else 0.0
             
         return weights
 
 # Function to generate quiz questions based on difficulty
-def generate_quiz_questions(difficulty: str, course_id: str) -> List[QuizQuestion]:
-    if difficulty == "bronze":
-        # Return hardcoded questions for bronze level
-        return get_default_questions()
-    
+QUIZ_GENERATION_CONFIG = {
+    "temperature": 0.7,  # Lower temperature for more structured output
+    "top_p": 0.95,
+    "top_k": 100,
+    "max_output_tokens": 4096  # Ensure we get complete response
+}
+
+def quiz_prompt(difficulty: str, course_id: str) -> str:
     # Prepare the prompt based on difficulty
     difficulty_desc = "highly intermediate" if difficulty == "silver" else "extremely advanced"
     course_topic = get_course_topic(course_id)
+    course_material = get_course_passages(course_id, course_topic, QUIZ_CONTEXT_TOKENS)
     
     prompt = f"""Generate a quiz based on the following course content: {course_topic}
 
+Course material:
+{course_material}
+
 The quiz should be at {difficulty_desc} level and consist of 5 questions (4 MCQs and 1 MSQ).
 
 Use this JSON schema:
@@ -194,39 +301,51 @@ Requirements:
 6. Options should be clear, distinct, and relevant to the course material
 7. Time limit should be between 30-120 seconds per question
 8. Return ONLY valid JSON, no other text"""
+    return prompt
+
+def normalize_quiz_question(q: Dict, position: int) -> Optional[QuizQuestion]:
+    """Validates and repairs one generated quiz question; None if fields are missing."""
+    # Ensure required fields are present
+    if not all(key in q for key in ["type", "question", "options", "correctAnswers", "timeLimit"]):
+        return None
+        
+    # Add id if missing
+    if "id" not in q:
+        q["id"] = position + 1
+        
+    # Validate and fix correctAnswers
+    if q["type"] == "MCQ" and len(q["correctAnswers"]) != 1:
+        q["correctAnswers"] = [q["correctAnswers"][0] if q["correctAnswers"] else 0]
+    elif q["type"] == "MSQ" and not q["correctAnswers"]:
+        q["correctAnswers"] = [0, 1]  # Default to first two options if none provided
+        
+    # Ensure timeLimit is within bounds
+    q["timeLimit"] = max(30, min(120, q["timeLimit"]))
+    
+    return QuizQuestion(**q)
+
+async def generate_quiz_questions(difficulty: str, course_id: str) -> List[QuizQuestion]:
+    if difficulty == "bronze":
+        # Return hardcoded questions for bronze level
+        return get_default_questions()
 
     try:
-        model = genai.GenerativeModel('gemini-2.0-flash')
-        response = model.generate_content(
+        # Passage selection counts tokens, so the prompt is built off the event loop
+        prompt = await asyncio.to_thread(quiz_prompt, difficulty, course_id)
+        response = await llm.generate(
+            "quiz",
             contents=prompt,
-            generation_config={
-                "temperature": 0.7,  # Lower temperature for more structured output
-                "top_p": 0.95,
-                "top_k": 100,
-                "max_output_tokens": 4096  # Ensure we get complete response
-            }
+            generation_config=QUIZ_GENERATION_CONFIG
         )
         
         # Extract JSON from response
         try:
-            # Clean up the response text
-            response_text = response.text.strip()
-            # Remove any markdown code block markers if present
-            response_text = response_text.replace('```json', '').replace('```', '').strip()
-            
-            # Try to parse the response text directly
             try:
-                quiz_data = json.loads(response_text)
-            except json.JSONDecodeError:
-                # If direct parsing fails, try to find JSON within the text
-                import re
-                json_match = re.search(r'\{[\s\S]*\}', response_text)
-                if json_match:
-                    quiz_data = json.loads(json_match.group())
-                else:
-                    print("Could not find valid JSON in response:", response_text[:200])  # Print first 200 chars for debugging
-                    return get_default_questions()
-                    
+                quiz_data = extract_json(response.text)
+            except JSONExtractionError as e:
+                print(f"Could not find valid JSON in response: {e}", response.text[:200])  # Print first 200 chars for debugging
+                return get_default_questions()
+
             # Additional validation of quiz_data structure
             if not isinstance(quiz_data, dict):
                 print("Response is not a dictionary")
@@ -242,29 +361,15 @@ Requirements:
 
             questions = []
             for i, q in enumerate(quiz_data["questions"]):
-                # Ensure required fields are present
-                if not all(key in q for key in ["type", "question", "options", "correctAnswers", "timeLimit"]):
-                    continue
-                    
-                # Add id if missing
-                if "id" not in q:
-                    q["id"] = i + 1
-                    
-                # Validate and fix correctAnswers
-                if q["type"] == "MCQ" and len(q["correctAnswers"]) != 1:
-                    q["correctAnswers"] = [q["correctAnswers"][0] if q["correctAnswers"] else 0]
-                elif q["type"] == "MSQ" and not q["correctAnswers"]:
-                    q["correctAnswers"] = [0, 1]  # Default to first two options if none provided
-                    
-                # Ensure timeLimit is within bounds
-                q["timeLimit"] = max(30, min(120, q["timeLimit"]))
-                
-                questions.append(QuizQuestion(**q))
+                question = normalize_quiz_question(q, i)
+                if question:
+                    questions.append(question)
 
             if not questions:
                 print("No valid questions generated")
                 return get_default_questions()
 
+            await asyncio.to_thread(question_bank.add_many, [q.dict() for q in questions], difficulty, course_id)
             return questions
         except Exception as e:
             print(f"Error in quiz generation: {str(e)}")
@@ -273,45 +378,33 @@ Requirements:
         print(f"Error in quiz generation: {str(e)}")
         return get_default_questions()
 
+def course_content_version(course_id: str) -> str:
+    """Identifies the current version of a course content file by mtime and size."""
+    record = content_registry.snapshot().course(course_id)
+    return record.version if record else "missing"
+
 def get_course_topic(course_id: str) -> str:
-    try:
-        # Pad course_id with leading zero if needed
-        padded_id = course_id.zfill(2)
-        
-        # Get the absolute path to the content file
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        content_file = os.path.join(base_dir, "public", "course-content", f"self-awareness-{padded_id}.txt")
-        
-        if not os.path.exists(content_file):
-            print(f"Course content file not found: {content_file}")
-            return "self-awareness"  # Default fallback
-            
-        with open(content_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-            
-        # Extract course title and key topics
-        course_title = ""
-        key_topics = []
-        in_topics = False  # Initialize the flag
-        
-        for line in content.split('\n'):
-            if line.startswith('Course:'):
-                course_title = line.replace('Course:', '').strip()
-            elif line.startswith('Key Topics:'):
-                # Read the following lines until we hit an empty line or a line starting with -
-                in_topics = True
-                continue
-            elif in_topics and line.startswith('-'):
-                key_topics.append(line.strip('- ').strip())
-            elif in_topics and not line.strip():
-                break
-                
-        # Combine title and key topics for a rich prompt
-        topic = f"{course_title}. Focus on: {', '.join(key_topics)}"
-        return topic
-    except Exception as e:
-        print(f"Error reading course content: {str(e)}")
+    record = content_registry.snapshot().course(course_id)
+    if not record:
+        print(f"Course content not found for course {course_id}")
         return "self-awareness"  # Default fallback
+    # Combine title and key topics for a rich prompt
+    return record.topic
+
+def count_tokens(text: str) -> int:
+    return tokenizer.count(text)
+
+def get_course_passages(course_id: str, query: str, token_budget: int) -> str:
+    """Most relevant passages of a course for query, within token_budget."""
+    chunks = course_search.index().passages(query, token_budget, course_id=course_id, count_tokens=count_tokens)
+    return "\n\n".join(f"[{chunk.section}] {chunk.text}" for chunk in chunks)
+
+async def generate_pool_quiz(difficulty: str, course_id: str) -> Optional[List[Dict]]:
+    """Generates a quiz set for the pool; fallback questions are never pooled."""
+    questions = await generate_quiz_questions(difficulty, course_id)
+    if questions == get_default_questions():
+        return None
+    return [question.dict() for question in questions]
 
 def get_default_questions() -> List[QuizQuestion]:
     return [
@@ -377,42 +470,25 @@ def get_default_questions() -> List[QuizQuestion]:
         )
     ]
 
-def generate_exam_questions(exam_type: str) -> Tuple[List[QuizQuestion], str]:
-    # Determine difficulty level and prompt based on exam type
-    if exam_type == "bronze-to-silver":
-        difficulty = "moderately difficult"
-    else:  # silver-to-gold
-        difficulty = "extremely difficult"
-
-    # Get topic weights based on assessment scores
-    assessment = AssessmentScores()
-    topic_weights = assessment.get_topic_weights()
-    
-    # Calculate number of questions per topic
-    total_questions = 25
-    questions_per_topic = {}
-    remaining_questions = total_questions
-    
-    for topic, weight in topic_weights.items():
-        num_questions = round((weight / 100) * total_questions)
-        questions_per_topic[topic] = num_questions
-        remaining_questions -= num_questions
-    
-    # Adjust for rounding errors
-    if remaining_questions != 0:
-        # Add/subtract remaining questions from the topic with lowest/highest score
-        topic = max(topic_weights.items(), key=lambda x: x[1])[0] if remaining_questions > 0 else min(topic_weights.items(), key=lambda x: x[1])[0]
-        questions_per_topic[topic] += remaining_questions
-
-    # Generate prompt with weighted topics
-    topics_section = "Topics to focus on (with question distribution):\n"
-    for topic, num_questions in questions_per_topic.items():
-        topics_section += f"- {topic}: {num_questions} questions\n"
+EXAM_TOTAL_QUESTIONS = 25
+EXAM_MSQ_COUNT = 7
+EXAM_SHARD_RETRIES = 2
+EXAM_GENERATION_CONFIG = {
+    "temperature": 0.3,
+    "top_p": 0.95,
+    "top_k": 200,
+    "max_output_tokens": 4096
+}
 
-    prompt = f"""Generate a {difficulty} promotion exam with 25 questions (18 MCQs and 7 MSQs).
-The questions should be distributed across topics based on assessment performance.
+def allocate_largest_remainder(weights: Dict[str, float], total: int) -> Dict[str, int]:
+    """Splits total across keys proportionally to weights, summing exactly to total."""
+    if not weights:
+        return {}
+    counts = allocate_largest_remainder_batch(np.array([list(weights.values())]), total)[0]
+    return {key: int(count) for key, count in zip(weights, counts)}
 
-{topics_section}
+def exam_shard_prompt(topic: str, num_mcq: int, num_msq: int, difficulty: str) -> str:
+    return f"""Generate {num_mcq + num_msq} {difficulty} promotion exam questions on the topic "{topic}" ({num_mcq} MCQs followed by {num_msq} MSQs).
 
 Use this JSON schema:
 {{
@@ -430,178 +506,245 @@ Use this JSON schema:
 }}
 
 Requirements:
-1. First 18 questions must be MCQ with exactly one correct answer
-2. Last 7 questions must be MSQ with multiple correct answers
+1. First {num_mcq} questions must be MCQ with exactly one correct answer
+2. Last {num_msq} questions must be MSQ with multiple correct answers
 3. Each question must have exactly 4 options
 4. Questions should be at {difficulty} level
 5. Time limit should be between 60-180 seconds per question
-6. Distribute questions according to the topic weights shown above
+6. Every question must be about "{topic}"
 7. Return ONLY valid JSON, no other text"""
 
-    try:
-        model = genai.GenerativeModel('gemini-2.0-flash')
-        response = model.generate_content(
-            contents=prompt,
-            generation_config={
-                "temperature": 0.3,
-                "top_p": 0.95,
-                "top_k": 200,
-                "max_output_tokens": 8192
-            }
-        )
-        
-        # Extract JSON from response
+def parse_exam_shard(response_text: str, topic: str, num_mcq: int, num_msq: int) -> Tuple[List[QuizQuestion], List[QuizQuestion]]:
+    """Validates one shard's questions and returns (mcqs, msqs), dropping invalid ones."""
+    quiz_data = extract_json(response_text)
+    if not isinstance(quiz_data, dict) or not isinstance(quiz_data.get("questions"), list):
+        raise ValueError("Invalid response structure")
+
+    mcqs, msqs = [], []
+    for i, q in enumerate(quiz_data["questions"]):
         try:
-            # Clean up the response text
-            response_text = response.text.strip()
-            
-            # Remove any markdown code block markers and comments
-            response_text = response_text.replace('```json', '').replace('```', '').strip()
-            lines = []
-            for line in response_text.split('\n'):
-                # Remove comments and whitespace
-                comment_idx = line.find('#')
-                if comment_idx != -1:
-                    line = line[:comment_idx]
-                line = line.strip()
-                if line:
-                    lines.append(line)
-            
-            # Join lines and ensure proper JSON formatting
-            response_text = ' '.join(lines)
-            
-            # Try to parse the cleaned JSON
-            try:
-                quiz_data = json.loads(response_text)
-            except json.JSONDecodeError as e:
-                print(f"Initial JSON parsing failed: {str(e)}")
-                # Try to find and extract JSON object using a simpler regex pattern
-                import re
-                # Look for content between outermost curly braces
-                json_match = re.search(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', response_text)
-                if json_match:
-                    try:
-                        potential_json = json_match.group()
-                        # Clean up any remaining formatting issues
-                        potential_json = potential_json.replace('\n', ' ').replace('\r', '')
-                        quiz_data = json.loads(potential_json)
-                    except json.JSONDecodeError:
-                        print("Failed to parse extracted JSON")
-                        return get_default_exam_questions(exam_type)
-                else:
-                    print("Could not find valid JSON in response")
-                    return get_default_exam_questions(exam_type)
+            question = normalize_exam_question(q, i, topic, num_mcq)
+            (mcqs if question.type == "MCQ" else msqs).append(question)
+        except Exception as e:
+            print(f"Error processing {topic} question {i + 1}: {str(e)}")
+    return mcqs[:num_mcq], msqs[:num_msq]
+
+def normalize_exam_question(q: Dict, position: int, topic: str, num_mcq: int) -> QuizQuestion:
+    """Validates and repairs one generated exam question; raises ValueError if unusable."""
+    # Ensure all required fields are present
+    if not all(field in q for field in ["type", "question", "options", "correctAnswers", "timeLimit"]):
+        raise ValueError("Missing required fields")
+
+    # Ensure options is a list of exactly 4 strings
+    if not isinstance(q["options"], list) or len(q["options"]) != 4:
+        raise ValueError("Invalid options")
+
+    # The position in the shard decides the type, as in the single-call exam
+    if position < num_mcq:
+        q["type"] = "MCQ"
+        q["correctAnswers"] = [q["correctAnswers"][0] if q["correctAnswers"] else 0]
+    else:
+        q["type"] = "MSQ"
+        if not q["correctAnswers"]:
+            q["correctAnswers"] = [0, 1]
+
+    q["id"] = 0  # Renumbered after merging
+    q["topic"] = topic
+    q["timeLimit"] = max(60, min(180, int(q["timeLimit"])))
+    return QuizQuestion(**q)
+
+async def generate_exam_shard(topic: str, num_mcq: int, num_msq: int, difficulty: str) -> Tuple[List[QuizQuestion], List[QuizQuestion]]:
+    """Generates one topic's questions, regenerating only what is still missing.
+
+    Valid questions from a partially bad response are kept; missing ones are
+    requested again, and anything still missing after the retries is filled
+    with placeholder questions for the topic.
+    """
+    mcqs: List[QuizQuestion] = []
+    msqs: List[QuizQuestion] = []
+    for attempt in range(EXAM_SHARD_RETRIES + 1):
+        missing_mcq = num_mcq - len(mcqs)
+        missing_msq = num_msq - len(msqs)
+        if missing_mcq <= 0 and missing_msq <= 0:
+            break
+        try:
+            response = await llm.generate(
+                "exam",
+                contents=exam_shard_prompt(topic, missing_mcq, missing_msq, difficulty),
+                generation_config=EXAM_GENERATION_CONFIG
+            )
+            new_mcqs, new_msqs = parse_exam_shard(response.text, topic, missing_mcq, missing_msq)
+            await asyncio.to_thread(question_bank.add_many, [q.dict() for q in new_mcqs + new_msqs], difficulty)
+            mcqs += new_mcqs
+            msqs += new_msqs
+        except Exception as e:
+            print(f"Error in exam shard {topic} (attempt {attempt + 1}): {str(e)}")
+
+    if len(mcqs) < num_mcq or len(msqs) < num_msq:
+        print(f"Exam shard {topic} incomplete, filling {num_mcq - len(mcqs)} MCQs and {num_msq - len(msqs)} MSQs with defaults")
+        mcqs += [default_exam_question("MCQ", topic, difficulty, len(mcqs) + i + 1) for i in range(num_mcq - len(mcqs))]
+        msqs += [default_exam_question("MSQ", topic, difficulty, len(msqs) + i + 1) for i in range(num_msq - len(msqs))]
+    return mcqs, msqs
+
+async def assemble_exam_shard(topic: str, num_mcq: int, num_msq: int, difficulty: str) -> Tuple[List[QuizQuestion], List[QuizQuestion]]:
+    """Samples one topic's questions from the bank and generates only what it lacks."""
+    mcqs = [QuizQuestion(**q) for q in await asyncio.to_thread(question_bank.sample, difficulty, topic, "MCQ", num_mcq)]
+    msqs = [QuizQuestion(**q) for q in await asyncio.to_thread(question_bank.sample, difficulty, topic, "MSQ", num_msq)]
+    if len(mcqs) < num_mcq or len(msqs) < num_msq:
+        new_mcqs, new_msqs = await generate_exam_shard(topic, num_mcq - len(mcqs), num_msq - len(msqs), difficulty)
+        mcqs += new_mcqs
+        msqs += new_msqs
+    return mcqs, msqs
+
+async def plan_exam(exam_type: str, learner_id: Optional[str] = None) -> Tuple[str, List[Tuple[str, int, int]]]:
+    """Returns the difficulty and (topic, MCQ count, MSQ count) for every topic in the exam."""
+    # Determine difficulty level and prompt based on exam type
+    if exam_type == "bronze-to-silver":
+        difficulty = "moderately difficult"
+    else:  # silver-to-gold
+        difficulty = "extremely difficult"
 
-            # Validate quiz data structure
-            if not isinstance(quiz_data, dict) or "questions" not in quiz_data:
-                print("Invalid response structure")
-                return get_default_exam_questions(exam_type)
+    # Get topic weights based on the learner's (or the global) assessment scores
+    assessment = await asyncio.to_thread(AssessmentScores, learner_id)
+    topic_weights = assessment.get_topic_weights()
 
-            questions = []
-            for i, q in enumerate(quiz_data["questions"]):
+    # Calculate number of questions per topic, and how many of them are MSQs
+    questions_per_topic = allocate_largest_remainder(topic_weights, EXAM_TOTAL_QUESTIONS)
+    msq_per_topic = allocate_largest_remainder(questions_per_topic, EXAM_MSQ_COUNT)
+    return difficulty, [
+        (topic, count - msq_per_topic[topic], msq_per_topic[topic])
+        for topic, count in questions_per_topic.items() if count > 0
+    ]
+
+async def generate_exam_questions(exam_type: str, learner_id: Optional[str] = None) -> Tuple[List[QuizQuestion], str]:
+    difficulty, shards_plan = await plan_exam(exam_type, learner_id)
+
+    # Assemble every topic shard concurrently, from the bank where possible
+    shards = await asyncio.gather(*(
+        assemble_exam_shard(topic, num_mcq, num_msq, difficulty) for topic, num_mcq, num_msq in shards_plan
+    ))
+
+    # MCQs first, then MSQs, renumbered in order
+    questions = [q for mcqs, _ in shards for q in mcqs] + [q for _, msqs in shards for q in msqs]
+    for i, question in enumerate(questions):
+        question.id = i + 1
+    return questions, difficulty
+
+async def stream_exam_shard(topic: str, num_mcq: int, num_msq: int, difficulty: str) -> AsyncIterator[QuizQuestion]:
+    """Yields one topic's questions: bank samples first, then streamed generations.
+
+    Anything the stream did not deliver is generated (with retries and
+    placeholders) by generate_exam_shard.
+    """
+    mcqs = [QuizQuestion(**q) for q in await asyncio.to_thread(question_bank.sample, difficulty, topic, "MCQ", num_mcq)]
+    msqs = [QuizQuestion(**q) for q in await asyncio.to_thread(question_bank.sample, difficulty, topic, "MSQ", num_msq)]
+    for question in mcqs + msqs:
+        yield question
+
+    missing_mcq = num_mcq - len(mcqs)
+    missing_msq = num_msq - len(msqs)
+    if missing_mcq <= 0 and missing_msq <= 0:
+        return
+
+    parser = ArrayItemParser()
+    position = 0
+    requested_mcq = missing_mcq
+    generated: List[QuizQuestion] = []
+    try:
+        async for text in llm.stream("exam", contents=exam_shard_prompt(topic, missing_mcq, missing_msq, difficulty),
+                                     generation_config=EXAM_GENERATION_CONFIG):
+            for item in parser.feed(text):
+                position += 1
                 try:
-                    # Ensure all required fields are present
-                    required_fields = ["type", "question", "options", "correctAnswers", "timeLimit", "topic"]
-                    if not all(field in q for field in required_fields):
-                        print(f"Missing required fields in question {i + 1}")
-                        continue
-                    
-                    # Add id if missing
-                    if "id" not in q:
-                        q["id"] = i + 1
-                    
-                    # Validate and fix question type
-                    if i < 18:  # First 18 questions should be MCQ
-                        q["type"] = "MCQ"
-                        q["correctAnswers"] = [q["correctAnswers"][0] if q["correctAnswers"] else 0]
-                    else:  # Last 7 questions should be MSQ
-                        q["type"] = "MSQ"
-                        if not q["correctAnswers"]:
-                            q["correctAnswers"] = [0, 1]
-                    
-                    # Ensure options is a list of exactly 4 strings
-                    if not isinstance(q["options"], list) or len(q["options"]) != 4:
-                        print(f"Invalid options in question {i + 1}")
-                        continue
-                    
-                    # Ensure timeLimit is within bounds
-                    q["timeLimit"] = max(60, min(180, int(q["timeLimit"])))
-                    
-                    questions.append(QuizQuestion(**q))
+                    question = normalize_exam_question(item, position - 1, topic, requested_mcq)
                 except Exception as e:
-                    print(f"Error processing question {i + 1}: {str(e)}")
+                    print(f"Error processing streamed {topic} question {position}: {str(e)}")
                     continue
+                if question.type == "MCQ" and missing_mcq > 0:
+                    missing_mcq -= 1
+                elif question.type == "MSQ" and missing_msq > 0:
+                    missing_msq -= 1
+                else:
+                    continue
+                generated.append(question)
+                yield question
+    except Exception as e:
+        print(f"Error in streamed exam shard {topic}: {str(e)}")
+    await asyncio.to_thread(question_bank.add_many, [q.dict() for q in generated], difficulty)
 
-            if len(questions) != 25:
-                print(f"Incorrect number of questions generated: {len(questions)}")
-                return get_default_exam_questions(exam_type)
+    if missing_mcq > 0 or missing_msq > 0:
+        rest_mcqs, rest_msqs = await generate_exam_shard(topic, missing_mcq, missing_msq, difficulty)
+        for question in rest_mcqs + rest_msqs:
+            yield question
 
-            return questions, difficulty
-        except Exception as e:
-            print(f"Error in exam generation: {str(e)}")
-            return get_default_exam_questions(exam_type)
-    except Exception as e:
-        print(f"Error in exam generation: {str(e)}")
-        return get_default_exam_questions(exam_type)
+async def merge_async_iterators(iterators: List[AsyncIterator]) -> AsyncIterator:
+    """Yields items from several async iterators in the order they are produced."""
+    queue: asyncio.Queue = asyncio.Queue()
+    finished = object()
 
-def get_default_exam_questions(exam_type: str) -> Tuple[List[QuizQuestion], str]:
-    difficulty = "moderately difficult" if exam_type == "bronze-to-silver" else "extremely difficult"
-    
-    # Get topic weights for distribution
-    assessment = AssessmentScores()
-    topic_weights = assessment.get_topic_weights()
-    
-    # Sort topics by weight (descending) to prioritize weaker areas
-    sorted_topics = sorted(topic_weights.items(), key=lambda x: x[1], reverse=True)
-    
-    questions = []
-    topic_index = 0
-    
-    # Add 18 MCQs
-    for i in range(18):
-        # Cycle through topics based on their weights
-        topic = sorted_topics[topic_index % len(sorted_topics)][0]
-        topic_index += 1
-        
-        questions.append(QuizQuestion(
-            id=i + 1,
-            type="MCQ",
-            question=f"Advanced {difficulty} {topic} MCQ Question {i + 1}",
-            options=[
-                "Option A",
-                "Option B",
-                "Option C",
-                "Option D"
-            ],
-            correctAnswers=[0],
-            timeLimit=120,
-            topic=topic
-        ))
-    
-    # Add 7 MSQs
-    for i in range(7):
-        # Continue cycling through topics
-        topic = sorted_topics[topic_index % len(sorted_topics)][0]
-        topic_index += 1
-        
-        questions.append(QuizQuestion(
-            id=i + 19,
-            type="MSQ",
-            question=f"Advanced {difficulty} {topic} MSQ Question {i + 1}",
-            options=[
-                "Option A",
-                "Option B",
-                "Option C",
-                "Option D"
-            ],
-            correctAnswers=[0, 1],
-            timeLimit=180,
-            topic=topic
-        ))
-    
-    return questions, difficulty
+    async def drain(iterator):
+        try:
+            async for item in iterator:
+                await queue.put(item)
+        finally:
+            await queue.put(finished)
 
-app = FastAPI()
+    tasks = [asyncio.create_task(drain(iterator)) for iterator in iterators]
+    try:
+        remaining = len(tasks)
+        while remaining:
+            item = await queue.get()
+            if item is finished:
+                remaining -= 1
+            else:
+                yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+def default_exam_question(question_type: str, topic: str, difficulty: str, number: int) -> QuizQuestion:
+    return QuizQuestion(
+        id=number,
+        type=question_type,
+        question=f"Advanced {difficulty} {topic} {question_type} Question {number}",
+        options=[
+            "Option A",
+            "Option B",
+            "Option C",
+            "Option D"
+        ],
+        correctAnswers=[0] if question_type == "MCQ" else [0, 1],
+        timeLimit=120 if question_type == "MCQ" else 180,
+        topic=topic
+    )
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await content_registry.start()
+    await job_queue.start()
+    await upload_janitor.start()
+    try:
+        await asyncio.to_thread(tokenizer.preload)
+    except Exception as e:
+        # Loaded again on first use
+        print(f"Tokenizer preload failed: {str(e)}")
+    if os.getenv("QUIZ_POOL_WARM_ON_STARTUP", "false").lower() == "true":
+        for course_id in course_catalogue.ids():
+            for difficulty in ("silver", "gold"):
+                quiz_pool.refill(course_id, difficulty)
+    yield
+    await quiz_pool.stop()
+    for task in search_refreshes.values():
+        task.cancel()
+    await upload_janitor.stop()
+    await job_queue.stop()
+    await remote_files.close()
+    await content_registry.stop()
+    llm.shutdown()
+    tokenizer.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -616,6 +759,14 @@ app.add_middleware(
 UPLOAD_DIR = "temp-uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+upload_store = UploadStore(UPLOAD_DIR)
+resumable_uploads = ResumableUploads(UPLOAD_DIR, upload_store)
+# Blobs of queued and running analysis jobs are not evicted before the job has read them
+upload_janitor = UploadJanitor(
+    upload_store, [upload_store.incoming_dir, resumable_uploads.session_dir],
+    pending_paths=lambda: [payload["filePath"] for payload in job_queue.pending_payloads("analyze")]
+)
+
 @app.post("/api/upload")
 async def upload_video(video: UploadFile = File(...)):
     try:
@@ -623,23 +774,80 @@ async def upload_video(video: UploadFile = File(...)):
         if not video.content_type.startswith("video/"):
             raise HTTPException(status_code=400, detail="Only video files are allowed")
 
-        # Save video temporarily
-        file_path = os.path.join(UPLOAD_DIR, video.filename)
-        with open(file_path, "wb") as buffer:
-            content = await video.read()
-            buffer.write(content)
+        # Stream the video into the content-addressed store in fixed-size chunks
+        file_info = await stream_upload_to_store(video, upload_store)
+        upload_janitor.track(file_info)
 
         return JSONResponse({
             "message": "File uploaded successfully",
-            "file": {
-                "name": video.filename,
-                "size": len(content),
-                "path": file_path
-            }
+            "file": file_info
         })
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Resumable uploads: init, PATCH chunks at an offset, query offset, finalize
+@app.post("/api/uploads")
+async def create_upload(request: UploadInitRequest):
+    try:
+        return JSONResponse(resumable_uploads.create(request.filename, request.size, request.contentType), status_code=201)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+@app.head("/api/uploads/{upload_id}")
+async def get_upload_offset(upload_id: str):
+    try:
+        status = resumable_uploads.status(upload_id)
+        return Response(headers={
+            "Upload-Offset": str(status["offset"]),
+            "Upload-Length": str(status["size"]),
+            "Cache-Control": "no-store"
+        })
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+@app.get("/api/uploads/{upload_id}")
+async def get_upload_status(upload_id: str):
+    try:
+        return JSONResponse(resumable_uploads.status(upload_id), headers={"Cache-Control": "no-store"})
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+@app.patch("/api/uploads/{upload_id}")
+async def upload_chunk(upload_id: str, request: Request, upload_offset: int = Header(..., alias="Upload-Offset")):
+    try:
+        offset = await resumable_uploads.write_chunk(upload_id, upload_offset, request.stream())
+        return JSONResponse({"uploadId": upload_id, "offset": offset}, headers={"Upload-Offset": str(offset)})
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+@app.post("/api/uploads/{upload_id}/finalize")
+async def finalize_upload(upload_id: str):
+    try:
+        file_info = await resumable_uploads.finalize(upload_id)
+        upload_janitor.track(file_info)
+        return JSONResponse({
+            "message": "File uploaded successfully",
+            "file": file_info
+        })
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+@app.get("/api/maintenance/uploads")
+async def get_upload_janitor_stats():
+    return JSONResponse(upload_janitor.stats())
+
+@app.delete("/api/uploads/{upload_id}")
+async def abort_upload(upload_id: str):
+    try:
+        resumable_uploads.abort(upload_id)
+        return JSONResponse({"message": "Upload aborted", "uploadId": upload_id})
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
 # Video Analysis Models
 class RequirementStatus(str, enum.Enum):
     PASS = "PASS"
@@ -707,230 +915,555 @@ class VideoAnalysis(BaseModel):
     class Config:
         use_enum_values = True
 
+ANALYSIS_MODEL = 'gemini-2.0-flash'
+ANALYSIS_TEMPERATURE = 0.3
+
+# Retries for a response that does not parse; failed calls are already retried by the gateway
+ANALYSIS_SECTION_RETRIES = 2
+
+# Each section is analyzed by its own prompt: (model, what the model should assess)
+ANALYSIS_SECTIONS = {
+    "technical_requirements": (
+        TechnicalRequirements,
+        "Assess the technical quality of the recording: video quality, audio quality, duration, camera position, lighting and background."
+    ),
+    "composition_requirements": (
+        CompositionRequirements,
+        "Assess how the interview is staged: the candidate's entry sequence, their seating position and whether they show an ID for verification."
+    ),
+    "authenticity_check": (
+        AuthenticityCheck,
+        "Assess whether the responses are genuine and spontaneous from eye movement, speech pattern, body language and response style. Flag clear evidence of script reading or memorized responses."
+    ),
+    "content_structure": (
+        ContentStructure,
+        "Assess the spoken content: the language used, the format of the introduction and whether the required questions are answered."
+    ),
+    "content_summary": (
+        ContentSummary,
+        "Summarize the candidate's answers about their university challenge, future development, the value of the OSC program and their learning experience."
+    ),
+}
+
+def section_schema(model) -> str:
+    """Renders the JSON schema text for one analysis section."""
+    fields = []
+    for name, field in model.__fields__.items():
+        if field.annotation is RequirementDetail:
+            fields.append(f'''    "{name}": {{
+        "status": "PASS" | "FAIL" | "PARTIAL",
+        "details": "string"
+    }}''')
+        else:
+            fields.append(f'    "{name}": "string"')
+    return "{\n" + ",\n".join(fields) + "\n}"
+
+def section_prompt(section: str) -> str:
+    model, task = ANALYSIS_SECTIONS[section]
+    requirements = (
+        "1. For each criterion, provide a status (PASS/FAIL/PARTIAL) and detailed explanation\n"
+        "2. Include timestamps in the details when noting issues\n"
+        "3. Keep details concise but informative"
+    ) if section != "content_summary" else "1. Provide 1-2 sentence summaries of answers"
+    return f"""Analyze the video interview submission in a unbiased and professional manner. {task}
+
+Use this schema:
+{section_schema(model)}
+
+Requirements:
+{requirements}
+Return ONLY valid JSON, no other text"""
+
+SECTION_PROMPTS = {section: section_prompt(section) for section in ANALYSIS_SECTIONS}
+ANALYSIS_PROMPT_HASH = prompt_hash("\n".join(SECTION_PROMPTS.values()))
+
+def apply_rejection_rules(sections: Dict[str, Dict]) -> Tuple[str, List[str]]:
+    """Applies the rejection criteria to validated sections; returns (verdict, failing_criteria).
+
+    - Any TECHNICAL REQUIREMENTS or COMPOSITION REQUIREMENTS failure
+    - More than one CONTENT STRUCTURE failure
+    - Any failed/partial AUTHENTICITY CHECK criterion (covers script reading)
+    Failing criteria are listed in order of severity.
+    """
+    failing = []
+    for section in ("technical_requirements", "composition_requirements"):
+        failing += [f"{section}.{name}: {detail['details']}" for name, detail in sections[section].items()
+                    if detail["status"] == RequirementStatus.FAIL.value]
+    failing += [f"authenticity_check.{name}: {detail['details']}" for name, detail in sections["authenticity_check"].items()
+                if detail["status"] != RequirementStatus.PASS.value]
+    content_failures = [f"content_structure.{name}: {detail['details']}" for name, detail in sections["content_structure"].items()
+                        if detail["status"] == RequirementStatus.FAIL.value]
+    if len(content_failures) > 1:
+        failing += content_failures
+    return ("REJECTED" if failing else "APPROVED"), failing
+
+analysis_cache = AnalysisCache(os.path.join(CACHE_DIR, "analysis.sqlite3"))
+job_queue = JobQueue(os.path.join(CACHE_DIR, "jobs.sqlite3"))
+quiz_pool = QuizPool(os.path.join(CACHE_DIR, "quiz_pool.sqlite3"), generate_pool_quiz, course_content_version)
+question_bank = QuestionBank(os.path.join(CACHE_DIR, "question_bank.sqlite3"))
+remote_files = RemoteFileClient(os.getenv("GOOGLE_API_KEY"), os.path.join(CACHE_DIR, "remote_files.sqlite3"))
+search_cache = SearchCache(os.path.join(CACHE_DIR, "search.sqlite3"))
+# Background refreshes of stale search cache entries, by cache key
+search_refreshes: Dict[str, asyncio.Task] = {}
+
+def video_digest(file_path: str) -> str:
+    """Returns the SHA-256 of a video, reusing the store digest when available."""
+    return upload_store.digest_for_path(file_path) or sha256_file(file_path)
+
+# Pre-flight limits checked against container metadata before any model call
+PREFLIGHT_MIN_DURATION_SECONDS = float(os.getenv("PREFLIGHT_MIN_DURATION_SECONDS", "30"))
+PREFLIGHT_MAX_DURATION_SECONDS = float(os.getenv("PREFLIGHT_MAX_DURATION_SECONDS", "1200"))
+PREFLIGHT_MIN_SHORT_SIDE = int(os.getenv("PREFLIGHT_MIN_SHORT_SIDE", "360"))
+
+def run_preflight_checks(file_path: str) -> Optional[Dict]:
+    """Checks duration, resolution and audio from the MP4/MOV header atoms.
+
+    Returns None when the container cannot be parsed (e.g. WebM), in which case
+    the model is left to judge the technical requirements on its own.
+    """
+    try:
+        info = probe_mp4(file_path)
+    except (ProbeError, OSError) as e:
+        print(f"Pre-flight probe skipped: {str(e)}")
+        return None
+
+    checks = {}
+    duration = info["duration"]
+    # An unknown duration (e.g. a fragmented MP4 without mehd) is left for the model to judge
+    if duration:
+        if duration < PREFLIGHT_MIN_DURATION_SECONDS:
+            checks["duration"] = RequirementDetail(status=RequirementStatus.FAIL, details=f"Video is {duration:.1f}s long, minimum is {PREFLIGHT_MIN_DURATION_SECONDS:.0f}s")
+        elif duration > PREFLIGHT_MAX_DURATION_SECONDS:
+            checks["duration"] = RequirementDetail(status=RequirementStatus.FAIL, details=f"Video is {duration:.1f}s long, maximum is {PREFLIGHT_MAX_DURATION_SECONDS:.0f}s")
+        else:
+            checks["duration"] = RequirementDetail(status=RequirementStatus.PASS, details=f"Video is {duration:.1f}s long")
+
+    if not info["hasVideo"]:
+        checks["video_quality"] = RequirementDetail(status=RequirementStatus.FAIL, details="No video track found")
+    elif info["width"] and info["height"] and min(info["width"], info["height"]) < PREFLIGHT_MIN_SHORT_SIDE:
+        checks["video_quality"] = RequirementDetail(status=RequirementStatus.FAIL, details=f"Resolution {info['width']}x{info['height']} is below the {PREFLIGHT_MIN_SHORT_SIDE}p minimum")
+
+    if not info["hasAudio"]:
+        checks["audio_quality"] = RequirementDetail(status=RequirementStatus.FAIL, details="No audio track found")
+
+    failing = [name for name, detail in checks.items() if detail.status == RequirementStatus.FAIL]
+    return {"info": info, "checks": checks, "failing_criteria": failing}
+
+def preflight_rejection(preflight: Dict) -> VideoAnalysis:
+    """Builds a REJECTED analysis from failed pre-flight checks without calling the model."""
+    not_evaluated = RequirementDetail(status=RequirementStatus.FAIL, details="Not evaluated: video failed pre-flight checks")
+    return VideoAnalysis(
+        technical_requirements=TechnicalRequirements(**{
+            name: preflight["checks"].get(name, not_evaluated) for name in TechnicalRequirements.__fields__
+        }),
+        composition_requirements=CompositionRequirements(**{name: not_evaluated for name in CompositionRequirements.__fields__}),
+        authenticity_check=AuthenticityCheck(**{name: not_evaluated for name in AuthenticityCheck.__fields__}),
+        content_structure=ContentStructure(**{name: not_evaluated for name in ContentStructure.__fields__}),
+        content_summary=ContentSummary(
+            university_challenge="Not evaluated",
+            future_development="Not evaluated",
+            osc_program_value="Not evaluated",
+            learning_experience="Not evaluated"
+        ),
+        final_verdict="REJECTED",
+        failing_criteria=[
+            f"technical_requirements.{name}: {preflight['checks'][name].details}" for name in preflight["failing_criteria"]
+        ]
+    )
+
+def apply_preflight(analysis_dict: Dict, preflight: Optional[Dict]) -> Dict:
+    """Overrides model-judged technical fields with what the container says."""
+    if not preflight:
+        return analysis_dict
+    for name, detail in preflight["checks"].items():
+        analysis_dict["technical_requirements"][name] = detail.dict()
+    return analysis_dict
+
+async def analyze_section(remote_file: Dict, section: str) -> Tuple[str, Dict]:
+    """Runs one section prompt against the uploaded video and validates it.
+
+    Only a response that does not parse or validate is asked for again here;
+    timeouts and 429/5xx errors are retried by the gateway alone, so the two
+    retry loops never multiply.
+    """
+    section_model = ANALYSIS_SECTIONS[section][0]
+    last_error = None
+    for attempt in range(ANALYSIS_SECTION_RETRIES + 1):
+        try:
+            response = await llm.generate(
+                "video_analysis",
+                model=ANALYSIS_MODEL,
+                contents=[
+                    {
+                        "file_data": {
+                            "mime_type": remote_file["mimeType"],
+                            "file_uri": remote_file["uri"]
+                        }
+                    },
+                    SECTION_PROMPTS[section]
+                ],
+                generation_config={
+                    "temperature": ANALYSIS_TEMPERATURE,
+                }
+            )
+        except Exception as e:
+            raise Exception(f"{section} analysis failed: {str(e)}")
+        try:
+            # JSONExtractionError, ValidationError and a blocked response's .text all raise ValueError
+            return section, parse_model(response.text, section_model).dict()
+        except ValueError as e:
+            last_error = e
+            print(f"Section {section} attempt {attempt + 1} failed: {str(e)}")
+    raise Exception(f"{section} analysis failed: {str(last_error)}")
+
+def failed_section(section: str) -> Dict:
+    """Placeholder for a section whose analysis failed after all retries."""
+    section_model = ANALYSIS_SECTIONS[section][0]
+    if section == "content_summary":
+        return {name: "Analysis failed" for name in section_model.__fields__}
+    return {name: {"status": RequirementStatus.FAIL.value, "details": "Failed to analyze video"} for name in section_model.__fields__}
+
+async def iter_video_analysis(file_path: str):
+    """Analyzes a video section by section, yielding events as each part finishes.
+
+    Yields {"event": "section", ...} for every section as soon as it is
+    validated (sections run concurrently, so total time is close to the
+    slowest one) and a final {"event": "analysis", "analysis": ...} with the
+    verdict computed by apply_rejection_rules.
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"File not found: {file_path}")
+
+    # Reject obviously unusable videos from container metadata alone
+    preflight = await asyncio.to_thread(run_preflight_checks, file_path)
+    if preflight and preflight["failing_criteria"]:
+        print(f"Pre-flight checks failed: {preflight['failing_criteria']}")
+        yield {"event": "analysis", "analysis": preflight_rejection(preflight).dict(), "preflight": True}
+        return
+
+    # Serve repeat analyses of the same content from the cache
+    digest = await asyncio.to_thread(video_digest, file_path)
+    cache_key = AnalysisCache.make_key(digest, ANALYSIS_PROMPT_HASH, ANALYSIS_MODEL, ANALYSIS_TEMPERATURE)
+    cached = await asyncio.to_thread(analysis_cache.get, cache_key)
+    if cached is not None:
+        print(f"Analysis cache hit for {digest}")
+        # Pre-flight results can differ from when the entry was cached, so re-derive the verdict
+        analysis_dict = apply_preflight(cached, preflight)
+        verdict, failing_criteria = apply_rejection_rules(analysis_dict)
+        analysis_dict.update(final_verdict=verdict, failing_criteria=failing_criteria or None)
+        yield {"event": "analysis", "analysis": analysis_dict, "cached": True}
+        return
+
+    # Upload to Gemini File API (or reuse the remote copy of the same content)
+    remote_file = await remote_files.ensure_file(file_path, digest)
+
+    print("Sending section requests to Gemini API...")
+    tasks = {asyncio.create_task(analyze_section(remote_file, section)): section for section in ANALYSIS_SECTIONS}
+    sections = {}
+    failed_sections = []
+    try:
+        for finished in asyncio.as_completed(list(tasks)):
+            try:
+                section, result = await finished
+            except Exception as e:
+                print(str(e))
+                continue
+            sections[section] = result
+            yield {"event": "section", "section": section, "result": result}
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    # as_completed hides which task failed, so recover failed sections from the task map
+    for task, section in tasks.items():
+        if section not in sections:
+            failed_sections.append(section)
+            sections[section] = failed_section(section)
+            yield {"event": "section", "section": section, "result": sections[section], "error": "Section analysis failed"}
+
+    analysis_sections = apply_preflight({"technical_requirements": sections["technical_requirements"]}, preflight)
+    sections["technical_requirements"] = analysis_sections["technical_requirements"]
+    verdict, failing_criteria = apply_rejection_rules(sections)
+    failing_criteria = [f"{section} analysis failed" for section in failed_sections] + failing_criteria
+    if failed_sections:
+        verdict = "REJECTED"
+
+    analysis_dict = VideoAnalysis(
+        **sections,
+        final_verdict=verdict,
+        failing_criteria=failing_criteria or None
+    ).dict()
+    if not failed_sections:
+        await asyncio.to_thread(analysis_cache.put, cache_key, digest, analysis_dict)
+    yield {"event": "analysis", "analysis": analysis_dict}
+
+async def run_video_analysis(file_path: str) -> Dict:
+    """Analyzes a video file and returns the VideoAnalysis dict.
+
+    Shared by the synchronous endpoint and the job workers.
+    """
+    analysis_dict = None
+    with upload_janitor.hold([file_path]):
+        async for event in iter_video_analysis(file_path):
+            if event["event"] == "analysis":
+                analysis_dict = event["analysis"]
+    return analysis_dict
+
 @app.post("/api/analyze")
 async def analyze_video(request: AnalyzeRequest):
     try:
         print("Received request with filePath:", request.filePath)
         
-        if not os.path.exists(request.filePath):
+        file_path = upload_store.resolve(request.filePath)
+        if not file_path:
             raise HTTPException(status_code=400, detail=f"File not found: {request.filePath}")
 
-        # Upload to Gemini File API
-        print("Uploading to Gemini File API...")
-        with open(request.filePath, 'rb') as file:
-            video_data = file.read()
-            
-        # Generate content using the video file
-        model = genai.GenerativeModel('gemini-2.0-flash')
-        print("Sending request to Gemini API...")
-        response = model.generate_content(
-            contents=[
-                {
-                    "mime_type": "video/mp4",
-                    "data": video_data
-                },
-                """Analyze the video interview submission in a unbiased and professional manner and provide a structured response in JSON format.
-
-Use this schema:
-{
-    "technical_requirements": {
-        "video_quality": {
-            "status": "PASS" | "FAIL" | "PARTIAL",
-            "details": "string"
-        },
-        "audio_quality": {
-            "status": "PASS" | "FAIL" | "PARTIAL",
-            "details": "string"
-        },
-        "duration": {
-            "status": "PASS" | "FAIL" | "PARTIAL",
-            "details": "string"
-        },
-        "camera_position": {
-            "status": "PASS" | "FAIL" | "PARTIAL",
-            "details": "string"
-        },
-        "lighting": {
-            "status": "PASS" | "FAIL" | "PARTIAL",
-            "details": "string"
-        },
-        "background": {
-            "status": "PASS" | "FAIL" | "PARTIAL",
-            "details": "string"
-        }
-    },
-    "composition_requirements": {
-        "entry_sequence": {
-            "status": "PASS" | "FAIL" | "PARTIAL",
-            "details": "string"
-        },
-        "seating_position": {
-            "status": "PASS" | "FAIL" | "PARTIAL",
-            "details": "string"
-        },
-        "id_verification": {
-            "status": "PASS" | "FAIL" | "PARTIAL",
-            "details": "string"
-        }
-    },
-    "authenticity_check": {
-        "eye_movement": {
-            "status": "PASS" | "FAIL" | "PARTIAL",
-            "details": "string"
-        },
-        "speech_pattern": {
-            "status": "PASS" | "FAIL" | "PARTIAL",
-            "details": "string"
-        },
-        "body_language": {
-            "status": "PASS" | "FAIL" | "PARTIAL",
-            "details": "string"
-        },
-        "response_style": {
-            "status": "PASS" | "FAIL" | "PARTIAL",
-            "details": "string"
-        }
-    },
-    "content_structure": {
-        "language": {
-            "status": "PASS" | "FAIL" | "PARTIAL",
-            "details": "string"
-        },
-        "introduction_format": {
-            "status": "PASS" | "FAIL" | "PARTIAL",
-            "details": "string"
-        },
-        "required_questions": {
-            "status": "PASS" | "FAIL" | "PARTIAL",
-            "details": "string"
-        }
-    },
-    "content_summary": {
-        "university_challenge": "string",
-        "future_development": "string",
-        "osc_program_value": "string",
-        "learning_experience": "string"
-    },
-    "final_verdict": "APPROVED" | "REJECTED",
-    "failing_criteria": ["string"] // Optional, include only if final_verdict is REJECTED
-}
+        analysis_dict = await run_video_analysis(file_path)
+        return JSONResponse(content=analysis_dict)
 
-Requirements:
-1. For each criterion, provide a status (PASS/FAIL/PARTIAL) and detailed explanation
-2. Include timestamps in the details when noting issues
-3. Keep details concise but informative
-4. For content_summary, provide 1-2 sentence summaries of answers
-5. List failing_criteria in order of severity if verdict is REJECTED
-6. Return ONLY valid JSON, no other text
-
-Rejection Criteria:
-- Any TECHNICAL REQUIREMENTS or COMPOSITION REQUIREMENTS failure
-- More than one CONTENT STRUCTURE failure
-- Even if one criterion is failed/partial in AUTHENTICITY CHECK, the video should be rejected
-- Clear evidence of script reading or memorized responses"""
-            ],
-            generation_config={
-                "temperature": 0.3,
-            }
-        )
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        print("Error during analysis:", str(e))
+        raise HTTPException(status_code=500, detail=str(e))
 
-        print("Received response from Gemini API")
-        print("Response text:", response.text[:200], "...")  # Print first 200 chars
+@app.post("/api/analyze/stream")
+async def analyze_video_stream(request: AnalyzeRequest):
+    """Streams section results as NDJSON as soon as each one is validated."""
+    file_path = upload_store.resolve(request.filePath)
+    if not file_path:
+        raise HTTPException(status_code=400, detail=f"File not found: {request.filePath}")
 
-        # Parse the response into our Pydantic model
+    async def event_stream():
         try:
-            # Clean up the response text and ensure it's valid JSON
-            response_text = response.text.strip()
-            # Remove any markdown code block markers if present
-            response_text = response_text.replace('```json', '').replace('```', '').strip()
-            
-            print("Cleaned response text:", response_text[:200], "...")  # Print first 200 chars
-            
-            # Parse the response into our Pydantic model
-            analysis = VideoAnalysis.parse_raw(response_text)
-            
-            # Convert to dict with enum values as strings
-            analysis_dict = analysis.dict()
-            
-            print("Successfully parsed response into VideoAnalysis model")
-            return JSONResponse(content=analysis_dict)
+            with upload_janitor.hold([file_path]):
+                async for event in iter_video_analysis(file_path):
+                    yield json.dumps(event) + "\n"
         except Exception as e:
-            print(f"Error parsing response: {str(e)}")
-            print(f"Full response text: {response_text}")
-            
-            # Create a default response
-            default_detail = RequirementDetail(status=RequirementStatus.FAIL, details="Failed to analyze video")
-            default_analysis = VideoAnalysis(
-                technical_requirements=TechnicalRequirements(
-                    video_quality=default_detail,
-                    audio_quality=default_detail,
-                    duration=default_detail,
-                    camera_position=default_detail,
-                    lighting=default_detail,
-                    background=default_detail
-                ),
-                composition_requirements=CompositionRequirements(
-                    entry_sequence=default_detail,
-                    seating_position=default_detail,
-                    id_verification=default_detail
-                ),
-                authenticity_check=AuthenticityCheck(
-                    eye_movement=default_detail,
-                    speech_pattern=default_detail,
-                    body_language=default_detail,
-                    response_style=default_detail
-                ),
-                content_structure=ContentStructure(
-                    language=default_detail,
-                    introduction_format=default_detail,
-                    required_questions=default_detail
-                ),
-                content_summary=ContentSummary(
-                    university_challenge="Analysis failed",
-                    future_development="Analysis failed",
-                    osc_program_value="Analysis failed",
-                    learning_experience="Analysis failed"
-                ),
-                final_verdict="REJECTED",
-                failing_criteria=["Video analysis failed", str(e)]
-            )
-            
-            return JSONResponse(content=default_analysis.dict())
+            print("Error during analysis:", str(e))
+            yield json.dumps({"event": "error", "detail": str(e)}) + "\n"
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+def summarize_batch(results: List[Dict]) -> Dict:
+    """Counts verdicts and how often each criterion caused a rejection."""
+    summary = {"total": len(results), "approved": 0, "rejected": 0, "errors": 0, "failingCriteria": {}}
+    for result in results:
+        analysis = result.get("analysis")
+        if not analysis:
+            summary["errors"] += 1
+            continue
+        if analysis["final_verdict"] == "APPROVED":
+            summary["approved"] += 1
+        else:
+            summary["rejected"] += 1
+        for criterion in analysis.get("failing_criteria") or []:
+            # Criteria look like "section.field: details"; count by the criterion name
+            name = criterion.split(":", 1)[0].strip()
+            summary["failingCriteria"][name] = summary["failingCriteria"].get(name, 0) + 1
+    summary["failingCriteria"] = dict(sorted(summary["failingCriteria"].items(), key=lambda x: x[1], reverse=True))
+    return summary
+
+@app.post("/api/analyze/batch")
+async def analyze_batch(request: BatchAnalyzeRequest):
+    """Analyzes many videos over a bounded pipeline and streams one NDJSON line per video."""
+    # Only upload IDs and stored blobs may be sent to the model
+    file_paths = [upload_store.resolve(item) for item in request.items]
+    unresolved = [item for item, file_path in zip(request.items, file_paths) if not file_path]
+    if unresolved:
+        raise HTTPException(status_code=400, detail=f"Files not found: {', '.join(unresolved[:10])}")
+
+    concurrency = request.concurrency or BATCH_CONCURRENCY
+    item_timeout = request.itemTimeout or BATCH_ITEM_TIMEOUT
+    semaphore = asyncio.Semaphore(concurrency)
+    finished: asyncio.Queue = asyncio.Queue()
+
+    async def analyze_item(index: int, item: str, file_path: str):
+        result = {"event": "result", "index": index, "item": item}
+        async with semaphore:
+            started = time.monotonic()
+            try:
+                result["analysis"] = await asyncio.wait_for(run_video_analysis(file_path), timeout=item_timeout)
+            except asyncio.TimeoutError:
+                result["event"] = "error"
+                result["detail"] = f"Timed out after {item_timeout:.0f}s"
+            except Exception as e:
+                result["event"] = "error"
+                result["detail"] = str(e)
+            result["seconds"] = round(time.monotonic() - started, 3)
+        await finished.put(result)
+
+    async def event_stream():
+        tasks = [asyncio.create_task(analyze_item(i, item, file_path))
+                 for i, (item, file_path) in enumerate(zip(request.items, file_paths))]
+        results = []
+        # Items still waiting for a batch slot keep their uploads too
+        with upload_janitor.hold(file_paths):
+            try:
+                for _ in range(len(tasks)):
+                    result = await finished.get()
+                    results.append(result)
+                    yield json.dumps(result) + "\n"
+                yield json.dumps({"event": "summary", **summarize_batch(results)}) + "\n"
+            finally:
+                # Stop outstanding work if the client goes away
+                for task in tasks:
+                    task.cancel()
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+async def analyze_job_handler(payload: Dict) -> Dict:
+    # Jobs persisted before the path check existed may point anywhere
+    if not upload_store.digest_for_path(payload["filePath"]):
+        raise PermissionError(f"File is not a stored upload: {payload['filePath']}")
+    return await run_video_analysis(payload["filePath"])
+
+job_queue.register("analyze", analyze_job_handler)
+
+@app.post("/api/jobs/analyze")
+async def submit_analyze_job(request: AnalyzeRequest):
+    try:
+        # Resolve (and contain) the path before the job is persisted
+        file_path = upload_store.resolve(request.filePath)
+        if not file_path:
+            raise HTTPException(status_code=400, detail=f"File not found: {request.filePath}")
 
+        job = job_queue.submit("analyze", {"filePath": file_path})
+        return JSONResponse(job, status_code=202)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except HTTPException as e:
         raise e
     except Exception as e:
-        print("Error during analysis:", str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/jobs")
+async def get_job_stats():
+    return JSONResponse(job_queue.stats())
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JSONResponse(job)
+
+@app.get("/api/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    job = job_queue.get(job_id, include_result=True)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["state"] == FAILED:
+        raise HTTPException(status_code=500, detail=job["error"])
+    if job["state"] != SUCCEEDED:
+        return JSONResponse(job, status_code=202)
+    return JSONResponse(job["result"])
+
+@app.get("/api/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, request: Request):
+    job = job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def event_stream():
+        updates = job_queue.subscribe(job_id)
+        try:
+            # Re-read after subscribing so a change in between is not missed
+            current = job_queue.get(job_id)
+            yield f"event: state\ndata: {json.dumps(current)}\n\n"
+            while current["state"] not in FINISHED_STATES:
+                if await request.is_disconnected():
+                    break
+                try:
+                    current = await asyncio.wait_for(updates.get(), timeout=15)
+                    yield f"event: state\ndata: {json.dumps(current)}\n\n"
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+        finally:
+            job_queue.unsubscribe(job_id, updates)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/api/quiz-pool/stats")
+async def get_quiz_pool_stats():
+    return JSONResponse(quiz_pool.stats())
+
+@app.get("/api/question-bank/stats")
+async def get_question_bank_stats():
+    return JSONResponse(question_bank.stats())
+
+@app.get("/api/content/stats")
+async def get_content_stats():
+    return JSONResponse(content_registry.stats())
+
+@app.get("/api/single-flight/stats")
+async def get_single_flight_stats():
+    return JSONResponse(single_flight.stats())
+
+@app.get("/api/tokenizer/stats")
+async def get_tokenizer_stats():
+    return JSONResponse(tokenizer.stats())
+
+@app.get("/api/llm/stats")
+async def get_llm_stats():
+    return JSONResponse(llm.stats())
+
+@app.get("/api/search-cache/stats")
+async def get_search_cache_stats():
+    return JSONResponse(search_cache.stats())
+
+@app.get("/api/analyze/cache")
+async def get_analysis_cache_stats():
+    return JSONResponse({**analysis_cache.stats(), "remoteFiles": remote_files.stats()})
+
 @app.delete("/api/files")
 async def delete_file(request: DeleteFileRequest):
     try:
-        print("Received delete request for file:", request.filePath)
-        
-        # Validate file path is within UPLOAD_DIR for security
-        file_path = os.path.abspath(request.filePath)
-        upload_dir = os.path.abspath(UPLOAD_DIR)
-        
-        if not file_path.startswith(upload_dir):
-            raise HTTPException(
-                status_code=403,
-                detail="Access denied: Cannot delete files outside upload directory"
-            )
+        print("Received delete request for file:", request.uploadId or request.filePath)
 
-        if not os.path.exists(file_path):
-            raise HTTPException(
-                status_code=404,
-                detail="File not found"
-            )
+        if request.uploadId:
+            if not upload_store.get(request.uploadId):
+                raise HTTPException(status_code=404, detail="File not found")
+            blob_removed = upload_store.release(request.uploadId)
+        else:
+            if not request.filePath:
+                raise HTTPException(status_code=400, detail="No file path provided")
+
+            # Validate file path is within UPLOAD_DIR for security
+            file_path = os.path.abspath(request.filePath)
+            upload_dir = os.path.abspath(UPLOAD_DIR)
+
+            if not file_path.startswith(upload_dir + os.sep):
+                raise HTTPException(
+                    status_code=403,
+                    detail="Access denied: Cannot delete files outside upload directory"
+                )
+
+            # Only uploaded blobs may be deleted by path, never the store's index, sessions or partial files
+            if not upload_store.digest_for_path(file_path):
+                raise HTTPException(
+                    status_code=403,
+                    detail="Access denied: Only uploaded files can be deleted"
+                )
+
+            if not os.path.exists(file_path):
+                raise HTTPException(
+                    status_code=404,
+                    detail="File not found"
+                )
+
+            # Blobs are shared, so only drop one reference
+            try:
+                blob_removed = upload_store.release_path(file_path)
+            except KeyError:
+                raise HTTPException(status_code=404, detail="File not found")
 
-        # Delete the file
-        os.remove(file_path)
-        
         return JSONResponse({
             "message": "File deleted successfully",
             "file": {
-                "path": request.filePath
+                "path": request.filePath,
+                "uploadId": request.uploadId,
+                "blobRemoved": blob_removed
             }
         })
 
@@ -940,39 +1473,57 @@ async def delete_file(request: DeleteFileRequest):
         print("Error deleting file:", str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
+def quiz_difficulty(course_id: str, score: Optional[int]) -> Tuple[str, int]:
+    """Returns (difficulty, score used) for a quiz request."""
+    print(f"Received quiz request - Course ID: {course_id}, Score parameter: {score}")  # Debug log
+    
+    # Use the score parameter directly, don't fetch from courses_db
+    if score is not None:
+        score = int(score)  # Ensure score is an integer
+        print(f"Using provided score: {score}")  # Debug log
+    else:
+        # Only use database score as fallback
+        course = course_catalogue.get(course_id)
+        if course:
+            score = course["assessmentScore"]
+            print(f"Using fallback score from database: {score}")  # Debug log
+        else:
+            score = 0
+            print("No score available, defaulting to 0")  # Debug log
+    
+    # Determine difficulty based on score
+    difficulty = "bronze"
+    if score > 100:
+        difficulty = "gold"
+    elif score > 50:
+        difficulty = "silver"
+    
+    print(f"Selected difficulty: {difficulty} based on score: {score}")  # Debug log
+    return difficulty, score
+
 @app.get("/api/quiz/{course_id}")
 async def get_quiz_questions(course_id: str, score: Optional[int] = None):
     try:
-        print(f"Received quiz request - Course ID: {course_id}, Score parameter: {score}")  # Debug log
+        difficulty, score = quiz_difficulty(course_id, score)
         
-        # Use the score parameter directly, don't fetch from courses_db
-        if score is not None:
-            score = int(score)  # Ensure score is an integer
-            print(f"Using provided score: {score}")  # Debug log
+        # Serve a pre-generated set when one is ready, otherwise generate now
+        pooled = await quiz_pool.take(course_id, difficulty) if difficulty != "bronze" else None
+        if pooled:
+            questions = [QuizQuestion(**q) for q in pooled]
         else:
-            # Only use database score as fallback
-            course = next((c for c in courses_db if c.id == course_id), None)
-            if course:
-                score = course.assessmentScore
-                print(f"Using fallback score from database: {score}")  # Debug log
-            else:
-                score = 0
-                print("No score available, defaulting to 0")  # Debug log
-        
-        # Determine difficulty based on score
-        difficulty = "bronze"
-        if score > 100:
-            difficulty = "gold"
-        elif score > 50:
-            difficulty = "silver"
-        
-        print(f"Selected difficulty: {difficulty} based on score: {score}")  # Debug log
+            questions = await single_flight.run(
+                "quiz",
+                {"course_id": course_id, "difficulty": difficulty, "content": course_content_version(course_id)},
+                lambda: generate_quiz_questions(difficulty, course_id),
+                fanout=QUIZ_FANOUT
+            )
         
-        # Generate questions based on difficulty
-        questions = generate_quiz_questions(difficulty, course_id)
+        question_dicts = [question.dict() for question in questions]
+        assessment_id = await asyncio.to_thread(assessment_store.save, "quiz", difficulty, question_dicts)
         
         return JSONResponse({
-            "questions": [question.dict() for question in questions],
+            "assessmentId": assessment_id,
+            "questions": question_dicts,
             "totalQuestions": len(questions),
             "difficulty": difficulty,
             "usedScore": score  # Include the score that was used for debugging
@@ -981,37 +1532,167 @@ async def get_quiz_questions(course_id: str, score: Optional[int] = None):
         print(f"Error in quiz endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def catalogue_response(body: bytes, etag: str, if_none_match: Optional[str]) -> Response:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+async def stream_quiz_questions(difficulty: str, course_id: str) -> AsyncIterator[QuizQuestion]:
+    """Yields quiz questions as soon as the model has produced each one."""
+    if difficulty == "bronze":
+        for question in get_default_questions():
+            yield question
+        return
+
+    parser = ArrayItemParser()
+    questions: List[QuizQuestion] = []
+    try:
+        prompt = await asyncio.to_thread(quiz_prompt, difficulty, course_id)
+        async for text in llm.stream("quiz", contents=prompt, generation_config=QUIZ_GENERATION_CONFIG):
+            for item in parser.feed(text):
+                try:
+                    question = normalize_quiz_question(item, len(questions))
+                except Exception as e:
+                    print(f"Error processing streamed quiz question: {str(e)}")
+                    continue
+                if question:
+                    question.id = len(questions) + 1
+                    questions.append(question)
+                    yield question
+    except Exception as e:
+        print(f"Error in streamed quiz generation: {str(e)}")
+
+    if not questions:
+        print("No valid questions streamed")
+        for question in get_default_questions():
+            yield question
+        return
+    await asyncio.to_thread(question_bank.add_many, [q.dict() for q in questions], difficulty, course_id)
+
+def event_stream_response(events: AsyncIterator[Dict], format: str) -> StreamingResponse:
+    """Sends events as NDJSON lines or as server-sent events."""
+    async def body():
+        try:
+            async for event in events:
+                if format == "sse":
+                    yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+                else:
+                    yield json.dumps(event) + "\n"
+        finally:
+            await events.aclose()
+
+    if format == "sse":
+        return StreamingResponse(body(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+@app.get("/api/quiz/{course_id}/stream")
+async def stream_quiz(course_id: str, score: Optional[int] = None, format: Literal["ndjson", "sse"] = "ndjson"):
+    """Streams quiz questions one by one as NDJSON or SSE, then a done event."""
+    difficulty, score = quiz_difficulty(course_id, score)
+
+    async def events():
+        try:
+            pooled = await quiz_pool.take(course_id, difficulty) if difficulty != "bronze" else None
+            questions = []
+            if pooled:
+                for question in (QuizQuestion(**q) for q in pooled):
+                    questions.append(question)
+                    yield {"event": "question", "question": question.dict()}
+            else:
+                async for question in stream_quiz_questions(difficulty, course_id):
+                    questions.append(question)
+                    yield {"event": "question", "question": question.dict()}
+
+            question_dicts = [question.dict() for question in questions]
+            assessment_id = await asyncio.to_thread(assessment_store.save, "quiz", difficulty, question_dicts)
+            yield {
+                "event": "done",
+                "assessmentId": assessment_id,
+                "totalQuestions": len(questions),
+                "difficulty": difficulty,
+                "usedScore": score
+            }
+        except Exception as e:
+            print(f"Error in quiz stream: {str(e)}")
+            yield {"event": "error", "detail": str(e)}
+
+    return event_stream_response(events(), format)
+
 @app.get("/api/courses")
-async def get_courses():
+async def get_courses(category: Optional[str] = None, cursor: Optional[str] = None,
+                      limit: Optional[int] = Query(None, ge=1, le=1000),
+                      if_none_match: Optional[str] = Header(None)):
     try:
-        return JSONResponse({
-            "courses": [course.dict() for course in courses_db]
-        })
+        body, etag = course_catalogue.list_response(category, cursor, limit)
+        return catalogue_response(body, etag, if_none_match)
+    except CursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/courses/{course_id}")
-async def get_course(course_id: str):
+async def get_course(course_id: str, if_none_match: Optional[str] = Header(None)):
     try:
-        course = next((course for course in courses_db if course.id == course_id), None)
-        if not course:
+        response = course_catalogue.course_response(course_id)
+        if not response:
             raise HTTPException(status_code=404, detail="Course not found")
-        return JSONResponse(course.dict())
+        return catalogue_response(*response, if_none_match)
     except HTTPException as e:
         raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/learners/{learner_id}/scores")
+async def get_learner_scores(learner_id: str):
+    scores = await asyncio.to_thread(AssessmentScores, learner_id)
+    return JSONResponse({"learnerId": learner_id, "scores": scores.scores, "topicWeights": scores.get_topic_weights()})
+
+@app.put("/api/learners/{learner_id}/scores")
+async def put_learner_scores(learner_id: str, request: LearnerScoresRequest):
+    if any(not 0 <= score <= 30 for score in request.scores.values()):
+        raise HTTPException(status_code=400, detail="Scores must be between 0 and 30")
+    known_topics = AssessmentScores().scores
+    unknown = [topic for topic in request.scores if topic not in known_topics]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown topics: {', '.join(unknown)}")
+    await asyncio.to_thread(learner_profiles.put, learner_id, request.scores)
+    return await get_learner_scores(learner_id)
+
+@app.post("/api/exam/allocations")
+async def get_exam_allocations(request: ExamAllocationRequest):
+    """Per-learner question counts per topic for a whole cohort in one vectorized pass."""
+    defaults = AssessmentScores().scores
+    topics, scores = await asyncio.to_thread(learner_profiles.score_matrix, request.learnerIds, defaults)
+    totals = allocate_largest_remainder_batch(topic_weights_batch(scores), EXAM_TOTAL_QUESTIONS)
+    msqs = allocate_largest_remainder_batch(totals, EXAM_MSQ_COUNT)
+    return JSONResponse({
+        "topics": topics,
+        "totalQuestions": EXAM_TOTAL_QUESTIONS,
+        "allocations": {
+            learner_id: {"questions": totals[i].tolist(), "msq": msqs[i].tolist()}
+            for i, learner_id in enumerate(request.learnerIds)
+        }
+    })
+
 @app.get("/api/exam")
-async def get_exam_questions(type: str = "bronze-to-silver"):
+async def get_exam_questions(type: str = "bronze-to-silver", learnerId: Optional[str] = None):
     try:
-        questions, difficulty = generate_exam_questions(type)
+        questions, difficulty = await single_flight.run(
+            "exam",
+            {"exam_type": type, "learner_id": learnerId},
+            lambda: generate_exam_questions(type, learnerId),
+            fanout=EXAM_FANOUT
+        )
         
         # Adjust required score based on difficulty
         required_to_pass = 12 if type == "bronze-to-silver" else 15
+        question_dicts = [question.dict() for question in questions]
+        assessment_id = await asyncio.to_thread(assessment_store.save, "exam", difficulty, question_dicts, required_to_pass)
         
         return JSONResponse({
-            "questions": [question.dict() for question in questions],
+            "assessmentId": assessment_id,
+            "questions": question_dicts,
             "totalQuestions": len(questions),
             "requiredToPass": required_to_pass,
             "timeLimit": sum(q.timeLimit for q in questions),
@@ -1021,27 +1702,91 @@ async def get_exam_questions(type: str = "bronze-to-silver"):
         print(f"Error in exam endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-# Cleanup function to delete old files (can be called periodically)
-def cleanup_old_files(max_age_hours: int = 24):
-    """Delete files older than max_age_hours from the upload directory."""
+def get_assessment(assessment_id: str) -> Dict:
+    assessment = assessment_store.get(assessment_id)
+    if not assessment:
+        raise HTTPException(status_code=404, detail="Assessment not found")
+    return assessment
+
+@app.get("/api/exam/stream")
+async def stream_exam(type: str = "bronze-to-silver", learnerId: Optional[str] = None,
+                      format: Literal["ndjson", "sse"] = "ndjson"):
+    """Streams exam questions as each topic shard produces them, then a done event.
+
+    Questions are numbered in the order they are sent, so MCQs and MSQs of
+    different topics may be interleaved.
+    """
+    async def events():
+        try:
+            difficulty, shards_plan = await plan_exam(type, learnerId)
+            questions = []
+            shards = [stream_exam_shard(topic, num_mcq, num_msq, difficulty) for topic, num_mcq, num_msq in shards_plan]
+            async for question in merge_async_iterators(shards):
+                question.id = len(questions) + 1
+                questions.append(question)
+                yield {"event": "question", "question": question.dict()}
+
+            required_to_pass = 12 if type == "bronze-to-silver" else 15
+            question_dicts = [question.dict() for question in questions]
+            assessment_id = await asyncio.to_thread(assessment_store.save, "exam", difficulty, question_dicts, required_to_pass)
+            yield {
+                "event": "done",
+                "assessmentId": assessment_id,
+                "totalQuestions": len(questions),
+                "requiredToPass": required_to_pass,
+                "timeLimit": sum(q.timeLimit for q in questions),
+                "difficulty": difficulty
+            }
+        except Exception as e:
+            print(f"Error in exam stream: {str(e)}")
+            yield {"event": "error", "detail": str(e)}
+
+    return event_stream_response(events(), format)
+
+@app.post("/api/grade")
+async def grade_assessment(request: GradeRequest):
+    if request.applyToScores and not request.learnerId:
+        raise HTTPException(status_code=400, detail="learnerId is required when applyToScores is set")
     try:
-        current_time = time.time()
-        for filename in os.listdir(UPLOAD_DIR):
-            file_path = os.path.join(UPLOAD_DIR, filename)
-            # Skip if not a file
-            if not os.path.isfile(file_path):
-                continue
-                
-            # Check file age
-            file_age_hours = (current_time - os.path.getctime(file_path)) / 3600
-            if file_age_hours > max_age_hours:
-                try:
-                    os.remove(file_path)
-                    print(f"Deleted old file: {filename}")
-                except Exception as e:
-                    print(f"Error deleting {filename}: {str(e)}")
+        assessment = await asyncio.to_thread(get_assessment, request.assessmentId)
+        result = grade_attempt(
+            assessment["questions"],
+            request.answers,
+            required_to_pass=assessment["requiredToPass"],
+            msq_rule=request.msqRule or DEFAULT_MSQ_RULE
+        )
+        if request.applyToScores:
+            scores = await asyncio.to_thread(AssessmentScores, request.learnerId)
+            result["assessmentScores"] = scores.apply_accuracy(result["topicAccuracy"])
+            await asyncio.to_thread(scores.save)
+        return JSONResponse({"assessmentId": request.assessmentId, **result})
+    except HTTPException as e:
+        raise e
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        print(f"Error during cleanup: {str(e)}")
+        print(f"Error grading assessment: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/grade/cohort")
+async def grade_assessment_cohort(request: CohortGradeRequest):
+    try:
+        assessment = await asyncio.to_thread(get_assessment, request.assessmentId)
+        result = await asyncio.to_thread(
+            grade_cohort,
+            assessment["questions"],
+            request.attempts,
+            assessment["requiredToPass"],
+            request.msqRule or DEFAULT_MSQ_RULE
+        )
+        return JSONResponse({"assessmentId": request.assessmentId, **result})
+    except HTTPException as e:
+        raise e
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error grading cohort: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
 
 # --- Deep Research Models ---
 class SerpQuery(BaseModel):
@@ -1096,13 +1841,7 @@ def system_prompt() -> str:
 
 def trim_prompt(prompt: str, context_size: int = 128_000) -> str:
     """Trims the prompt to fit within the context size using tiktoken."""
-    encoding = get_encoding("cl100k_base")  # Correct encoding for o3 models
-    tokens = encoding.encode(prompt)
-
-    if len(tokens) <= context_size:
-        return prompt
-
-    return encoding.decode(tokens[:context_size])
+    return tokenizer.trim(prompt, context_size)
 
 async def generate_serp_queries(query: str, num_queries: int = 3, learnings: Optional[List[str]] = None) -> List[SerpQuery]:
     """Generates SERP queries using the LLM."""
@@ -1124,25 +1863,17 @@ async def generate_serp_queries(query: str, num_queries: int = 3, learnings: Opt
     if learnings:
         prompt += f"""\n\nHere are some learnings from previous research, use them to generate more specific queries: {', '.join(learnings)}"""
 
-    model = genai.GenerativeModel('gemini-2.0-flash')
-    response = await asyncio.to_thread(
-        model.generate_content,
+    response = await llm.generate(
+        "serp_queries",
         contents=[system_prompt(), prompt],
         generation_config={"temperature": 0.7, "max_output_tokens": 4096}
     )
 
     try:
-        response_text = response.text.strip()
-        # Remove any markdown code block markers if present
-        response_text = response_text.replace('```json', '').replace('```', '').strip()
-        
         try:
-            # Try to parse as JSON first
-            data = json.loads(response_text)
-            if isinstance(data, dict) and "queries" in data:
-                return [SerpQuery(**q) for q in data["queries"][:num_queries]]
-        except json.JSONDecodeError:
-            print(f"Failed to parse JSON response: {response_text[:200]}")  # Print first 200 chars for debugging
+            return parse_model(response.text, SerpQueries).queries[:num_queries]
+        except JSONExtractionError:
+            print(f"Failed to parse JSON response: {response.text[:200]}")  # Print first 200 chars for debugging
             # Return empty list if parsing fails
             return []
 
@@ -1153,16 +1884,11 @@ async def generate_serp_queries(query: str, num_queries: int = 3, learnings: Opt
 async def process_serp_result(query: str, result: Dict, num_learnings: int = 3, num_follow_up_questions: int = 3) -> LearningsAndFollowUp:
     """Processes a single SERP result and extracts learnings."""
     try:
-        # Extract markdown content from search results
-        contents = []
-        for item in result.get('data', []):
-            if isinstance(item, dict) and item.get('markdown'):
-                content = trim_prompt(item['markdown'], 25_000)
-                contents.append(content)
-            elif isinstance(item, str):
-                content = trim_prompt(item, 25_000)
-                contents.append(content)
-                
+        # Extract markdown content from search results and trim every page in parallel
+        pages = [item['markdown'] if isinstance(item, dict) else item for item in result.get('data', [])
+                 if (isinstance(item, dict) and item.get('markdown')) or isinstance(item, str)]
+        contents = await asyncio.to_thread(tokenizer.trim_many, pages, 25_000)
+
         print(f"Ran {query}, found {len(contents)} contents") # Debug Log
 
         if not contents:
@@ -1183,26 +1909,21 @@ Return the response in this JSON format:
 
 <contents>{content_string}</contents>"""
 
-        model = genai.GenerativeModel('gemini-2.0-flash')
-        response = await asyncio.to_thread(
-            model.generate_content,
+        response = await llm.generate(
+            "serp_learnings",
             contents=[system_prompt(), prompt],
             generation_config={"temperature": 0.7, "max_output_tokens": 4096}
         )
 
-        # Clean and parse the response
         response_text = response.text.strip()
-        response_text = response_text.replace('```json', '').replace('```', '').strip()
-        
         try:
-            # Try to parse as JSON first
-            data = json.loads(response_text)
+            data = extract_json(response_text)
             if isinstance(data, dict):
                 return LearningsAndFollowUp(
                     learnings=data.get("learnings", [])[:num_learnings],
                     followUpQuestions=data.get("followUpQuestions", [])[:num_follow_up_questions]
                 )
-        except json.JSONDecodeError:
+        except JSONExtractionError:
             print(f"Failed to parse JSON response: {response_text[:200]}")  # Print first 200 chars for debugging
             
         # If JSON parsing fails, try to extract content directly from text
@@ -1232,7 +1953,9 @@ Return the response in this JSON format:
 async def write_final_report(prompt: str, learnings: List[str], visited_urls: List[str]) -> str:
     """Generates the final report."""
     try:
-        learnings_string = trim_prompt('\n'.join(f"<learning>\n{learning}\n</learning>" for learning in learnings), 150_000)
+        learnings_string = await asyncio.to_thread(
+            trim_prompt, '\n'.join(f"<learning>\n{learning}\n</learning>" for learning in learnings), 150_000
+        )
         prompt_text = f"""Given the following prompt from the user, write a final report on the topic using the learnings from research. Make it as detailed as possible, aim for 3 or more pages, include ALL the learnings from research.
 
 Return the report in this JSON format:
@@ -1247,33 +1970,22 @@ Learnings from research:
 {learnings_string}
 </learnings>"""
 
-        model = genai.GenerativeModel('gemini-2.0-flash')
-        response = await asyncio.to_thread(
-            model.generate_content,
+        response = await llm.generate(
+            "final_report",
             contents=[system_prompt(), prompt_text],
             generation_config={"temperature": 0.7, "max_output_tokens": 4096}
         )
 
-        # Clean and parse the response
         response_text = response.text.strip()
-        # Remove any markdown code block markers if present
-        response_text = response_text.replace('```json', '').replace('```', '').strip()
-        
         try:
-            # Try to parse as JSON first
-            data = json.loads(response_text)
-            if isinstance(data, dict) and "reportMarkdown" in data:
-                report = data["reportMarkdown"]
-            else:
-                # If JSON is valid but doesn't have reportMarkdown, use the whole response
-                report = response_text
-        except json.JSONDecodeError:
-            # If JSON parsing fails, use the raw text as the report
+            report = parse_model(response_text, FinalReport).reportMarkdown
+        except (JSONExtractionError, ValidationError):
+            # Without a usable reportMarkdown field, use the raw text as the report
             report = response_text
 
         # Add sources section
         if visited_urls:
-            urls_section = "\n\n## Sources\n\n" + "\n".join(f"- {url}" for url in visited_urls)
+            urls_section = "\n\n## Sources\n\n" + "\n".join(f"- {url}" for url in dict.fromkeys(visited_urls))
             report += urls_section
 
         return report
@@ -1289,7 +2001,7 @@ Learnings from research:
 
 ## Sources
 
-{chr(10).join(f'- {url}' for url in visited_urls)}
+{chr(10).join(f'- {url}' for url in dict.fromkeys(visited_urls))}
 """
 
 async def generate_feedback(query: str, num_questions: int = 3) -> List[str]:
@@ -1301,24 +2013,16 @@ async def generate_feedback(query: str, num_questions: int = 3) -> List[str]:
         {{"questions": ["question1", "question2", "question3"]}}
         """
 
-        model = genai.GenerativeModel('gemini-2.0-flash')
-        response = await asyncio.to_thread(
-            model.generate_content,
+        response = await llm.generate(
+            "feedback",
             contents=[system_prompt(), prompt],
             generation_config={"temperature": 0.7, "max_output_tokens": 4096}
         )
 
-        # Clean and parse the response
         response_text = response.text.strip()
-        # Remove any markdown code block markers if present
-        response_text = response_text.replace('```json', '').replace('```', '').strip()
-        
         try:
-            # Try to parse as JSON first
-            data = json.loads(response_text)
-            if isinstance(data, dict) and "questions" in data:
-                return data["questions"][:num_questions]
-        except json.JSONDecodeError:
+            return parse_model(response_text, FeedbackQuestions).questions[:num_questions]
+        except (JSONExtractionError, ValidationError):
             # If JSON parsing fails, try to extract questions directly from text
             # Split by newlines and clean up
             questions = [line.strip() for line in response_text.split('\n') 
@@ -1331,8 +2035,47 @@ async def generate_feedback(query: str, num_questions: int = 3) -> List[str]:
                 "What specific aspects are you most interested in?",
                 "What is the main goal of your research?"]
 
-async def process_single_query(query: str, depth: int, visited_urls: List[str], learnings: List[str]) -> None:
-    """Process a single SERP query and update global state."""
+async def fetch_search(query: str, options: Dict, key: str) -> Dict:
+    """Runs a Firecrawl search and caches the response if it has results."""
+    response = await asyncio.to_thread(firecrawl.search, query, options)
+    if isinstance(response, dict) and 'error' not in response and response.get('data'):
+        await asyncio.to_thread(search_cache.put, key, query, response)
+    return response
+
+async def refresh_search(query: str, options: Dict, key: str) -> None:
+    try:
+        await single_flight.run("firecrawl_search", {"key": key}, lambda: fetch_search(query, options, key))
+    except Exception as e:
+        print(f"Error refreshing cached search '{query}': {e}")
+    finally:
+        search_refreshes.pop(key, None)
+
+async def cached_search(query: str, options: Dict) -> Dict:
+    """Firecrawl search through the search cache.
+
+    Fresh entries are returned without a request. Stale entries (only kept
+    when SEARCH_CACHE_STALE_SECONDS is set) are returned too, with one
+    background refresh per key. Concurrent misses for the same key share one
+    search.
+    """
+    key = search_key(query, options)
+    cached = await asyncio.to_thread(search_cache.get, key)
+    if cached:
+        response, fresh = cached
+        if not fresh and key not in search_refreshes:
+            search_refreshes[key] = asyncio.create_task(refresh_search(query, options, key))
+        return response
+    return await single_flight.run("firecrawl_search", {"key": key}, lambda: fetch_search(query, options, key))
+
+async def process_single_query(query: str, depth: int, visited_urls: List[str], learnings: List[str], on_event=None,
+                               documents: Optional[DocumentRegistry] = None) -> None:
+    """Process a single SERP query and update global state, reporting each new URL and learning to on_event.
+
+    Pages already claimed in documents (by canonical URL or content) are
+    skipped before the model sees them; pages no learnings could be drawn
+    from are released again for later queries.
+    """
+    documents = documents or DocumentRegistry()
     try:
         # Check if Firecrawl is properly initialized
         if not firecrawl or not hasattr(firecrawl, 'api_key'):
@@ -1347,8 +2090,7 @@ async def process_single_query(query: str, depth: int, visited_urls: List[str],
 
         # Use Firecrawl to perform the search with options
         try:
-            search_response = await asyncio.to_thread(
-                firecrawl.search,
+            search_response = await cached_search(
                 query,
                 {
                     "timeout": 15000,
@@ -1367,16 +2109,43 @@ async def process_single_query(query: str, depth: int, visited_urls: List[str],
 
             # Process search results if data field exists
             if 'data' in search_response and search_response['data']:
-                # Update visited URLs
-                new_urls = [item.get('url') for item in search_response['data'] if item.get('url')]
+                # Keep only pages this job has not read yet; canonical keys are only for deduplication
+                keys, new_urls, contents, skipped = [], [], [], 0
+                for item in search_response['data']:
+                    key = documents.claim(item.get('url'), item.get('markdown'))
+                    if key is None:
+                        skipped += 1
+                        continue
+                    keys.append(key)
+                    if item.get('url'):
+                        new_urls.append(item['url'])
+                    if item.get('markdown'):
+                        contents.append(item['markdown'])
+                if skipped:
+                    print(f"Skipping {skipped} already processed pages for '{query}'")
+
+                # Summarise the new pages; if nothing could be drawn from them, release them for a later query
+                processed_result = None
+                if contents:
+                    try:
+                        processed_result = await process_serp_result(query, {"data": contents})
+                    finally:
+                        if not (processed_result and processed_result.learnings):
+                            for key in keys:
+                                documents.release(key)
+
+                # Update visited URLs, including pages nothing could be learned from
                 visited_urls.extend(new_urls)
+                if on_event:
+                    for url in new_urls:
+                        await on_event({"event": "url", "url": url, "query": query})
 
-                # Process content and update learnings
-                contents = [item.get('markdown') for item in search_response['data'] if item.get('markdown')]
-                if contents:
-                    processed_result = await process_serp_result(query, {"data": contents})
-                    if processed_result and processed_result.learnings:
-                        learnings.extend(processed_result.learnings)
+                if processed_result and processed_result.learnings:
+                    new_learnings = documents.add_learnings(processed_result.learnings, new_urls)
+                    learnings.extend(new_learnings)
+                    if on_event:
+                        for learning in new_learnings:
+                            await on_event({"event": "learning", "learning": learning, "urls": new_urls, "query": query})
 
         except Exception as e:
             error_msg = str(e).lower()
@@ -1395,16 +2164,18 @@ async def process_single_query(query: str, depth: int, visited_urls: List[str],
             "visitedUrls": []
         }
 
-async def deep_research(query: str, breadth: int, depth: int, learnings: Optional[List[str]] = None, visited_urls: Optional[List[str]] = None, on_progress=None) -> Dict:
+async def deep_research(query: str, breadth: int, depth: int, learnings: Optional[List[str]] = None, visited_urls: Optional[List[str]] = None, on_progress=None, on_event=None,
+                        documents: Optional[DocumentRegistry] = None) -> Dict:
     """Main deep research function."""
     learnings = learnings or []
     visited_urls = visited_urls or []
+    documents = documents or DocumentRegistry()  # Shared by every query of the job
     total_queries = 0
     completed_queries = 0
 
     async def process_query(current_query: str, current_depth: int):
         nonlocal completed_queries, total_queries
-        await process_single_query(current_query, current_depth, visited_urls, learnings)
+        await process_single_query(current_query, current_depth, visited_urls, learnings, on_event, documents)
         completed_queries += 1
         if on_progress:
             progress_data = ResearchProgress(
@@ -1420,10 +2191,12 @@ async def deep_research(query: str, breadth: int, depth: int, learnings: Optiona
 
     for d in range(depth):
         print(f"Starting depth level {d + 1}") # Debug Log
-        if d == 0:
-            serp_queries = await generate_serp_queries(query=query, num_queries=breadth, learnings=None)  # First level
-        else:
-            serp_queries = await generate_serp_queries(query=query, num_queries=breadth, learnings=learnings) # Subsequent levels
+        level_learnings = None if d == 0 else list(learnings)  # First level has no learnings yet
+        serp_queries = await single_flight.run(
+            "serp_queries",
+            {"query": query, "num_queries": breadth, "learnings": level_learnings},
+            lambda: generate_serp_queries(query=query, num_queries=breadth, learnings=level_learnings)
+        )
 
         total_queries += len(serp_queries)
         if on_progress:
@@ -1441,79 +2214,158 @@ async def deep_research(query: str, breadth: int, depth: int, learnings: Optiona
         tasks = [process_query(q.query, d+1) for q in serp_queries]
         await asyncio.gather(*tasks)
 
-    return {"learnings": learnings, "visitedUrls": visited_urls}
+    print(f"Research documents: {documents.stats()}") # Debug Log
+    return {
+        "learnings": learnings,
+        "visitedUrls": visited_urls,
+        "learningSources": documents.learning_sources(),
+        "documents": documents.stats()
+    }
+
+async def run_deep_research(request: DeepResearchRequest, on_progress=None, on_event=None) -> Dict:
+    """Follow-up questions, research and final report for one request.
+
+    on_progress receives each ResearchProgress snapshot and on_event each
+    follow-up, learning and URL event as they happen; the returned dict is
+    the complete result.
+    """
+    # Generate follow-up questions
+    follow_up_questions = await single_flight.run(
+        "feedback",
+        {"query": request.query},
+        lambda: generate_feedback(request.query)
+    )
+    print(f"Follow-up questions: {follow_up_questions}") # Debug Log
+    if on_event:
+        await on_event({"event": "followUpQuestions", "followUpQuestions": follow_up_questions})
 
-@app.post("/api/deep-research")
-async def api_deep_research(request: DeepResearchRequest):
-    """API endpoint for deep research."""
-    try:
-        # Generate follow-up questions
-        follow_up_questions = await generate_feedback(request.query)
-        print(f"Follow-up questions: {follow_up_questions}") # Debug Log
-
-        # If only getting follow-up questions, return early
-        if request.get_follow_up_only:
-            return JSONResponse({
-                "followUpQuestions": follow_up_questions,
-                "query": {
-                    "original": request.query,
-                    "enhanced": None
-                }
-            })
+    # If only getting follow-up questions, return early
+    if request.get_follow_up_only:
+        return {
+            "followUpQuestions": follow_up_questions,
+            "query": {
+                "original": request.query,
+                "enhanced": None
+            }
+        }
 
-        # If course_id is provided, get course content to enhance research
-        course_content = ""
-        if request.course_id:
-            try:
-                course_content = get_course_topic(request.course_id)
-                print(f"Retrieved course content for course {request.course_id}")
-            except Exception as e:
-                print(f"Error getting course content: {e}")
-
-        # Enhance query with course content if available
-        enhanced_query = request.query
-        if course_content:
-            enhanced_query = f"{request.query}\n\nContext from course: {course_content}"
-
-        # Initialize progress tracking
-        progress_updates = []
-        async def track_progress(progress: Dict):
-            progress_updates.append(progress)
-            print(f"Research Progress: {progress}")
-
-        # Perform deep research
-        research_results = await deep_research(
-            query=enhanced_query,
-            breadth=request.breadth,
-            depth=request.depth,
-            on_progress=track_progress
-        )
+    # If course_id is provided, get course content to enhance research
+    course_content = ""
+    if request.course_id:
+        try:
+            course_content = get_course_topic(request.course_id)
+            passages = await asyncio.to_thread(get_course_passages, request.course_id, request.query, RESEARCH_CONTEXT_TOKENS)
+            if passages:
+                course_content = f"{course_content}\n\n{passages}"
+            print(f"Retrieved course content for course {request.course_id}")
+        except Exception as e:
+            print(f"Error getting course content: {e}")
+
+    # Enhance query with course content if available
+    enhanced_query = request.query
+    if course_content:
+        enhanced_query = f"{request.query}\n\nContext from course: {course_content}"
+
+    # Initialize progress tracking
+    progress_updates = []
+    async def track_progress(progress: Dict):
+        progress_updates.append(progress)
+        print(f"Research Progress: {progress}")
+        if on_progress:
+            await on_progress(progress)
+
+    # Perform deep research
+    research_results = await deep_research(
+        query=enhanced_query,
+        breadth=request.breadth,
+        depth=request.depth,
+        on_progress=track_progress,
+        on_event=on_event
+    )
 
-        # Generate final report
-        final_report = await write_final_report(
+    # Generate final report
+    final_report = await single_flight.run(
+        "final_report",
+        {"prompt": enhanced_query, "learnings": research_results["learnings"], "visited_urls": research_results["visitedUrls"]},
+        lambda: write_final_report(
             prompt=enhanced_query,
             learnings=research_results["learnings"],
             visited_urls=research_results["visitedUrls"]
         )
+    )
 
-        return JSONResponse({
-            "report": final_report,
-            "followUpQuestions": follow_up_questions,
-            "learnings": research_results["learnings"],
-            "visitedUrls": research_results["visitedUrls"],
-            "progress": progress_updates,
-            "query": {
-                "original": request.query,
-                "enhanced": enhanced_query if course_content else None
-            }
-        })
+    return {
+        "report": final_report,
+        "followUpQuestions": follow_up_questions,
+        "learnings": research_results["learnings"],
+        "visitedUrls": research_results["visitedUrls"],
+        "learningSources": research_results["learningSources"],
+        "documents": research_results["documents"],
+        "progress": progress_updates,
+        "query": {
+            "original": request.query,
+            "enhanced": enhanced_query if course_content else None
+        }
+    }
 
+@app.post("/api/deep-research")
+async def api_deep_research(request: DeepResearchRequest):
+    """API endpoint for deep research."""
+    try:
+        return JSONResponse(await run_deep_research(request))
     except Exception as e:
         print(f"Error in deep research endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/deep-research/stream")
+async def stream_deep_research(request: DeepResearchRequest, http_request: Request):
+    """Streams deep research as server-sent events.
+
+    Sends followUpQuestions, progress, learning and url events while the
+    research runs, then a report event with the same body as
+    /api/deep-research (or an error event). A comment line goes out whenever
+    nothing else has for DEEP_RESEARCH_HEARTBEAT_SECONDS so proxies keep the
+    connection open. If the client disconnects, the research task is
+    cancelled, which stops any Firecrawl searches and Gemini calls that have
+    not started yet.
+    """
+    events: asyncio.Queue = asyncio.Queue()
+
+    async def on_progress(progress: Dict):
+        await events.put({"event": "progress", "progress": progress})
+
+    async def research():
+        try:
+            result = await run_deep_research(request, on_progress=on_progress, on_event=events.put)
+            await events.put({"event": "report", **result})
+        except Exception as e:
+            print(f"Error in deep research stream: {str(e)}")
+            await events.put({"event": "error", "detail": str(e)})
+
+    async def event_stream():
+        task = asyncio.create_task(research())
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(events.get(), timeout=DEEP_RESEARCH_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await http_request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+                if event["event"] in ("report", "error"):
+                    break
+                if await http_request.is_disconnected():
+                    break
+        finally:
+            if not task.done():
+                print("Deep research client disconnected, cancelling remaining work")
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 if __name__ == "__main__":
     import uvicorn
-    # Run cleanup on startup
-    cleanup_old_files()
     uvicorn.run(app, host="0.0.0.0", port=3001) 
\ No newline at end of file
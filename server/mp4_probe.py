@@ -0,0 +1,188 @@
+import os
+import struct
+from typing import Optional, Dict, List, BinaryIO, Iterator, Tuple
+
+# Container boxes we descend into to reach track metadata
+CONTAINER_BOXES = {b"moov", b"trak", b"mdia", b"minf", b"stbl"}
+
+# Refuse to read absurdly large header boxes (a moov is normally a few MB at most)
+MAX_HEADER_BOX_SIZE = 64 * 1024 * 1024
+
+
+class ProbeError(Exception):
+    pass
+
+
+def _iter_boxes(f: BinaryIO, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """Yields (type, payload_offset, box_end) for the boxes between start and end.
+
+    Only the 8 or 16 byte box headers are read; payloads are skipped with seeks,
+    so walking past a multi-gigabyte mdat costs the same as a tiny one.
+    """
+    offset = start
+    while offset + 8 <= end:
+        f.seek(offset)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack(">I4s", header)
+        header_size = 8
+        if size == 1:
+            large = f.read(8)
+            if len(large) < 8:
+                return
+            size = struct.unpack(">Q", large)[0]
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size:
+            raise ProbeError(f"Invalid size for box {box_type!r} at offset {offset}")
+        box_end = min(offset + size, end)
+        yield box_type, offset + header_size, box_end
+        offset += size
+
+
+def _read_payload(f: BinaryIO, payload_offset: int, box_end: int) -> bytes:
+    length = box_end - payload_offset
+    if length > MAX_HEADER_BOX_SIZE:
+        raise ProbeError("Header box too large")
+    f.seek(payload_offset)
+    return f.read(length)
+
+
+def _parse_mvhd(data: bytes) -> Dict:
+    version = data[0]
+    if version == 1:
+        timescale, duration = struct.unpack_from(">IQ", data, 20)
+    else:
+        timescale, duration = struct.unpack_from(">II", data, 12)
+    return {"timescale": timescale, "duration": duration}
+
+
+def _parse_mehd(data: bytes) -> int:
+    """Fragment duration of a fragmented file, in the movie timescale."""
+    if data[0] == 1:
+        return struct.unpack_from(">Q", data, 4)[0]
+    return struct.unpack_from(">I", data, 4)[0]
+
+
+def _parse_tkhd(data: bytes) -> Dict:
+    version = data[0]
+    # width and height are the last two 16.16 fixed point fields of the box
+    base = 88 if version == 1 else 76
+    width, height = struct.unpack_from(">II", data, base)
+    return {"width": width >> 16, "height": height >> 16}
+
+
+def _parse_mdhd(data: bytes) -> Dict:
+    version = data[0]
+    if version == 1:
+        timescale, duration = struct.unpack_from(">IQ", data, 20)
+    else:
+        timescale, duration = struct.unpack_from(">II", data, 12)
+    return {"timescale": timescale, "duration": duration}
+
+
+def _parse_stsd(data: bytes, handler: Optional[str]) -> Dict:
+    entry_count = struct.unpack_from(">I", data, 4)[0]
+    if entry_count == 0 or len(data) < 16:
+        return {}
+    codec = data[12:16].decode("latin-1")
+    entry = data[16:]
+    info = {"codec": codec}
+    if handler == "vide" and len(entry) >= 28:
+        info["width"], info["height"] = struct.unpack_from(">HH", entry, 24)
+    elif handler == "soun" and len(entry) >= 28:
+        info["channels"] = struct.unpack_from(">H", entry, 16)[0]
+        info["sampleRate"] = struct.unpack_from(">I", entry, 24)[0] >> 16
+    return info
+
+
+def _parse_trak(f: BinaryIO, start: int, end: int) -> Dict:
+    track: Dict = {}
+    stack = [(start, end)]
+    stsd_box = None
+    while stack:
+        box_start, box_end = stack.pop()
+        for box_type, payload, child_end in _iter_boxes(f, box_start, box_end):
+            if box_type in CONTAINER_BOXES:
+                stack.append((payload, child_end))
+            elif box_type == b"tkhd":
+                track.update(_parse_tkhd(_read_payload(f, payload, child_end)))
+            elif box_type == b"mdhd":
+                mdhd = _parse_mdhd(_read_payload(f, payload, child_end))
+                if mdhd["timescale"]:
+                    track["duration"] = mdhd["duration"] / mdhd["timescale"]
+            elif box_type == b"hdlr":
+                data = _read_payload(f, payload, child_end)
+                track["handler"] = data[8:12].decode("latin-1")
+            elif box_type == b"stsd":
+                stsd_box = (payload, child_end)
+    # stsd is interpreted after hdlr so we know whether it describes video or audio
+    if stsd_box:
+        track.update(_parse_stsd(_read_payload(f, *stsd_box), track.get("handler")))
+    return track
+
+
+def probe_file(f: BinaryIO, file_size: int) -> Dict:
+    """Reads MP4/MOV header atoms from an open file and returns container metadata."""
+    moov = None
+    brand = None
+    for box_type, payload, box_end in _iter_boxes(f, 0, file_size):
+        if box_type == b"ftyp":
+            f.seek(payload)
+            brand = f.read(4).decode("latin-1")
+        elif box_type == b"moov":
+            moov = (payload, box_end)
+            break
+    if moov is None:
+        raise ProbeError("No moov box found; not an MP4/MOV file or upload incomplete")
+
+    timescale = 0
+    movie_duration = 0
+    fragment_duration = 0
+    tracks: List[Dict] = []
+    for box_type, payload, box_end in _iter_boxes(f, *moov):
+        if box_type == b"mvhd":
+            mvhd = _parse_mvhd(_read_payload(f, payload, box_end))
+            timescale, movie_duration = mvhd["timescale"], mvhd["duration"]
+        elif box_type == b"mvex":
+            for child_type, child_payload, child_end in _iter_boxes(f, payload, box_end):
+                if child_type == b"mehd":
+                    fragment_duration = _parse_mehd(_read_payload(f, child_payload, child_end))
+        elif box_type == b"trak":
+            tracks.append(_parse_trak(f, payload, box_end))
+
+    # Fragmented files usually leave mvhd and mdhd at 0 and give the total in mvex/mehd, if at all;
+    # a duration nobody recorded is reported as unknown rather than as 0 seconds
+    duration = None
+    if timescale and (movie_duration or fragment_duration):
+        duration = (movie_duration or fragment_duration) / timescale
+    elif any(t.get("duration") for t in tracks):
+        duration = max(t["duration"] for t in tracks if t.get("duration"))
+
+    video = next((t for t in tracks if t.get("handler") == "vide"), None)
+    audio = next((t for t in tracks if t.get("handler") == "soun"), None)
+    return {
+        "brand": brand,
+        "size": file_size,
+        "duration": duration,
+        "width": video.get("width") if video else None,
+        "height": video.get("height") if video else None,
+        "videoCodec": video.get("codec") if video else None,
+        "hasVideo": video is not None,
+        "hasAudio": audio is not None,
+        "audioCodec": audio.get("codec") if audio else None,
+        "audioChannels": audio.get("channels") if audio else None,
+        "audioSampleRate": audio.get("sampleRate") if audio else None
+    }
+
+
+def probe_mp4(path: str) -> Dict:
+    """Returns container metadata for an MP4/MOV file without decoding any media."""
+    with open(path, "rb") as f:
+        try:
+            return probe_file(f, os.path.getsize(path))
+        except (struct.error, UnicodeDecodeError, IndexError) as e:
+            # IndexError: a header box too short to hold even its version byte
+            raise ProbeError(f"Malformed header atoms: {str(e)}")
@@ -0,0 +1,159 @@
+import os
+import re
+import json
+import time
+import random
+import sqlite3
+import hashlib
+import threading
+from array import array
+from typing import Optional, Dict, List, Tuple, Set
+
+# MinHash signature length and LSH banding (bands * rows must equal NUM_PERM)
+NUM_PERM = 64
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERM // LSH_BANDS
+SHINGLE_SIZE = 5
+
+# Estimated Jaccard similarity above which a question counts as a near-duplicate
+DUPLICATE_THRESHOLD = float(os.getenv("QUESTION_BANK_DUPLICATE_THRESHOLD", "0.8"))
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(1)
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME)) for _ in range(NUM_PERM)]
+
+
+def shingles(text: str) -> Set[str]:
+    """Character n-grams of the normalized text (lowercase, punctuation collapsed).
+
+    Character shingles keep rewordings such as "primary" -> "main" close, where
+    word shingles would lose every n-gram that spans the changed word.
+    """
+    normalized = " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+    if len(normalized) <= SHINGLE_SIZE:
+        return {normalized}
+    return {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+
+
+def minhash(text: str) -> List[int]:
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") for s in shingles(text)]
+    return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def similarity(sig_a: List[int], sig_b: List[int]) -> float:
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+
+def question_text(question: Dict) -> str:
+    return " ".join([question["question"], *question["options"]])
+
+
+class QuestionBank:
+    """SQLite bank of validated questions with MinHash near-duplicate rejection.
+
+    Each stored question keeps a MinHash signature of its question and option
+    text. Signatures are indexed in memory with LSH bands (rebuilt at startup)
+    so a new question is only compared against likely duplicates. Exams are
+    assembled by sampling per (topic, type) stratum.
+    """
+
+    def __init__(self, path: str, threshold: float = DUPLICATE_THRESHOLD):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.threshold = threshold
+        self.inserted = 0
+        self.duplicates = 0
+        self._signatures: Dict[int, List[int]] = {}
+        self._bands: Dict[Tuple[int, Tuple[int, ...]], Set[int]] = {}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS questions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                topic TEXT NOT NULL,
+                difficulty TEXT NOT NULL,
+                type TEXT NOT NULL,
+                course_id TEXT,
+                question TEXT NOT NULL,
+                options TEXT NOT NULL,
+                correct_answers TEXT NOT NULL,
+                time_limit INTEGER NOT NULL,
+                signature BLOB NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS questions_stratum ON questions(difficulty, topic, type);
+        """)
+        self._db.commit()
+        for row in self._db.execute("SELECT id, signature FROM questions"):
+            self._index(row["id"], list(array("Q", row["signature"])))
+
+    def _band_keys(self, signature: List[int]):
+        for band in range(LSH_BANDS):
+            yield band, tuple(signature[band * LSH_ROWS:(band + 1) * LSH_ROWS])
+
+    def _index(self, question_id: int, signature: List[int]) -> None:
+        self._signatures[question_id] = signature
+        for key in self._band_keys(signature):
+            self._bands.setdefault(key, set()).add(question_id)
+
+    def find_duplicate(self, signature: List[int]) -> Optional[int]:
+        candidates = set()
+        for key in self._band_keys(signature):
+            candidates |= self._bands.get(key, set())
+        for candidate in candidates:
+            if similarity(signature, self._signatures[candidate]) >= self.threshold:
+                return candidate
+        return None
+
+    def add(self, question: Dict, difficulty: str, course_id: Optional[str] = None) -> Optional[int]:
+        """Stores a validated question; returns its ID, or None if it is a near-duplicate."""
+        signature = minhash(question_text(question))
+        with self._lock:
+            if self.find_duplicate(signature) is not None:
+                self.duplicates += 1
+                return None
+            cursor = self._db.execute(
+                "INSERT INTO questions (topic, difficulty, type, course_id, question, options, correct_answers, "
+                "time_limit, signature, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (question.get("topic", "General"), difficulty, question["type"], course_id, question["question"],
+                 json.dumps(question["options"]), json.dumps(question["correctAnswers"]),
+                 question.get("timeLimit", 600), array("Q", signature).tobytes(), time.time())
+            )
+            self._db.commit()
+            self._index(cursor.lastrowid, signature)
+            self.inserted += 1
+            return cursor.lastrowid
+
+    def add_many(self, questions: List[Dict], difficulty: str, course_id: Optional[str] = None) -> List[Optional[int]]:
+        return [self.add(question, difficulty, course_id) for question in questions]
+
+    def sample(self, difficulty: str, topic: str, question_type: str, count: int) -> List[Dict]:
+        """Returns up to count random questions from one (difficulty, topic, type) stratum."""
+        if count <= 0:
+            return []
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, topic, type, question, options, correct_answers, time_limit FROM questions "
+                "WHERE difficulty = ? AND topic = ? AND type = ? ORDER BY RANDOM() LIMIT ?",
+                (difficulty, topic, question_type, count)
+            ).fetchall()
+        return [{
+            "id": row["id"],
+            "type": row["type"],
+            "question": row["question"],
+            "options": json.loads(row["options"]),
+            "correctAnswers": json.loads(row["correct_answers"]),
+            "timeLimit": row["time_limit"],
+            "topic": row["topic"]
+        } for row in rows]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT difficulty, topic, type, COUNT(*) FROM questions GROUP BY difficulty, topic, type"
+            ).fetchall()
+        return {
+            "inserted": self.inserted,
+            "duplicatesRejected": self.duplicates,
+            "strata": [{"difficulty": d, "topic": t, "type": q, "count": c} for d, t, q, c in rows]
+        }
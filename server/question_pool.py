@@ -0,0 +1,141 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import threading
+from typing import Optional, Dict, List, Tuple, Callable, Awaitable
+
+QUIZ_POOL_SIZE = int(os.getenv("QUIZ_POOL_SIZE", "5"))
+QUIZ_POOL_LOW_WATER = int(os.getenv("QUIZ_POOL_LOW_WATER", "2"))
+
+# (difficulty, course_id) -> list of question dicts, or None if generation failed
+QuizGenerator = Callable[[str, str], Awaitable[Optional[List[Dict]]]]
+# course_id -> version string of the course content the quiz was generated from
+ContentVersion = Callable[[str], str]
+
+
+class QuizPool:
+    """Persistent pool of ready-made quiz sets per (course_id, difficulty).
+
+    take() hands out a stored set immediately and schedules a background
+    refill when the pool drops below the low-water mark. SQLite is only
+    touched from worker threads, never from the event loop. Every set records
+    the version of the course content it was generated from; sets for an
+    older version are discarded on access, so editing a course file
+    invalidates its pool.
+    """
+
+    def __init__(self, path: str, generator: QuizGenerator, content_version: ContentVersion,
+                 size: int = QUIZ_POOL_SIZE, low_water: int = QUIZ_POOL_LOW_WATER):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.generator = generator
+        self.content_version = content_version
+        self.size = size
+        self.low_water = low_water
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self._refills: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS quiz_sets (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                course_id TEXT NOT NULL,
+                difficulty TEXT NOT NULL,
+                content_version TEXT NOT NULL,
+                questions TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS quiz_sets_key ON quiz_sets(course_id, difficulty, id);
+        """)
+        self._db.commit()
+
+    def _count(self, course_id: str, difficulty: str, version: str) -> int:
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM quiz_sets WHERE course_id = ? AND difficulty = ? AND content_version = ?",
+                (course_id, difficulty, version)
+            ).fetchone()[0]
+
+    def _pop(self, course_id: str, difficulty: str, version: str) -> Optional[List[Dict]]:
+        with self._lock:
+            # Drop sets generated from an older version of the course content
+            self._db.execute(
+                "DELETE FROM quiz_sets WHERE course_id = ? AND difficulty = ? AND content_version != ?",
+                (course_id, difficulty, version)
+            )
+            row = self._db.execute(
+                "SELECT id, questions FROM quiz_sets WHERE course_id = ? AND difficulty = ? ORDER BY id LIMIT 1",
+                (course_id, difficulty)
+            ).fetchone()
+            if row:
+                self._db.execute("DELETE FROM quiz_sets WHERE id = ?", (row[0],))
+            self._db.commit()
+        return json.loads(row[1]) if row else None
+
+    def _push(self, course_id: str, difficulty: str, version: str, questions: List[Dict]) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO quiz_sets (course_id, difficulty, content_version, questions, created_at) VALUES (?, ?, ?, ?, ?)",
+                (course_id, difficulty, version, json.dumps(questions), time.time())
+            )
+            self._db.commit()
+
+    async def take(self, course_id: str, difficulty: str) -> Optional[List[Dict]]:
+        """Returns a ready quiz set (or None if the pool is empty) and tops the pool up."""
+        version = self.content_version(course_id)
+        questions = await asyncio.to_thread(self._pop, course_id, difficulty, version)
+        if questions is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        if await asyncio.to_thread(self._count, course_id, difficulty, version) < self.low_water:
+            self.refill(course_id, difficulty)
+        return questions
+
+    def refill(self, course_id: str, difficulty: str) -> None:
+        """Starts a background refill for the key unless one is already running."""
+        key = (course_id, difficulty)
+        task = self._refills.get(key)
+        if task and not task.done():
+            return
+        self._refills[key] = asyncio.create_task(self._refill(course_id, difficulty))
+
+    async def _refill(self, course_id: str, difficulty: str) -> None:
+        version = self.content_version(course_id)
+        needed = self.size - await asyncio.to_thread(self._count, course_id, difficulty, version)
+        if needed <= 0:
+            return
+        results = await asyncio.gather(
+            *(self.generator(difficulty, course_id) for _ in range(needed)),
+            return_exceptions=True
+        )
+        for questions in results:
+            if isinstance(questions, Exception):
+                print(f"Error refilling quiz pool {course_id}/{difficulty}: {str(questions)}")
+            elif questions:
+                await asyncio.to_thread(self._push, course_id, difficulty, version, questions)
+                self.generated += 1
+
+    async def stop(self) -> None:
+        for task in self._refills.values():
+            task.cancel()
+        await asyncio.gather(*self._refills.values(), return_exceptions=True)
+        self._refills = {}
+
+    def stats(self) -> Dict:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT course_id, difficulty, COUNT(*) FROM quiz_sets GROUP BY course_id, difficulty"
+            ).fetchall()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "generated": self.generated,
+            "size": self.size,
+            "lowWater": self.low_water,
+            "pools": {f"{course_id}/{difficulty}": count for course_id, difficulty, count in rows},
+            "refilling": [f"{c}/{d}" for (c, d), task in self._refills.items() if not task.done()]
+        }
@@ -0,0 +1,229 @@
+import os
+import time
+import random
+import sqlite3
+import asyncio
+import datetime
+import threading
+from typing import Optional, Dict
+
+import httpx
+
+# Base URL of the Gemini API. Point this at a local stand-in server for testing.
+GEMINI_API_BASE = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com")
+
+# Resumable upload chunks must be a multiple of 256 KiB
+REMOTE_CHUNK_SIZE = int(os.getenv("REMOTE_UPLOAD_CHUNK_SIZE", str(16 * 1024 * 1024)))
+REMOTE_CHUNK_RETRIES = 5
+
+# Remote files expire after 48h; stop reusing a handle this long before expiry
+EXPIRY_MARGIN_SECONDS = 3600
+
+
+class RemoteFileError(Exception):
+    pass
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[float]:
+    """Parses an RFC 3339 timestamp (with up to nanosecond precision) to epoch seconds."""
+    if not value:
+        return None
+    value = value.rstrip("Z")
+    if "." in value:
+        seconds, fraction = value.split(".", 1)
+        value = f"{seconds}.{fraction[:6]}"
+    return datetime.datetime.fromisoformat(value).replace(tzinfo=datetime.timezone.utc).timestamp()
+
+
+def backoff_delays(initial: float = 0.5, maximum: float = 10.0, factor: float = 2.0):
+    """Yields exponentially growing delays with full jitter."""
+    ceiling = initial
+    while True:
+        yield random.uniform(0, ceiling)
+        ceiling = min(maximum, ceiling * factor)
+
+
+class RemoteFileClient:
+    """Uploads local videos to the Gemini File API and reuses handles by digest.
+
+    Files are streamed from disk in REMOTE_CHUNK_SIZE pieces using the resumable
+    upload protocol; the next chunk is read from disk while the previous one is
+    in flight. A failed chunk is retried from the offset the server reports.
+    Processing status is polled with exponential backoff and jitter, and the
+    resulting handle is stored per content digest so the same video is only
+    uploaded once while the remote copy is alive.
+    """
+
+    def __init__(self, api_key: Optional[str], handle_db_path: str, base_url: str = GEMINI_API_BASE,
+                 chunk_size: int = REMOTE_CHUNK_SIZE):
+        os.makedirs(os.path.dirname(os.path.abspath(handle_db_path)), exist_ok=True)
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.chunk_size = chunk_size
+        self.uploads = 0
+        self.reused = 0
+        self._http: Optional[httpx.AsyncClient] = None
+        self._digest_locks: Dict[str, asyncio.Lock] = {}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(handle_db_path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS remote_files (
+                digest TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                uri TEXT NOT NULL,
+                mime_type TEXT NOT NULL,
+                expires_at REAL
+            );
+        """)
+        self._db.commit()
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"x-goog-api-key": self.api_key or ""},
+                timeout=httpx.Timeout(60.0, connect=10.0)
+            )
+        return self._http
+
+    async def close(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def get_file(self, name: str) -> Optional[Dict]:
+        response = await self.http.get(f"/v1beta/{name}")
+        if response.status_code in (403, 404):
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    async def _query_offset(self, upload_url: str) -> int:
+        response = await self.http.post(upload_url, headers={"X-Goog-Upload-Command": "query"})
+        response.raise_for_status()
+        return int(response.headers.get("X-Goog-Upload-Size-Received", "0"))
+
+    def _read_chunk(self, path: str, offset: int) -> bytes:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            return f.read(self.chunk_size)
+
+    async def upload(self, path: str, mime_type: str, display_name: str) -> Dict:
+        """Streams a file to the File API with the resumable protocol and returns the file resource."""
+        size = os.path.getsize(path)
+        start = await self.http.post(
+            "/upload/v1beta/files",
+            headers={
+                "X-Goog-Upload-Protocol": "resumable",
+                "X-Goog-Upload-Command": "start",
+                "X-Goog-Upload-Header-Content-Length": str(size),
+                "X-Goog-Upload-Header-Content-Type": mime_type
+            },
+            json={"file": {"display_name": display_name}}
+        )
+        start.raise_for_status()
+        upload_url = start.headers.get("X-Goog-Upload-URL")
+        if not upload_url:
+            raise RemoteFileError("File API did not return an upload URL")
+
+        offset = 0
+        failures = 0
+        next_chunk = asyncio.create_task(asyncio.to_thread(self._read_chunk, path, offset))
+        while True:
+            chunk = await next_chunk
+            last = offset + len(chunk) >= size
+            if not last:
+                # Read ahead so disk I/O overlaps with the network transfer
+                next_chunk = asyncio.create_task(asyncio.to_thread(self._read_chunk, path, offset + len(chunk)))
+            try:
+                response = await self.http.post(
+                    upload_url,
+                    headers={
+                        "X-Goog-Upload-Command": "upload, finalize" if last else "upload",
+                        "X-Goog-Upload-Offset": str(offset)
+                    },
+                    content=chunk
+                )
+                response.raise_for_status()
+            except httpx.HTTPError as e:
+                failures += 1
+                if failures > REMOTE_CHUNK_RETRIES:
+                    raise RemoteFileError(f"Upload failed at offset {offset}: {str(e)}")
+                if not last:
+                    next_chunk.cancel()
+                await asyncio.sleep(next(backoff_delays(initial=2 ** failures * 0.25)))
+                offset = await self._query_offset(upload_url)
+                next_chunk = asyncio.create_task(asyncio.to_thread(self._read_chunk, path, offset))
+                continue
+
+            failures = 0
+            offset += len(chunk)
+            if last:
+                return response.json()["file"]
+
+    async def wait_until_active(self, name: str, timeout: float = 600.0) -> Dict:
+        """Polls a file until it leaves PROCESSING, backing off exponentially with jitter."""
+        deadline = time.monotonic() + timeout
+        for delay in backoff_delays():
+            remote = await self.get_file(name)
+            if remote is None:
+                raise RemoteFileError(f"Remote file {name} disappeared while processing")
+            state = remote.get("state")
+            if state == "ACTIVE":
+                return remote
+            if state == "FAILED":
+                raise RemoteFileError("Video processing failed.")
+            if time.monotonic() + delay > deadline:
+                raise RemoteFileError(f"Timed out waiting for {name} to finish processing")
+            await asyncio.sleep(delay)
+
+    def _cached_handle(self, digest: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM remote_files WHERE digest = ?", (digest,)).fetchone()
+        if not row:
+            return None
+        if row["expires_at"] and row["expires_at"] - EXPIRY_MARGIN_SECONDS < time.time():
+            self._forget(digest)
+            return None
+        return dict(row)
+
+    def _remember(self, digest: str, remote: Dict) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO remote_files (digest, name, uri, mime_type, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (digest, remote["name"], remote["uri"], remote["mimeType"], parse_timestamp(remote.get("expirationTime")))
+            )
+            self._db.commit()
+
+    def _forget(self, digest: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM remote_files WHERE digest = ?", (digest,))
+            self._db.commit()
+
+    async def ensure_file(self, path: str, digest: str, mime_type: str = "video/mp4") -> Dict:
+        """Returns an ACTIVE remote file for the given content, uploading only if needed."""
+        lock = self._digest_locks.setdefault(digest, asyncio.Lock())
+        async with lock:
+            handle = self._cached_handle(digest)
+            if handle:
+                remote = await self.get_file(handle["name"])
+                if remote and remote.get("state") != "FAILED":
+                    self.reused += 1
+                    if remote.get("state") != "ACTIVE":
+                        remote = await self.wait_until_active(remote["name"])
+                    return remote
+                self._forget(digest)
+
+            print(f"Uploading {path} to the File API...")
+            remote = await self.upload(path, mime_type, display_name=digest[:32])
+            self.uploads += 1
+            remote = await self.wait_until_active(remote["name"])
+            self._remember(digest, remote)
+            return remote
+
+    def stats(self) -> Dict:
+        with self._lock:
+            handles = self._db.execute("SELECT COUNT(*) FROM remote_files").fetchone()[0]
+        return {"handles": handles, "uploads": self.uploads, "reused": self.reused}
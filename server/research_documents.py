@@ -0,0 +1,111 @@
+import re
+import hashlib
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from typing import Optional, Dict, List, Sequence
+
+from course_search import estimate_tokens
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = frozenset({"fbclid", "gclid", "msclkid", "mc_cid", "mc_eid", "ref", "ref_src", "igshid"})
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def canonical_url(url: str) -> str:
+    """Normalizes a URL so the same page found through different links compares equal.
+
+    Lower-cases the scheme and host, drops "www.", default ports, fragments,
+    tracking parameters and a trailing slash, and sorts the query string.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower() or "https"
+    host = (parts.hostname or "").lower().removeprefix("www.")
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    path = re.sub(r"/{2,}", "/", parts.path).rstrip("/") or "/"
+    query = sorted((name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                   if name.lower() not in TRACKING_PARAMS and not name.lower().startswith("utm_"))
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+
+def content_fingerprint(markdown: str) -> str:
+    """Hash of the markdown with case and whitespace normalized away."""
+    normalized = " ".join(markdown.casefold().split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:32]
+
+
+class DocumentRegistry:
+    """Pages and learnings seen by one deep research job.
+
+    Every search result is claimed before it is sent to the model: a page
+    whose canonical URL or content fingerprint was already claimed is
+    skipped, so a page returned by several queries or depths is read once.
+    A claim is released if the page could not be summarised, so a later
+    query can try it again. Canonical URLs are only used as keys; sources
+    and learnings keep the URL as the search returned it. Learnings are kept
+    with the URLs of the pages they were drawn from, and repeated learnings
+    are dropped.
+    """
+
+    def __init__(self):
+        self._documents: Dict[str, Dict] = {}  # Canonical URL -> {"url", "fingerprint"}
+        self._fingerprints: Dict[str, str] = {}  # Fingerprint -> canonical URL
+        self._learnings: Dict[str, Dict] = {}  # Normalized learning -> {"learning", "urls"}
+        self.duplicate_urls = 0
+        self.duplicate_content = 0
+        self.skipped_tokens = 0
+
+    def claim(self, url: Optional[str], markdown: Optional[str]) -> Optional[str]:
+        """Registers a search result and returns its key, or None if it was seen before.
+
+        The key is the canonical URL; results without a URL are keyed by
+        their content alone.
+        """
+        fingerprint = content_fingerprint(markdown) if markdown else ""
+        canonical = canonical_url(url) if url else None
+        if canonical and canonical in self._documents:
+            self.duplicate_urls += 1
+        elif fingerprint and fingerprint in self._fingerprints:
+            self.duplicate_content += 1
+        else:
+            key = canonical or f"content:{fingerprint}"
+            self._documents[key] = {"url": url, "fingerprint": fingerprint}
+            if fingerprint:
+                self._fingerprints[fingerprint] = key
+            return key
+        if markdown:
+            self.skipped_tokens += estimate_tokens(markdown)
+        return None
+
+    def release(self, key: str) -> None:
+        """Forgets a claimed page, e.g. because summarising it failed."""
+        document = self._documents.pop(key, None)
+        if document and document["fingerprint"]:
+            self._fingerprints.pop(document["fingerprint"], None)
+
+    def add_learnings(self, learnings: Sequence[str], urls: Sequence[str]) -> List[str]:
+        """Records learnings drawn from urls and returns the ones not seen before."""
+        new = []
+        for learning in learnings:
+            key = " ".join(learning.casefold().split())
+            if key in self._learnings:
+                self._learnings[key]["urls"] = list(dict.fromkeys(self._learnings[key]["urls"] + list(urls)))
+                continue
+            self._learnings[key] = {"learning": learning, "urls": list(urls)}
+            new.append(learning)
+        return new
+
+    def sources(self) -> List[str]:
+        """URLs of every page claimed, as returned by the search, in the order they were found."""
+        return [document["url"] for document in self._documents.values() if document["url"]]
+
+    def learning_sources(self) -> List[Dict]:
+        return [dict(entry) for entry in self._learnings.values()]
+
+    def stats(self) -> Dict:
+        return {
+            "documents": len(self._documents),
+            "duplicateUrls": self.duplicate_urls,
+            "duplicateContent": self.duplicate_content,
+            "skippedTokens": self.skipped_tokens,
+            "learnings": len(self._learnings)
+        }
@@ -0,0 +1,135 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from typing import Optional, Dict, Tuple, Any
+
+SEARCH_CACHE_TTL_SECONDS = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", str(24 * 60 * 60)))
+SEARCH_CACHE_MAX_BYTES = int(os.getenv("SEARCH_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+# How long past the TTL an entry may still be served while it is refreshed; 0 turns this off
+SEARCH_CACHE_STALE_SECONDS = float(os.getenv("SEARCH_CACHE_STALE_SECONDS", "0"))
+
+
+def normalize_query(query: str) -> str:
+    """Case-, width- and whitespace-insensitive form of a search query."""
+    query = unicodedata.normalize("NFKC", query).casefold()
+    return " ".join(query.split()).strip(" ?.!")
+
+
+def search_key(query: str, options: Dict[str, Any]) -> str:
+    # The request timeout does not change the results
+    options = {name: value for name, value in options.items() if name != "timeout"}
+    normalized = json.dumps(options, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{normalize_query(query)}|{normalized}".encode("utf-8")).hexdigest()
+
+
+class SearchCache:
+    """Persistent SQLite cache for web search results with TTL and LRU eviction.
+
+    Entries are keyed by the normalized query plus the search options and
+    stored as zlib-compressed JSON. An entry is fresh for ttl seconds; with
+    stale_seconds set it can be served for that much longer while the caller
+    refreshes it in the background. The compressed total is kept under
+    max_bytes by evicting the least recently used entries.
+    """
+
+    def __init__(self, path: str, ttl: float = SEARCH_CACHE_TTL_SECONDS, max_bytes: int = SEARCH_CACHE_MAX_BYTES,
+                 stale_seconds: float = SEARCH_CACHE_STALE_SECONDS):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stale_seconds = stale_seconds
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_saved = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS searches (
+                key TEXT PRIMARY KEY,
+                query TEXT NOT NULL,
+                payload BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                raw_size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS searches_last_access ON searches(last_access);
+        """)
+        self._db.commit()
+
+    def get(self, key: str) -> Optional[Tuple[Dict, bool]]:
+        """(result, is_fresh), or None if there is nothing servable for key."""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT payload, raw_size, created_at FROM searches WHERE key = ?", (key,)).fetchone()
+            age = now - row[2] if row else None
+            if row is None or age > self.ttl + self.stale_seconds:
+                if row is not None:
+                    self._db.execute("DELETE FROM searches WHERE key = ?", (key,))
+                    self._db.commit()
+                self.misses += 1
+                return None
+            fresh = age <= self.ttl
+            if fresh:
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+            self.bytes_saved += row[1]
+            self._db.execute("UPDATE searches SET last_access = ? WHERE key = ?", (now, key))
+            self._db.commit()
+        return json.loads(zlib.decompress(row[0])), fresh
+
+    def put(self, key: str, query: str, result: Dict) -> None:
+        raw = json.dumps(result, separators=(",", ":")).encode("utf-8")
+        payload = zlib.compress(raw, 6)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO searches (key, query, payload, size, raw_size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, normalize_query(query), payload, len(payload), len(raw), now, now)
+            )
+            self._evict(now)
+            self._db.commit()
+
+    def _evict(self, now: float) -> None:
+        """Drops expired entries, then least recently used ones until the cache fits in max_bytes."""
+        expired = self._db.execute("DELETE FROM searches WHERE created_at < ?", (now - self.ttl - self.stale_seconds,))
+        self.evictions += expired.rowcount
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM searches").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._db.execute("SELECT key, size FROM searches ORDER BY last_access ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM searches WHERE key = ?", (key,))
+            total -= size
+            self.evictions += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries, total, raw_total = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(raw_size), 0) FROM searches"
+            ).fetchone()
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": entries,
+            "bytes": total,
+            "uncompressedBytes": raw_total,
+            "maxBytes": self.max_bytes,
+            "ttlSeconds": self.ttl,
+            "staleSeconds": self.stale_seconds,
+            "hits": self.hits,
+            "staleHits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hitRate": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+            "bytesSaved": self.bytes_saved
+        }
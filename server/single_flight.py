@@ -0,0 +1,71 @@
+import json
+import asyncio
+import hashlib
+from typing import Dict, List, Any, Callable, Awaitable
+
+
+def flight_key(name: str, inputs: Dict[str, Any]) -> str:
+    """Builds a stable key from a function name and its normalized inputs."""
+    normalized = json.dumps(inputs, sort_keys=True, default=str, separators=(",", ":"))
+    return f"{name}:{hashlib.sha256(normalized.encode('utf-8')).hexdigest()}"
+
+
+class SingleFlight:
+    """Coalesces identical concurrent calls so they share in-flight work.
+
+    With fanout=1 every concurrent caller awaits the same call. With fanout=N
+    up to N distinct calls are started for a key and later callers are spread
+    across them round-robin, e.g. so a class opening the same quiz together
+    still sees a few different question sets. Callers are shielded from each
+    other: one cancelled request does not cancel the shared call, but once
+    every caller waiting on it has been cancelled the call is cancelled too.
+    """
+
+    def __init__(self):
+        self._groups: Dict[str, List[asyncio.Task]] = {}
+        self._next: Dict[str, int] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _done(self, key: str, task: asyncio.Task) -> None:
+        group = self._groups.get(key, [])
+        if task in group:
+            group.remove(task)
+        if not group:
+            self._groups.pop(key, None)
+            self._next.pop(key, None)
+
+    async def run(self, name: str, inputs: Dict[str, Any], fn: Callable[[], Awaitable[Any]], fanout: int = 1) -> Any:
+        key = flight_key(name, inputs)
+        stats = self._stats.setdefault(name, {"calls": 0, "executed": 0, "coalesced": 0})
+        stats["calls"] += 1
+
+        group = self._groups.setdefault(key, [])
+        if len(group) < max(1, fanout):
+            task = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda t: self._done(key, t))
+            group.append(task)
+            stats["executed"] += 1
+        else:
+            index = self._next.get(key, 0)
+            self._next[key] = index + 1
+            task = group[index % len(group)]
+            stats["coalesced"] += 1
+
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters[task] == 1 and not task.done():
+                task.cancel()  # Nobody is left to use the result
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+
+    def stats(self) -> Dict:
+        return {
+            "inFlight": sum(len(group) for group in self._groups.values()),
+            "functions": self._stats
+        }
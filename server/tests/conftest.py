@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+# Server modules import each other by name, so the tests import them the same way
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def client(tmp_path_factory):
+    """TestClient for the app, with its cache and upload directories in a temporary directory."""
+    from fastapi.testclient import TestClient
+
+    # main reads its settings and creates its stores on import
+    tmp_path = tmp_path_factory.mktemp("server")
+    patch = pytest.MonkeyPatch()
+    patch.setenv("FIRECRAWL_API_KEY", "fc-test")
+    patch.setenv("CACHE_DIR", str(tmp_path / "cache"))
+    patch.chdir(tmp_path)
+    import main
+    yield TestClient(main.app)
+    patch.undo()
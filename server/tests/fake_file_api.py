@@ -0,0 +1,70 @@
+import json
+import uuid
+from typing import Dict, List, Optional
+
+import httpx
+
+
+class FakeFileAPI:
+    """In-process stand-in for the Gemini File API resumable upload protocol.
+
+    Handles start, upload at an offset, query and finalize, and serves the
+    finished files as ACTIVE. fail_chunks injects failures: for the n-th
+    upload request (counting from 1) the server keeps accepted_bytes of the
+    chunk and answers 503, so the client has to query the offset to resume.
+    Use transport() as the transport of an httpx.AsyncClient.
+    """
+
+    def __init__(self, fail_chunks: Optional[Dict[int, int]] = None):
+        self.fail_chunks = fail_chunks or {}
+        self.sessions: Dict[str, bytearray] = {}
+        self.files: Dict[str, Dict] = {}
+        self.contents: Dict[str, bytes] = {}
+        self.commands: List[str] = []
+        self._chunk_requests = 0
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        command = request.headers.get("X-Goog-Upload-Command", "")
+        if request.method == "GET" and request.url.path.startswith("/v1beta/files/"):
+            name = request.url.path[len("/v1beta/"):]
+            if name not in self.files:
+                return httpx.Response(404)
+            return httpx.Response(200, json=self.files[name])
+        self.commands.append(command)
+        if request.url.path == "/upload/v1beta/files" and command == "start":
+            session = uuid.uuid4().hex
+            self.sessions[session] = bytearray()
+            return httpx.Response(200, headers={"X-Goog-Upload-URL": f"{request.url.scheme}://{request.url.host}/upload/sessions/{session}"})
+        session = request.url.path.rsplit("/", 1)[-1]
+        if session not in self.sessions:
+            return httpx.Response(404)
+        data = self.sessions[session]
+        if command == "query":
+            return httpx.Response(200, headers={"X-Goog-Upload-Size-Received": str(len(data))})
+
+        offset = int(request.headers["X-Goog-Upload-Offset"])
+        if offset != len(data):
+            return httpx.Response(400, text=f"Expected offset {len(data)}, got {offset}")
+        self._chunk_requests += 1
+        chunk = request.content
+        if self._chunk_requests in self.fail_chunks:
+            data += chunk[:self.fail_chunks[self._chunk_requests]]
+            return httpx.Response(503)
+        data += chunk
+        if "finalize" not in command:
+            return httpx.Response(200)
+
+        name = f"files/{session[:12]}"
+        self.contents[name] = bytes(data)
+        self.files[name] = {
+            "name": name,
+            "uri": f"https://generativelanguage.googleapis.com/v1beta/{name}",
+            "mimeType": "video/mp4",
+            "sizeBytes": str(len(data)),
+            "state": "ACTIVE",
+            "expirationTime": "2099-01-01T00:00:00.000000Z"
+        }
+        return httpx.Response(200, content=json.dumps({"file": self.files[name]}))
@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+from catalogue import CourseCatalogue, CursorError, decode_cursor, encode_cursor, etag_matches
+
+COURSES = [
+    {"id": f"course-{i:02d}", "title": f"Course {i}", "category": "Soft Skills" if i % 2 else "Tech"}
+    for i in range(10)
+]
+
+
+def walk(catalogue: CourseCatalogue, category=None, limit=3):
+    ids, cursor = [], None
+    while True:
+        page = json.loads(catalogue.list_response(category, cursor, limit)[0])
+        ids += [course["id"] for course in page["courses"]]
+        cursor = page["nextCursor"]
+        if cursor is None:
+            return ids
+
+
+@pytest.mark.parametrize("course_id", ["course-01", "a", "ünïcode/ids?&", ""])
+def test_cursor_round_trip(course_id):
+    cursor = encode_cursor(course_id)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == course_id
+
+
+@pytest.mark.parametrize("cursor", ["!!", "a", "_w", "Y291cnNl*"])
+def test_decode_cursor_rejects_garbage(cursor):
+    with pytest.raises(CursorError):
+        decode_cursor(cursor)
+
+
+def test_pages_cover_every_course_once():
+    catalogue = CourseCatalogue(COURSES)
+
+    assert walk(catalogue) == [course["id"] for course in COURSES]
+    assert walk(catalogue, "soft skills", limit=2) == [course["id"] for course in COURSES if course["category"] == "Soft Skills"]
+
+
+def test_repeated_page_is_served_from_cache():
+    catalogue = CourseCatalogue(COURSES)
+    cursor = encode_cursor("course-03")
+
+    first = catalogue.list_response(None, cursor, 3)
+    assert catalogue.list_response(None, cursor, 3) is first
+    assert [course["id"] for course in json.loads(first[0])["courses"]] == ["course-04", "course-05", "course-06"]
+
+
+def test_etag_matches():
+    etag = CourseCatalogue(COURSES).version
+
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"other"', etag)
+
+
+def test_bad_cursor_is_400(client):
+    response = client.get("/api/courses", params={"cursor": "!!", "limit": 2})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_cursor_from_listing_resumes(client):
+    first = client.get("/api/courses", params={"limit": 1}).json()
+    second = client.get("/api/courses", params={"limit": 1, "cursor": first["nextCursor"]})
+
+    assert second.status_code == 200
+    assert second.json()["courses"][0]["id"] > first["courses"][0]["id"]
@@ -0,0 +1,45 @@
+from content_registry import CourseChunk
+from course_search import CourseIndex, estimate_tokens, tokenize
+
+CORPUS = [
+    CourseChunk("01", "Intro", 0, "Welcome to the course on workplace communication and teamwork."),
+    CourseChunk("01", "Feedback", 1, "Giving feedback: describe the specific behaviour and its impact, then agree on next steps."),
+    CourseChunk("01", "Meetings", 2, "Run short meetings with a clear agenda and written outcomes."),
+    CourseChunk("02", "Delegation", 0, "Delegation builds trust. Delegation frees managers to focus on strategy."),
+    CourseChunk("02", "Feedback", 1, "Managers should ask for feedback from their team regularly."),
+    CourseChunk("02", "Conflict", 2, "Resolve conflict early by listening before proposing solutions."),
+]
+
+
+def test_tokenize_drops_stopwords():
+    assert tokenize("How do I give the Feedback?") == ["do", "give", "feedback"]
+
+
+def test_passage_with_query_terms_ranks_first():
+    index = CourseIndex(CORPUS)
+
+    results = index.search("specific feedback impact", k=3)
+    assert results[0][1] == CORPUS[1]
+    assert [score for score, _ in results] == sorted((score for score, _ in results), reverse=True)
+    assert index.search("delegation", k=5) == index.search("Delegation delegation", k=5)
+    assert [chunk for _, chunk in index.search("delegation")] == [CORPUS[3]]
+    assert index.search("quantum chromodynamics") == []
+
+
+def test_search_within_one_course():
+    index = CourseIndex(CORPUS)
+
+    assert [chunk for _, chunk in index.search("feedback", course_id="2")] == [CORPUS[4]]
+    assert index.search("feedback", course_id="99") == []
+
+
+def test_passages_respect_token_budget():
+    index = CourseIndex(CORPUS)
+    budget = estimate_tokens(CORPUS[1].text) + estimate_tokens(CORPUS[4].text)
+
+    assert index.passages("feedback", token_budget=budget) == [CORPUS[1], CORPUS[4]]
+    assert index.passages("feedback", token_budget=budget - 1) == [CORPUS[4]]
+    for budget in (20, 35, 50):
+        passages = index.passages("feedback managers team meetings", token_budget=budget)
+        assert passages and sum(estimate_tokens(chunk.text) for chunk in passages) <= budget
+    assert index.passages("feedback", token_budget=0) == []
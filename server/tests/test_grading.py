@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from grading import answer_mask, grade_attempt, grade_cohort
+
+QUESTIONS = [
+    {"type": "MCQ", "options": ["a", "b", "c", "d"], "correctAnswers": [1], "topic": "Ethics"},
+    # Options 0 and 2 are correct, 1 and 3 are not
+    {"type": "MSQ", "options": ["a", "b", "c", "d"], "correctAnswers": [0, 2], "topic": "Leadership"},
+]
+
+
+def msq_credit(selected, rule):
+    return grade_attempt(QUESTIONS, [[1], selected], msq_rule=rule)["credit"][1]
+
+
+@pytest.mark.parametrize("selected, all_or_nothing, partial, per_option", [
+    ([0, 2], 1.0, 1.0, 1.0),
+    ([0], 0.0, 0.5, 0.75),
+    ([0, 1], 0.0, 0.0, 0.5),
+    ([0, 1, 2], 0.0, 0.5, 0.75),
+    ([0, 1, 2, 3], 0.0, 0.0, 0.5),
+    ([1, 3], 0.0, 0.0, 0.0),
+    ([], 0.0, 0.0, 0.5),
+])
+def test_msq_rules(selected, all_or_nothing, partial, per_option):
+    assert msq_credit(selected, "all_or_nothing") == all_or_nothing
+    assert msq_credit(selected, "partial") == partial
+    assert msq_credit(selected, "per_option") == per_option
+
+
+def test_msq_ignores_options_that_do_not_exist():
+    assert msq_credit([0, 2, 5], "all_or_nothing") == 1.0
+
+
+@pytest.mark.parametrize("rule", ["all_or_nothing", "partial", "per_option"])
+def test_mcq_needs_exactly_the_correct_option(rule):
+    assert grade_attempt(QUESTIONS, [[1], []], msq_rule=rule)["credit"][0] == 1.0
+    assert grade_attempt(QUESTIONS, [[1, 2], []], msq_rule=rule)["credit"][0] == 0.0
+
+
+def test_grade_attempt_scores_topics_and_pass():
+    result = grade_attempt(QUESTIONS, [[1], [0]], required_to_pass=1.5, msq_rule="partial")
+
+    assert result["score"] == 1.5
+    assert result["topicAccuracy"] == {"Ethics": 1.0, "Leadership": 0.5}
+    assert result["passed"] is True
+
+
+def test_grade_attempt_rejects_unknown_rule_and_wrong_length():
+    with pytest.raises(ValueError):
+        grade_attempt(QUESTIONS, [[1], [0]], msq_rule="lenient")
+    with pytest.raises(ValueError):
+        grade_attempt(QUESTIONS, [[1]])
+
+
+def test_grade_cohort_matches_grade_attempt():
+    attempts = [[[1], [0, 2]], [[0], [0]], [[1], [0, 1, 2, 3]]]
+    masks = np.array([[answer_mask(selected) for selected in attempt] for attempt in attempts])
+
+    cohort = grade_cohort(QUESTIONS, masks, msq_rule="partial")
+    assert cohort["scores"] == [grade_attempt(QUESTIONS, attempt, msq_rule="partial")["score"] for attempt in attempts]
@@ -0,0 +1,70 @@
+import os
+import time
+import asyncio
+import hashlib
+
+import pytest
+
+from janitor import UploadJanitor
+from upload_store import UploadStore
+
+DAY = 24 * 3600
+
+
+@pytest.fixture
+def store(tmp_path):
+    return UploadStore(str(tmp_path / "uploads"))
+
+
+def add(store: UploadStore, data: bytes) -> dict:
+    tmp_path = store.incoming_path()
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    return store.add_file(tmp_path, hashlib.sha256(data).hexdigest(), len(data), "video.mp4", "video/mp4")
+
+
+def backdate(path: str, seconds: float) -> None:
+    then = time.time() - seconds
+    os.utime(path, (then, then))
+
+
+def janitor_for(store: UploadStore, **kwargs) -> UploadJanitor:
+    janitor = UploadJanitor(store, [store.incoming_dir], max_age_hours=1, **kwargs)
+    janitor.rebuild()
+    return janitor
+
+
+def test_old_legacy_files_at_the_root_are_removed(store):
+    upload = add(store, b"video")
+    legacy = os.path.join(store.upload_dir, "old-upload.mp4")
+    recent = os.path.join(store.upload_dir, "just-written.mp4")
+    for path in (legacy, recent):
+        with open(path, "wb") as f:
+            f.write(b"legacy")
+    for path in (legacy, store.index_path):
+        backdate(path, DAY)
+
+    janitor = janitor_for(store)
+    asyncio.run(janitor.sweep())
+
+    assert not os.path.exists(legacy)
+    assert all(os.path.exists(path) for path in (recent, store.index_path, upload["path"], store.incoming_dir))
+    assert janitor.metrics["legacyFilesDeleted"] == 1
+
+
+def test_uploads_in_use_are_kept_until_released(store):
+    held, pending, idle = add(store, b"held"), add(store, b"pending"), add(store, b"idle")
+    janitor = janitor_for(store, quota_bytes=0, pending_paths=lambda: [pending["path"]])
+
+    with janitor.hold([held["path"]]):
+        asyncio.run(janitor.sweep())
+    assert os.path.exists(held["path"]) and os.path.exists(pending["path"])
+    assert not os.path.exists(idle["path"])
+    assert janitor.metrics["inUseSkips"] == 2
+
+    asyncio.run(janitor.sweep())
+    assert not os.path.exists(held["path"]) and os.path.exists(pending["path"])
+
+    janitor.pending_paths = lambda: []
+    asyncio.run(janitor.sweep())
+    assert store.total_bytes() == 0
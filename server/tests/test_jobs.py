@@ -0,0 +1,46 @@
+import time
+import asyncio
+
+from jobs import JobQueue, QUEUED, RUNNING, SUCCEEDED, FAILED
+
+
+def test_jobs_run_and_publish_each_state(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), concurrency=2)
+
+    async def double(payload):
+        if payload["n"] < 0:
+            raise ValueError("negative")
+        return payload["n"] * 2
+
+    queue.register("double", double)
+
+    async def run():
+        await queue.start()
+        try:
+            jobs = [queue.submit("double", {"n": n}) for n in (2, -1)]
+            updates = [queue.subscribe(job["id"]) for job in jobs]
+            await asyncio.wait_for(queue._queue.join(), timeout=5)
+            return jobs, [[update.get_nowait()["state"] for _ in range(update.qsize())] for update in updates]
+        finally:
+            await queue.stop()
+
+    jobs, states = asyncio.run(run())
+    assert states == [[RUNNING, SUCCEEDED], [RUNNING, FAILED]]
+    assert queue.get(jobs[0]["id"], include_result=True)["result"] == 4
+    assert queue.get(jobs[1]["id"])["error"] == "negative"
+
+
+def test_prune_deletes_only_old_finished_jobs(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), retention_hours=1)
+    old = time.time() - 7200
+    rows = [("old-done", SUCCEEDED, old), ("old-failed", FAILED, old), ("old-queued", QUEUED, old),
+            ("old-running", RUNNING, old), ("new-done", SUCCEEDED, time.time())]
+    queue._db.executemany(
+        "INSERT INTO jobs (id, kind, state, payload, created_at, updated_at) VALUES (?, 'double', ?, '{}', ?, ?)",
+        [(job_id, state, updated_at, updated_at) for job_id, state, updated_at in rows]
+    )
+    queue._db.commit()
+
+    assert queue.prune() == 2
+    assert [job_id for job_id, _, _ in rows if queue.get(job_id)] == ["old-queued", "old-running", "new-done"]
+    assert queue.stats()["pruned"] == 2
@@ -0,0 +1,83 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from learner_profiles import LearnerProfiles, allocate_largest_remainder_batch, topic_weights_batch
+
+
+def largest_remainder(weights, total):
+    """Reference single-row allocation: floor the quotas, then hand out the rest by remainder."""
+    if not any(weights):
+        weights = [1.0] * len(weights)
+    quotas = [weight / sum(weights) * total for weight in weights]
+    counts = [int(quota) for quota in quotas]
+    by_remainder = sorted(range(len(weights)), key=lambda i: -(quotas[i] - counts[i]))
+    for i in by_remainder[:total - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+
+@pytest.mark.parametrize("weights, total, expected", [
+    ([1, 1, 1], 10, [4, 3, 3]),
+    ([0, 0, 0], 7, [3, 2, 2]),
+    ([0, 5, 0, 5], 5, [0, 3, 0, 2]),
+    ([17, 15, 3, 9, 17], 25, [7, 6, 1, 4, 7]),
+    ([2, 1], 0, [0, 0]),
+])
+def test_batch_allocation_examples(weights, total, expected):
+    assert allocate_largest_remainder_batch(np.array([weights]), total)[0].tolist() == expected
+
+
+def test_batch_rows_match_single_row_allocation():
+    rng = np.random.default_rng(7)
+    weights = rng.integers(0, 4, size=(200, 5)).astype(np.float64)
+    weights[:3] = 0  # Rows of zero weights
+    weights[3] = [2, 2, 2, 2, 2]  # Every remainder ties
+
+    for total in (0, 1, 7, 25, 101):
+        counts = allocate_largest_remainder_batch(weights, total)
+        assert (counts.sum(axis=1) == total).all()
+        for row, row_counts in zip(weights, counts):
+            assert row_counts.tolist() == largest_remainder(row.tolist(), total)
+
+
+def test_score_matrix_fills_gaps_from_defaults(tmp_path):
+    profiles = LearnerProfiles(str(tmp_path / "profiles.sqlite3"))
+    profiles.put("alice", {"a": 5, "retired": 1})
+
+    topics, matrix = profiles.score_matrix(["alice", "bob"], {"a": 10, "b": 20})
+    assert topics == ["a", "b"]
+    assert matrix.tolist() == [[5, 20], [10, 20]]
+
+
+def test_cohort_allocation_matches_single_learner_exam_plan(client):
+    import main
+
+    topics = list(main.AssessmentScores().scores)
+    learners = {
+        "alloc-low": {topic: 0 for topic in topics},
+        "alloc-mastered": {topic: 30 for topic in topics},
+        "alloc-tied": {topic: 20 for topic in topics},
+        "alloc-mixed": dict(zip(topics, [0, 30, 12, 30, 7])),
+        "alloc-default": {}
+    }
+    for learner_id, scores in learners.items():
+        if scores:
+            main.learner_profiles.put(learner_id, scores)
+
+    response = client.post("/api/exam/allocations", json={"learnerIds": list(learners)}).json()
+    assert response["topics"] == topics
+    for learner_id in learners:
+        assessment = main.AssessmentScores(learner_id)
+        weights = assessment.get_topic_weights()
+        assert weights == pytest.approx(dict(zip(topics, topic_weights_batch(np.array([list(assessment.scores.values())]))[0])))
+
+        _, plan = asyncio.run(main.plan_exam("bronze-to-silver", learner_id))
+        allocation = response["allocations"][learner_id]
+        assert sum(allocation["questions"]) == main.EXAM_TOTAL_QUESTIONS
+        assert sum(allocation["msq"]) == main.EXAM_MSQ_COUNT
+        assert {topic: (mcq + msq, msq) for topic, mcq, msq in plan} == {
+            topic: (count, msq)
+            for topic, count, msq in zip(topics, allocation["questions"], allocation["msq"]) if count > 0
+        }
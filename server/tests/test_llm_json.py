@@ -0,0 +1,72 @@
+import pytest
+from pydantic import BaseModel
+
+from llm_json import ArrayItemParser, JSONExtractionError, extract_json, parse_model
+
+
+class Questions(BaseModel):
+    questions: list
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"a": 1}', {"a": 1}),
+    ('Here you go:\n```json\n{"a": [1, 2]}\n```\nLet me know!', {"a": [1, 2]}),
+    ('{"a": [1, 2,],}', {"a": [1, 2]}),
+    ('{"a": 1, # the answer\n "b": 2}', {"a": 1, "b": 2}),
+    ('// header\n{"a": 1 // tail\n}', {"a": 1}),
+    ('{"a": "x # y // z"}', {"a": "x # y // z"}),
+    ('{"a": "quote \\" and brace }"}', {"a": 'quote " and brace }'}),
+    ('{"ok": True, "no": False, "n": None}', {"ok": True, "no": False, "n": None}),
+    ('[{"a": 1}, {"b": 2}]', [{"a": 1}, {"b": 2}]),
+    ('{"a": {"b": 1}} and then {"c": 2}', {"a": {"b": 1}}),
+])
+def test_extract_json_repairs(text, expected):
+    assert extract_json(text) == expected
+
+
+def test_extract_json_closes_truncated_output_at_last_complete_value():
+    assert extract_json('{"questions": [{"id": 1}, {"id": 2, "text": "unfini') == {"questions": [{"id": 1}, {"id": 2}]}
+
+
+def test_extract_json_skips_stray_braces_before_the_value():
+    assert extract_json('Use {braces} like {this}: {"a": 1}') == {"a": 1}
+
+
+@pytest.mark.parametrize("text", ["", "no json here", "}}}", "{" * 5000])
+def test_extract_json_raises_extraction_error(text):
+    with pytest.raises(JSONExtractionError):
+        extract_json(text)
+
+
+def test_parse_model_validates():
+    assert parse_model('```json\n{"questions": [1]}\n```', Questions).questions == [1]
+    with pytest.raises(ValueError):
+        parse_model('{"other": 1}', Questions)
+
+
+def test_array_item_parser_yields_items_as_they_complete():
+    parser = ArrayItemParser()
+    stream = '{"questions": [{"id": 1, "options": ["a]", "{b"]}, {"id": 2, # note\n "x": {"y": 1}}, {"id": 3'
+
+    items = [item for i in range(0, len(stream), 7) for item in parser.feed(stream[i:i + 7])]
+    assert items == [{"id": 1, "options": ["a]", "{b"]}, {"id": 2, "x": {"y": 1}}]
+    assert parser.feed('}]}') == [{"id": 3}]
+
+
+def test_array_item_parser_reads_only_the_first_array():
+    parser = ArrayItemParser()
+    assert parser.feed('[{"a": 1}] [{"b": 2}]') == [{"a": 1}]
+
+
+def test_array_item_parser_skips_arrays_without_objects():
+    parser = ArrayItemParser()
+    stream = 'Here are the [5] questions:\n[{"a": 1}, {"b": 2}] and [{"c": 3}]'
+
+    assert [item for char in stream for item in parser.feed(char)] == [{"a": 1}, {"b": 2}]
+    assert ArrayItemParser().feed('{"tags": [], "questions": [{"a": 1}]}') == [{"a": 1}]
+
+
+def test_array_item_parser_counts_invalid_items():
+    parser = ArrayItemParser()
+    assert parser.feed('[{"a": }, {"b": 2}]') == [{"b": 2}]
+    assert parser.invalid == 1
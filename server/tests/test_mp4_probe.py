@@ -0,0 +1,111 @@
+import struct
+
+import pytest
+
+from mp4_probe import ProbeError, probe_mp4
+
+FTYP_BRAND = b"isom"
+
+
+def box(box_type: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+
+def full_box(box_type: bytes, payload: bytes, version: int = 0) -> bytes:
+    return box(box_type, struct.pack(">I", version << 24) + payload)
+
+
+def track(handler: bytes, sample_entry: bytes, duration: int, width: int = 0, height: int = 0) -> bytes:
+    tkhd = full_box(b"tkhd", b"\0" * 72 + struct.pack(">II", width << 16, height << 16))
+    mdhd = full_box(b"mdhd", struct.pack(">IIII", 0, 0, 1000, duration) + b"\0" * 4)
+    hdlr = full_box(b"hdlr", b"\0" * 4 + handler + b"\0" * 12 + b"handler\0")
+    stsd = full_box(b"stsd", struct.pack(">I", 1) + sample_entry)
+    return box(b"trak", tkhd + box(b"mdia", mdhd + hdlr + box(b"minf", box(b"stbl", stsd))))
+
+
+def video_track(duration: int, width: int = 1280, height: int = 720) -> bytes:
+    avc1 = box(b"avc1", b"\0" * 6 + struct.pack(">H", 1) + b"\0" * 16 + struct.pack(">HH", width, height) + b"\0" * 50)
+    return track(b"vide", avc1, duration, width, height)
+
+
+def audio_track(duration: int) -> bytes:
+    mp4a = box(b"mp4a", b"\0" * 6 + struct.pack(">H", 1) + b"\0" * 8 + struct.pack(">HHHHI", 2, 16, 0, 0, 48000 << 16))
+    return track(b"soun", mp4a, duration)
+
+
+def mvhd(duration: int, timescale: int = 1000) -> bytes:
+    return full_box(b"mvhd", struct.pack(">IIII", 0, 0, timescale, duration) + b"\0" * 80)
+
+
+def write_mp4(tmp_path, moov_children: bytes, mdat_first: bool = True) -> str:
+    ftyp = box(b"ftyp", FTYP_BRAND + struct.pack(">I", 512))
+    # 64-bit size header, as large recordings use
+    mdat = struct.pack(">I4sQ", 1, b"mdat", 16 + 1000) + b"\0" * 1000
+    moov = box(b"moov", moov_children)
+    path = tmp_path / "video.mp4"
+    path.write_bytes(ftyp + (mdat + moov if mdat_first else moov + mdat))
+    return str(path)
+
+
+def test_reads_tracks_behind_large_mdat(tmp_path):
+    path = write_mp4(tmp_path, mvhd(180_000) + video_track(180_000) + audio_track(180_000))
+    info = probe_mp4(path)
+
+    assert info["brand"] == "isom"
+    assert info["duration"] == 180
+    assert (info["width"], info["height"], info["videoCodec"]) == (1280, 720, "avc1")
+    assert (info["audioCodec"], info["audioChannels"], info["audioSampleRate"]) == ("mp4a", 2, 48000)
+
+
+def test_reports_missing_audio(tmp_path):
+    info = probe_mp4(write_mp4(tmp_path, mvhd(60_000) + video_track(60_000), mdat_first=False))
+
+    assert info["hasVideo"] and not info["hasAudio"]
+    assert info["audioCodec"] is None
+
+
+def test_fragmented_duration_comes_from_mehd(tmp_path):
+    mvex = box(b"mvex", full_box(b"mehd", struct.pack(">Q", 95_000), version=1))
+    info = probe_mp4(write_mp4(tmp_path, mvhd(0) + mvex + video_track(0) + audio_track(0)))
+
+    assert info["duration"] == 95
+
+
+def test_fragmented_without_mehd_has_unknown_duration(tmp_path):
+    info = probe_mp4(write_mp4(tmp_path, mvhd(0) + video_track(0) + audio_track(0)))
+
+    assert info["duration"] is None
+
+
+def test_falls_back_to_track_duration(tmp_path):
+    info = probe_mp4(write_mp4(tmp_path, mvhd(0) + video_track(42_000) + audio_track(40_000)))
+
+    assert info["duration"] == 42
+
+
+def test_rejects_file_without_moov(tmp_path):
+    path = tmp_path / "video.webm"
+    path.write_bytes(box(b"ftyp", FTYP_BRAND + b"\0" * 4) + box(b"mdat", b"\0" * 64))
+
+    with pytest.raises(ProbeError):
+        probe_mp4(str(path))
+
+
+def test_rejects_box_smaller_than_its_header(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(box(b"ftyp", FTYP_BRAND + b"\0" * 4) + struct.pack(">I4s", 4, b"moov"))
+
+    with pytest.raises(ProbeError):
+        probe_mp4(str(path))
+
+
+@pytest.mark.parametrize("moov_children", [
+    box(b"mvhd", b"") + video_track(1000),
+    mvhd(1000) + box(b"trak", box(b"tkhd", b"")),
+    mvhd(1000) + box(b"trak", box(b"mdia", box(b"mdhd", b""))),
+    mvhd(0) + box(b"mvex", box(b"mehd", b"")),
+    mvhd(1000) + box(b"trak", box(b"mdia", box(b"hdlr", b"\0" * 8) + box(b"minf", box(b"stbl", box(b"stsd", b"")))))
+])
+def test_truncated_header_box_is_probe_error(tmp_path, moov_children):
+    with pytest.raises(ProbeError):
+        probe_mp4(write_mp4(tmp_path, moov_children))
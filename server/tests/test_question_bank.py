@@ -0,0 +1,73 @@
+import pytest
+
+from question_bank import QuestionBank, minhash, similarity
+
+
+def question(text: str, options, question_type: str = "MCQ", topic: str = "Leadership"):
+    return {
+        "type": question_type,
+        "question": text,
+        "options": options,
+        "correctAnswers": [0],
+        "timeLimit": 60,
+        "topic": topic
+    }
+
+
+DELEGATION = question(
+    "What is the primary benefit of delegating tasks to team members?",
+    ["It develops their skills", "It reduces your salary", "It removes accountability", "It avoids meetings"]
+)
+REWORDED = question(
+    "What is the main benefit of delegating tasks to team members?",
+    ["It develops their skills", "It reduces your salary", "It removes accountability", "It avoids meetings!"]
+)
+FEEDBACK = question(
+    "Which approach makes feedback on a missed deadline most actionable?",
+    ["Describe the specific impact", "Wait for the annual review", "Mention it in a group chat", "Avoid the topic"]
+)
+
+
+@pytest.fixture
+def bank(tmp_path):
+    return QuestionBank(str(tmp_path / "bank.sqlite3"))
+
+
+def test_signature_similarity_tracks_wording():
+    assert similarity(minhash("same text"), minhash("same text")) == 1.0
+    assert similarity(minhash(DELEGATION["question"]), minhash(FEEDBACK["question"])) < 0.3
+
+
+def test_near_duplicates_collapse(bank):
+    ids = bank.add_many([DELEGATION, REWORDED, dict(DELEGATION)], "silver")
+
+    assert ids[0] is not None and ids[1:] == [None, None]
+    assert bank.stats()["inserted"] == 1 and bank.stats()["duplicatesRejected"] == 2
+
+
+def test_distinct_questions_survive(bank):
+    ids = bank.add_many([DELEGATION, FEEDBACK], "silver")
+
+    assert None not in ids and len(set(ids)) == 2
+
+
+def test_duplicates_are_rejected_after_restart(tmp_path):
+    path = str(tmp_path / "bank.sqlite3")
+    QuestionBank(path).add(DELEGATION, "silver")
+
+    assert QuestionBank(path).add(REWORDED, "silver") is None
+
+
+def test_sample_respects_count_and_stratum(bank):
+    for i in range(6):
+        bank.add(question(f"Scenario {i}: how should a manager respond to conflict number {i * 37}?",
+                          [f"Option {i}a", f"Option {i}b"]), "gold")
+    bank.add(FEEDBACK, "silver")
+    bank.add(question(DELEGATION["question"], DELEGATION["options"], question_type="MSQ"), "gold")
+
+    sampled = bank.sample("gold", "Leadership", "MCQ", 4)
+    assert len(sampled) == 4 and len({q["id"] for q in sampled}) == 4
+    assert all(q["type"] == "MCQ" and q["question"].startswith("Scenario") for q in sampled)
+    assert len(bank.sample("gold", "Leadership", "MCQ", 10)) == 6
+    assert [q["question"] for q in bank.sample("silver", "Leadership", "MCQ", 3)] == [FEEDBACK["question"]]
+    assert bank.sample("gold", "Leadership", "MCQ", 0) == []
@@ -0,0 +1,56 @@
+import os
+import asyncio
+
+import httpx
+
+from remote_files import RemoteFileClient
+from fake_file_api import FakeFileAPI
+
+CHUNK_SIZE = 1024
+
+
+def make_client(tmp_path, api: FakeFileAPI) -> RemoteFileClient:
+    client = RemoteFileClient("test-key", str(tmp_path / "handles.sqlite3"), base_url="http://files.test",
+                              chunk_size=CHUNK_SIZE)
+    client._http = httpx.AsyncClient(base_url="http://files.test", transport=api.transport())
+    return client
+
+
+def make_video(tmp_path, size: int) -> str:
+    path = tmp_path / "video.mp4"
+    path.write_bytes(os.urandom(size))
+    return str(path)
+
+
+def test_upload_sends_every_chunk_and_finalizes(tmp_path):
+    api = FakeFileAPI()
+    path = make_video(tmp_path, 5 * CHUNK_SIZE + 100)
+    remote = asyncio.run(make_client(tmp_path, api).upload(path, "video/mp4", "video"))
+
+    assert api.contents[remote["name"]] == open(path, "rb").read()
+    assert api.commands == ["start"] + ["upload"] * 5 + ["upload, finalize"]
+
+
+def test_upload_resumes_from_reported_offset(tmp_path):
+    # The second chunk fails after the server kept 300 of its bytes
+    api = FakeFileAPI(fail_chunks={2: 300})
+    path = make_video(tmp_path, 3 * CHUNK_SIZE + 10)
+    remote = asyncio.run(make_client(tmp_path, api).upload(path, "video/mp4", "video"))
+
+    assert api.contents[remote["name"]] == open(path, "rb").read()
+    assert api.commands == ["start", "upload", "upload", "query", "upload", "upload, finalize"]
+
+
+def test_ensure_file_reuses_handle_by_digest(tmp_path):
+    api = FakeFileAPI()
+    path = make_video(tmp_path, 2 * CHUNK_SIZE)
+    client = make_client(tmp_path, api)
+
+    async def ensure_twice():
+        first = await client.ensure_file(path, "a" * 64)
+        second = await client.ensure_file(path, "a" * 64)
+        return first, second
+
+    first, second = asyncio.run(ensure_twice())
+    assert first["name"] == second["name"]
+    assert client.stats() == {"handles": 1, "uploads": 1, "reused": 1}
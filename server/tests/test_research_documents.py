@@ -0,0 +1,64 @@
+import pytest
+
+from research_documents import DocumentRegistry, canonical_url, content_fingerprint
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("https://example.com/a", "https://example.com/a"),
+    ("HTTPS://WWW.Example.COM/a/", "https://example.com/a"),
+    ("https://example.com:443/a#section", "https://example.com/a"),
+    ("http://example.com:8080/a", "http://example.com:8080/a"),
+    ("https://example.com//a//b", "https://example.com/a/b"),
+    ("https://example.com", "https://example.com/"),
+    ("https://example.com/a?b=2&a=1&utm_source=x&fbclid=y", "https://example.com/a?a=1&b=2"),
+    ("  https://example.com/a?ref=home  ", "https://example.com/a"),
+])
+def test_canonical_url(url, expected):
+    assert canonical_url(url) == expected
+
+
+def test_canonical_url_keeps_meaningful_differences():
+    assert canonical_url("https://example.com/a?id=1") != canonical_url("https://example.com/a?id=2")
+    assert canonical_url("https://example.com/A") != canonical_url("https://example.com/a")
+
+
+def test_content_fingerprint_ignores_case_and_whitespace():
+    assert content_fingerprint("Hello   World\n") == content_fingerprint(" hello world")
+    assert content_fingerprint("Hello World") != content_fingerprint("Hello, World")
+
+
+def test_registry_skips_same_page_by_url_or_content():
+    documents = DocumentRegistry()
+
+    assert documents.claim("https://www.example.com/a/", "Page A") == "https://example.com/a"
+    assert documents.claim("https://example.com/a?utm_medium=email", "Page A, new ad") is None
+    assert documents.claim("https://mirror.example.org/a", "page  a") is None
+    assert documents.claim(None, "Page B") == f"content:{content_fingerprint('Page B')}"
+    assert documents.stats()["duplicateUrls"] == 1
+    assert documents.stats()["duplicateContent"] == 1
+    assert documents.stats()["skippedTokens"] > 0
+
+
+def test_sources_keep_the_url_the_search_returned():
+    documents = DocumentRegistry()
+    documents.claim("https://www.Example.com/a/?utm_source=x", "Page A")
+    documents.claim(None, "Page B")
+
+    assert documents.sources() == ["https://www.Example.com/a/?utm_source=x"]
+
+
+def test_released_page_can_be_claimed_again():
+    documents = DocumentRegistry()
+    key = documents.claim("https://example.com/a", "Page A")
+    documents.release(key)
+
+    assert documents.claim("https://example.com/a", "Page A") == key
+    assert documents.stats()["documents"] == 1
+
+
+def test_repeated_learnings_merge_their_sources():
+    documents = DocumentRegistry()
+
+    assert documents.add_learnings(["Fact one", "Fact two"], ["https://a.example"]) == ["Fact one", "Fact two"]
+    assert documents.add_learnings(["fact  ONE", "Fact three"], ["https://b.example"]) == ["Fact three"]
+    assert documents.learning_sources()[0] == {"learning": "Fact one", "urls": ["https://a.example", "https://b.example"]}
@@ -0,0 +1,105 @@
+import types
+import asyncio
+import hashlib
+
+import pytest
+
+import search_cache
+from search_cache import SearchCache, normalize_query, search_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(search_cache, "time", types.SimpleNamespace(time=clock.time))
+    return clock
+
+
+def result(name: str) -> dict:
+    # Hex digests barely compress, so every payload has roughly the same stored size
+    digests = [hashlib.sha256(f"{name}{i}".encode("utf-8")).hexdigest() for i in range(4)]
+    return {"data": [{"url": f"https://example.com/{name}", "markdown": " ".join(digests)}]}
+
+
+def test_key_ignores_formatting_and_timeout():
+    assert normalize_query("  Soft   SKILLS? ") == "soft skills"
+    assert search_key("Soft skills", {"limit": 5, "timeout": 1}) == search_key("soft  skills?", {"limit": 5, "timeout": 9})
+    assert search_key("soft skills", {"limit": 5}) != search_key("soft skills", {"limit": 6})
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = SearchCache(str(tmp_path / "search.sqlite3"), ttl=60, stale_seconds=0)
+    cache.put("k", "query", result("a"))
+
+    clock.now += 60
+    assert cache.get("k") == (result("a"), True)
+    clock.now += 1
+    assert cache.get("k") is None
+    assert cache.stats()["entries"] == 0 and cache.stats()["misses"] == 1
+
+
+def test_stale_entry_is_served_until_stale_window_ends(tmp_path, clock):
+    cache = SearchCache(str(tmp_path / "search.sqlite3"), ttl=60, stale_seconds=30)
+    cache.put("k", "query", result("a"))
+
+    clock.now += 61
+    assert cache.get("k") == (result("a"), False)
+    clock.now += 30
+    assert cache.get("k") is None
+    assert (cache.stats()["staleHits"], cache.stats()["misses"]) == (1, 1)
+
+
+def test_least_recently_used_entry_is_evicted_by_size(tmp_path, clock):
+    cache = SearchCache(str(tmp_path / "search.sqlite3"), ttl=3600)
+    cache.put("a", "a", result("a"))
+    entry_size = cache.stats()["bytes"]
+    cache.max_bytes = int(entry_size * 2.5)
+
+    clock.now += 1
+    cache.put("b", "b", result("b"))
+    clock.now += 1
+    assert cache.get("a")  # a is now more recently used than b
+    clock.now += 1
+    cache.put("c", "c", result("c"))
+
+    assert cache.get("b") is None
+    assert cache.get("a") and cache.get("c")
+    assert cache.stats()["bytes"] <= cache.max_bytes and cache.stats()["evictions"] == 1
+
+
+def test_stale_result_is_returned_and_refreshed_once(client, tmp_path, clock, monkeypatch):
+    import main
+
+    cache = SearchCache(str(tmp_path / "search.sqlite3"), ttl=60, stale_seconds=600)
+    searches = []
+
+    def search(query, options):
+        searches.append(query)
+        return result(f"fresh {len(searches)}")
+
+    monkeypatch.setattr(main, "search_cache", cache)
+    monkeypatch.setattr(main.firecrawl, "search", search)
+    options = {"limit": 5}
+    cache.put(search_key("soft skills", options), "soft skills", result("old"))
+    clock.now += 120
+
+    async def stale_reads():
+        responses = await asyncio.gather(*(main.cached_search("soft skills", options) for _ in range(3)))
+        scheduled = list(main.search_refreshes)
+        await asyncio.gather(*main.search_refreshes.values())
+        return responses, scheduled
+
+    responses, scheduled = asyncio.run(stale_reads())
+    assert responses == [result("old")] * 3
+    assert scheduled == [search_key("soft skills", options)]
+    assert searches == ["soft skills"] and not main.search_refreshes
+    assert asyncio.run(main.cached_search("soft skills", options)) == result("fresh 1")
+    assert searches == ["soft skills"]
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from single_flight import SingleFlight, flight_key
+
+
+def test_flight_key_ignores_input_order():
+    assert flight_key("quiz", {"a": 1, "b": 2}) == flight_key("quiz", {"b": 2, "a": 1})
+    assert flight_key("quiz", {"a": 1}) != flight_key("quiz", {"a": 2})
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"questions": [1, 2, 3]}
+
+    async def callers():
+        return await asyncio.gather(*(flight.run("quiz", {"course": "c1"}, work) for _ in range(5)))
+
+    results = asyncio.run(callers())
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert flight.stats()["functions"]["quiz"] == {"calls": 5, "executed": 1, "coalesced": 4}
+    assert flight.stats()["inFlight"] == 0
+
+
+def test_exception_reaches_every_waiter():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise ValueError("model unavailable")
+
+    async def callers():
+        return await asyncio.gather(*(flight.run("quiz", {}, work) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(callers())
+    assert len(calls) == 1
+    assert all(isinstance(result, ValueError) and str(result) == "model unavailable" for result in results)
+
+
+def test_cancelled_waiter_does_not_cancel_shared_call():
+    flight = SingleFlight()
+    finished = []
+
+    async def work():
+        await asyncio.sleep(0.02)
+        finished.append(1)
+        return "done"
+
+    async def callers():
+        first = asyncio.ensure_future(flight.run("quiz", {}, work))
+        second = asyncio.ensure_future(flight.run("quiz", {}, work))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(callers()) == "done"
+    assert finished == [1]
+
+
+def test_call_is_cancelled_once_every_waiter_is():
+    flight = SingleFlight()
+    finished = []
+
+    async def work():
+        await asyncio.sleep(0.02)
+        finished.append(1)
+
+    async def callers():
+        waiters = [asyncio.ensure_future(flight.run("quiz", {}, work)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0.03)
+        return flight.stats()["inFlight"]
+
+    assert asyncio.run(callers()) == 0
+    assert finished == []
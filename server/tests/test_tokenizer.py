@@ -0,0 +1,82 @@
+import random
+
+import pytest
+import tiktoken
+
+from tokenizer import MIN_WINDOW_CHARS, Tokenizer
+
+# cl100k_base's split pattern with a small local vocabulary, since the real ranks are downloaded
+CL100K_PATTERN = r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?+\p{L}++|\p{N}{1,3}+| ?[^\s\p{L}\p{N}]++[\r\n]*+|\s++$|\s*[\r\n]|\s+(?!\S)|\s"""
+MERGES = [b"th", b"he", b"the", b" t", b" the", b"in", b"ng", b"ing", b"an", b"nd", b"and", b" and", b"er", b"es", b" a"]
+WORDS = ["the", "and", "learning", "self-awareness", "naïve", "résumé", "data", "42", "1999", "it's", "—", "🙂", "\n", "\n\n", "  "]
+
+
+@pytest.fixture(scope="module")
+def encoding():
+    ranks = {bytes([i]): i for i in range(256)}
+    for token in MERGES:
+        ranks[token] = len(ranks)
+    return tiktoken.Encoding("test", pat_str=CL100K_PATTERN, mergeable_ranks=ranks, special_tokens={})
+
+
+@pytest.fixture
+def tokenizer(encoding):
+    tokenizer = Tokenizer(encoding_name="test", cache_size=64, workers=4)
+    tokenizer._encoding = encoding
+    yield tokenizer
+    tokenizer.shutdown()
+
+
+def make_text(seed: int, words: int) -> str:
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def full_trim(encoding, text: str, max_tokens: int) -> str:
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_trim_matches_full_encoding(tokenizer, encoding, seed):
+    text = make_text(seed, random.Random(seed).randint(100, 20_000))
+    for max_tokens in (1, 50, 1000, 5000, 100_000):
+        assert tokenizer.trim(text, max_tokens) == full_trim(encoding, text, max_tokens)
+
+
+def test_trim_encodes_only_a_window_of_long_text(tokenizer, encoding):
+    text = make_text(0, 200_000)
+    trimmed = tokenizer.trim(text, 500)
+
+    assert trimmed == full_trim(encoding, text, 500)
+    assert tokenizer.encoded_chars < MIN_WINDOW_CHARS * 3
+    assert tokenizer.trimmed == 1
+
+
+def test_trim_splits_only_after_non_space(tokenizer, encoding):
+    # Runs of spaces and newlines would encode differently if a window ended inside them
+    text = ("word" + " " * 7 + "\n \n" + "x ") * 5000
+    for max_tokens in (100, 3000, 20_000):
+        assert tokenizer.trim(text, max_tokens) == full_trim(encoding, text, max_tokens)
+
+
+def test_short_text_is_returned_unchanged_and_counted_once(tokenizer, encoding):
+    text = make_text(1, 50)
+
+    assert tokenizer.trim(text, 10_000) is text
+    assert tokenizer.count(text) == len(encoding.encode(text))
+    assert tokenizer.trim(text, 10_000) is text
+    assert (tokenizer.misses, tokenizer.hits) == (1, 2)
+
+
+def test_count_cache_is_bounded(tokenizer):
+    for i in range(100):
+        tokenizer.count(f"text {i}")
+
+    assert tokenizer.stats()["cachedCounts"] == 64
+
+
+def test_trim_many_matches_trim(tokenizer, encoding):
+    texts = [make_text(seed, 3000) for seed in range(8)]
+
+    assert tokenizer.trim_many(texts, 800) == [full_trim(encoding, text, 800) for text in texts]
@@ -0,0 +1,63 @@
+import os
+import hashlib
+
+import pytest
+
+from upload_store import UploadStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return UploadStore(str(tmp_path / "uploads"))
+
+
+def add(store: UploadStore, data: bytes, filename: str = "video.mp4"):
+    tmp_path = store.incoming_path()
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    return store.add_file(tmp_path, hashlib.sha256(data).hexdigest(), len(data), filename, "video/mp4")
+
+
+def test_identical_uploads_share_one_blob(store):
+    first = add(store, b"same bytes")
+    second = add(store, b"same bytes", "copy.mp4")
+
+    assert first["path"] == second["path"] and second["deduplicated"]
+    assert store.total_bytes() == len(b"same bytes")
+    assert not store.release(first["id"])
+    assert os.path.exists(second["path"])
+    assert store.release(second["id"])
+    assert not os.path.exists(second["path"])
+
+
+def test_digest_for_path_only_recognises_blobs(store):
+    upload = add(store, b"video")
+    session_dir = os.path.join(store.upload_dir, ".sessions")
+    os.makedirs(session_dir)
+    session_file = os.path.join(session_dir, "0" * 64)
+    open(session_file, "wb").close()
+
+    assert store.digest_for_path(upload["path"]) == upload["digest"]
+    for path in (os.path.join(store.upload_dir, "index.sqlite3"), store.incoming_path(), session_file,
+                 os.path.join(store.blob_dir, "00", upload["digest"])):
+        assert store.digest_for_path(path) is None
+
+
+def test_digest_for_path_resolves_symlinks(store, tmp_path):
+    upload = add(store, b"video")
+    link = os.path.join(store.blob_dir, upload["digest"][:2], "f" * 64)
+    os.symlink(os.path.join(store.upload_dir, "index.sqlite3"), link)
+
+    assert store.digest_for_path(link) is None
+
+
+def test_resolve_accepts_upload_ids_and_blob_paths_only(store, tmp_path):
+    upload = add(store, b"video")
+    outside = tmp_path / "outside.mp4"
+    outside.write_bytes(b"video")
+
+    assert store.resolve(upload["id"]) == upload["path"]
+    assert store.resolve(upload["path"]) == os.path.realpath(upload["path"])
+    for path in (os.path.join(store.upload_dir, "index.sqlite3"), str(outside),
+                 os.path.join(store.blob_dir, "..", "index.sqlite3"), "missing-id"):
+        assert store.resolve(path) is None
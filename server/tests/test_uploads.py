@@ -0,0 +1,117 @@
+import os
+import asyncio
+
+import pytest
+
+from upload_store import UploadStore
+from uploads import ResumableUploads, UploadError
+
+
+@pytest.fixture
+def uploads(tmp_path):
+    upload_dir = str(tmp_path / "uploads")
+    return ResumableUploads(upload_dir, UploadStore(upload_dir))
+
+
+async def body(*chunks: bytes, delay: float = 0.0):
+    for chunk in chunks:
+        await asyncio.sleep(delay)
+        yield chunk
+
+
+def upload_whole(uploads: ResumableUploads, data: bytes, filename: str = "video.mp4"):
+    upload_id = uploads.create(filename, len(data), "video/mp4")["uploadId"]
+
+    async def send():
+        await uploads.write_chunk(upload_id, 0, body(data[:3], data[3:]))
+        return await uploads.finalize(upload_id)
+
+    return asyncio.run(send())
+
+
+def test_patch_at_wrong_offset_is_rejected(uploads):
+    upload_id = uploads.create("video.mp4", 10, "video/mp4")["uploadId"]
+    assert asyncio.run(uploads.write_chunk(upload_id, 0, body(b"abcd"))) == 4
+
+    for offset in (0, 2, 8):
+        with pytest.raises(UploadError) as error:
+            asyncio.run(uploads.write_chunk(upload_id, offset, body(b"xx")))
+        assert error.value.status_code == 409
+    assert uploads.status(upload_id)["offset"] == 4
+
+
+def test_chunk_beyond_declared_size_is_dropped(uploads):
+    upload_id = uploads.create("video.mp4", 5, "video/mp4")["uploadId"]
+    asyncio.run(uploads.write_chunk(upload_id, 0, body(b"abc")))
+
+    with pytest.raises(UploadError) as error:
+        asyncio.run(uploads.write_chunk(upload_id, 3, body(b"de", b"f")))
+    assert error.value.status_code == 413
+    assert uploads.offset(upload_id) == 3
+
+
+def test_concurrent_patch_at_same_offset_gets_409(uploads):
+    upload_id = uploads.create("video.mp4", 20, "video/mp4")["uploadId"]
+
+    async def patch():
+        try:
+            return await uploads.write_chunk(upload_id, 0, body(b"x" * 5, b"x" * 5, delay=0.01))
+        except UploadError as e:
+            return e.status_code
+
+    async def both():
+        return await asyncio.gather(patch(), patch())
+
+    assert sorted(asyncio.run(both())) == [10, 409]
+    assert uploads.offset(upload_id) == 10
+
+
+def test_finalize_requires_complete_upload(uploads):
+    upload_id = uploads.create("video.mp4", 10, "video/mp4")["uploadId"]
+    asyncio.run(uploads.write_chunk(upload_id, 0, body(b"abc")))
+
+    with pytest.raises(UploadError) as error:
+        asyncio.run(uploads.finalize(upload_id))
+    assert error.value.status_code == 409
+
+
+def test_patch_during_finalize_gets_409(uploads):
+    upload_id = uploads.create("video.mp4", 4, "video/mp4")["uploadId"]
+    asyncio.run(uploads.write_chunk(upload_id, 0, body(b"abcd")))
+
+    async def finalize_and_abort():
+        finalize = asyncio.create_task(uploads.finalize(upload_id))
+        await asyncio.sleep(0)
+        with pytest.raises(UploadError) as error:
+            uploads.abort(upload_id)
+        return await finalize, error.value.status_code
+
+    file_info, status_code = asyncio.run(finalize_and_abort())
+    assert status_code == 409
+    assert os.path.exists(file_info["path"])
+
+
+def test_finalize_deduplicates_into_store(uploads):
+    first = upload_whole(uploads, b"same video bytes")
+    second = upload_whole(uploads, b"same video bytes", "copy.mp4")
+
+    assert second["deduplicated"] and second["path"] == first["path"]
+    assert second["id"] != first["id"] and second["name"] == "copy.mp4"
+    assert uploads.store.total_bytes() == len(b"same video bytes")
+    assert os.listdir(uploads.session_dir) == []
+
+
+def test_head_reports_resume_offset(client):
+    created = client.post("/api/uploads", json={"filename": "video.mp4", "size": 6, "contentType": "video/mp4"})
+    upload_id = created.json()["uploadId"]
+    patched = client.patch(f"/api/uploads/{upload_id}", content=b"abcd", headers={"Upload-Offset": "0"})
+
+    head = client.head(f"/api/uploads/{upload_id}")
+    assert (head.headers["Upload-Offset"], head.headers["Upload-Length"]) == ("4", "6")
+    assert patched.headers["Upload-Offset"] == "4"
+
+    stale = client.patch(f"/api/uploads/{upload_id}", content=b"ab", headers={"Upload-Offset": "2"})
+    assert stale.status_code == 409
+    resumed = client.patch(f"/api/uploads/{upload_id}", content=b"ef", headers={"Upload-Offset": head.headers["Upload-Offset"]})
+    assert resumed.json()["offset"] == 6
+    assert client.post(f"/api/uploads/{upload_id}/finalize").json()["file"]["size"] == 6
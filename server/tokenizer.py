@@ -0,0 +1,151 @@
+import os
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, List, Sequence
+
+import tiktoken
+
+TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "cl100k_base")
+TOKENIZER_CACHE_SIZE = int(os.getenv("TOKENIZER_CACHE_SIZE", "8192"))
+TOKENIZER_WORKERS = int(os.getenv("TOKENIZER_WORKERS", str(min(8, os.cpu_count() or 1))))
+# Characters encoded per token still needed when trimming; English text averages about 4
+CHARS_PER_TOKEN_ESTIMATE = 4
+MIN_WINDOW_CHARS = 4096
+# A space after a non-space: every tiktoken pattern starts a new piece there
+SAFE_SPLIT = re.compile(r"(?<=\S) ")
+
+
+def content_hash(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+class Tokenizer:
+    """Shared tiktoken encoder with cached token counts and cheap trimming.
+
+    The encoding is loaded once, by preload() at startup or on first use
+    (tiktoken may download it, so this can take seconds). Token counts are
+    kept in an LRU keyed by a hash of the text, so a page or prompt that
+    comes back is not encoded again. trim() encodes long texts in windows that end at a
+    space following a non-space, where every tiktoken pattern starts a new
+    piece, so the windows' tokens add up to exactly the full encoding. Each
+    window is sized from the tokens still needed, so a 2 MB page trimmed to
+    25,000 tokens costs about 100 KB of encoding instead of 2 MB.
+    trim_many() spreads texts over a thread pool, since tiktoken releases
+    the GIL while encoding.
+    """
+
+    def __init__(self, encoding_name: str = TOKENIZER_ENCODING, cache_size: int = TOKENIZER_CACHE_SIZE,
+                 workers: int = TOKENIZER_WORKERS):
+        self.encoding_name = encoding_name
+        self.cache_size = cache_size
+        self.workers = workers
+        self._encoding: Optional[tiktoken.Encoding] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._counts: "OrderedDict[bytes, int]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.trimmed = 0
+        self.encoded_chars = 0
+
+    @property
+    def encoding(self) -> tiktoken.Encoding:
+        if self._encoding is None:
+            with self._lock:
+                if self._encoding is None:
+                    self._encoding = tiktoken.get_encoding(self.encoding_name)
+        return self._encoding
+
+    def preload(self) -> None:
+        """Loads the encoding now, so no request pays for it."""
+        self.encoding
+
+    def _cached_count(self, key: bytes) -> Optional[int]:
+        with self._lock:
+            count = self._counts.get(key)
+            if count is None:
+                self.misses += 1
+                return None
+            self._counts.move_to_end(key)
+            self.hits += 1
+            return count
+
+    def _store_count(self, key: bytes, count: int) -> None:
+        with self._lock:
+            self._counts[key] = count
+            self._counts.move_to_end(key)
+            while len(self._counts) > self.cache_size:
+                self._counts.popitem(last=False)
+
+    def _encode(self, text: str) -> List[int]:
+        tokens = self.encoding.encode(text, disallowed_special=())
+        with self._lock:
+            self.encoded_chars += len(text)
+        return tokens
+
+    def count(self, text: str) -> int:
+        key = content_hash(text)
+        count = self._cached_count(key)
+        if count is None:
+            count = len(self._encode(text))
+            self._store_count(key, count)
+        return count
+
+    def _window_end(self, text: str, start: int, chars: int) -> int:
+        """End of a window of about chars characters from start, at a safe split point."""
+        target = start + max(chars, MIN_WINDOW_CHARS)
+        if target >= len(text):
+            return len(text)
+        split = SAFE_SPLIT.search(text, target)
+        return split.start() if split else len(text)
+
+    def trim(self, text: str, max_tokens: int) -> str:
+        """The longest prefix of text that encodes to at most max_tokens tokens."""
+        key = content_hash(text)
+        count = self._cached_count(key)
+        if count is not None and count <= max_tokens:
+            return text
+
+        tokens: List[int] = []
+        start = 0
+        while start < len(text) and len(tokens) <= max_tokens:
+            end = self._window_end(text, start, (max_tokens + 1 - len(tokens)) * CHARS_PER_TOKEN_ESTIMATE)
+            tokens += self._encode(text[start:end])
+            start = end
+        if start >= len(text):
+            self._store_count(key, len(tokens))
+        if len(tokens) <= max_tokens:
+            return text
+        with self._lock:
+            self.trimmed += 1
+        return self.encoding.decode(tokens[:max_tokens])
+
+    def trim_many(self, texts: Sequence[str], max_tokens: int) -> List[str]:
+        """trim() for several texts at once, in parallel threads."""
+        if len(texts) <= 1 or self.workers <= 1:
+            return [self.trim(text, max_tokens) for text in texts]
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="tokenizer")
+        return list(self._executor.map(lambda text: self.trim(text, max_tokens), texts))
+
+    def shutdown(self) -> None:
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "encoding": self.encoding_name,
+            "cachedCounts": len(self._counts),
+            "cacheSize": self.cache_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": self.hits / lookups if lookups else 0.0,
+            "trimmed": self.trimmed,
+            "encodedChars": self.encoded_chars
+        }
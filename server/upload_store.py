@@ -0,0 +1,187 @@
+import os
+import re
+import time
+import uuid
+import sqlite3
+import hashlib
+import threading
+from typing import Optional, Dict, List, Tuple
+
+HASH_CHUNK_SIZE = 1024 * 1024
+SHA256_HEX = re.compile(r"[0-9a-f]{64}")
+
+
+def sha256_file(path: str) -> str:
+    """Hashes a file in fixed-size chunks without loading it into memory."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class UploadStore:
+    """Content-addressed blob store with a SQLite index of uploads.
+
+    Blobs live at ``<upload_dir>/blobs/<aa>/<sha256>`` and are stored once no
+    matter how many uploads reference them. Every upload gets its own ID that
+    maps to a digest; the blob is removed when its reference count drops to 0.
+    """
+
+    def __init__(self, upload_dir: str):
+        self.upload_dir = upload_dir
+        self.blob_dir = os.path.join(upload_dir, "blobs")
+        self.incoming_dir = os.path.join(upload_dir, ".incoming")
+        self.index_path = os.path.join(upload_dir, "index.sqlite3")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.incoming_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.index_path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                digest TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                refcount INTEGER NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS uploads (
+                id TEXT PRIMARY KEY,
+                digest TEXT NOT NULL REFERENCES blobs(digest),
+                filename TEXT NOT NULL,
+                content_type TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS uploads_digest ON uploads(digest);
+        """)
+        self._db.commit()
+
+    def incoming_path(self) -> str:
+        """Returns a fresh temporary path to stream new data into."""
+        return os.path.join(self.incoming_dir, f"{uuid.uuid4().hex}.part")
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def add_file(self, tmp_path: str, digest: str, size: int, filename: str, content_type: str) -> Dict:
+        """Moves tmp_path into the store (or drops it if the blob exists) and records an upload."""
+        blob_path = self.blob_path(digest)
+        upload_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT refcount FROM blobs WHERE digest = ?", (digest,)).fetchone()
+            deduplicated = bool(row) and os.path.exists(blob_path)
+            if deduplicated:
+                os.remove(tmp_path)
+                self._db.execute("UPDATE blobs SET refcount = refcount + 1 WHERE digest = ?", (digest,))
+            else:
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                os.replace(tmp_path, blob_path)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO blobs (digest, size, refcount, created_at) VALUES (?, ?, ?, ?)",
+                    (digest, size, (row["refcount"] if row else 0) + 1, now)
+                )
+            self._db.execute(
+                "INSERT INTO uploads (id, digest, filename, content_type, created_at) VALUES (?, ?, ?, ?, ?)",
+                (upload_id, digest, filename, content_type, now)
+            )
+            self._db.commit()
+        return {
+            "id": upload_id,
+            "name": filename,
+            "size": size,
+            "digest": digest,
+            "path": blob_path,
+            "deduplicated": deduplicated
+        }
+
+    def get(self, upload_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT u.id, u.digest, u.filename, u.content_type, u.created_at, b.size "
+                "FROM uploads u JOIN blobs b ON b.digest = u.digest WHERE u.id = ?",
+                (upload_id,)
+            ).fetchone()
+        if not row:
+            return None
+        return {
+            "id": row["id"],
+            "name": row["filename"],
+            "size": row["size"],
+            "digest": row["digest"],
+            "contentType": row["content_type"],
+            "createdAt": row["created_at"],
+            "path": self.blob_path(row["digest"])
+        }
+
+    def digest_for_path(self, path: str) -> Optional[str]:
+        """Returns the digest if path, with symlinks resolved, points at a blob inside this store.
+
+        Anything else in the upload directory (the index, sessions, partial
+        files) is not a blob and returns None.
+        """
+        path = os.path.realpath(path)
+        digest = os.path.basename(path)
+        if not SHA256_HEX.fullmatch(digest) or path != os.path.realpath(self.blob_path(digest)):
+            return None
+        return digest
+
+    def resolve(self, upload_id_or_path: str) -> Optional[str]:
+        """Maps an upload ID, or the path of a stored blob, to an on-disk path.
+
+        Anything else resolves to None, including the store's own index,
+        session and partial files and existing files elsewhere on the server.
+        """
+        record = self.get(upload_id_or_path)
+        if record:
+            return record["path"]
+        if self.digest_for_path(upload_id_or_path) and os.path.isfile(upload_id_or_path):
+            return os.path.realpath(upload_id_or_path)
+        return None
+
+    def release(self, upload_id: str) -> bool:
+        """Drops one upload reference. Returns True if the blob itself was deleted."""
+        with self._lock:
+            row = self._db.execute("SELECT digest FROM uploads WHERE id = ?", (upload_id,)).fetchone()
+            if not row:
+                raise KeyError(upload_id)
+            digest = row["digest"]
+            self._db.execute("DELETE FROM uploads WHERE id = ?", (upload_id,))
+            self._db.execute("UPDATE blobs SET refcount = refcount - 1 WHERE digest = ?", (digest,))
+            refcount = self._db.execute("SELECT refcount FROM blobs WHERE digest = ?", (digest,)).fetchone()["refcount"]
+            removed = refcount <= 0
+            if removed:
+                self._db.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+                blob_path = self.blob_path(digest)
+                if os.path.exists(blob_path):
+                    os.remove(blob_path)
+            self._db.commit()
+        return removed
+
+    def release_path(self, path: str) -> bool:
+        """Drops the most recent upload that references the blob at path."""
+        digest = self.digest_for_path(path)
+        if digest is None:
+            raise KeyError(path)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id FROM uploads WHERE digest = ? ORDER BY created_at DESC LIMIT 1", (digest,)
+            ).fetchone()
+        if not row:
+            raise KeyError(path)
+        return self.release(row["id"])
+
+    def list_uploads(self) -> List[Tuple[float, str]]:
+        """Returns (created_at, upload_id) for every upload in the index."""
+        with self._lock:
+            rows = self._db.execute("SELECT created_at, id FROM uploads").fetchall()
+        return [(row["created_at"], row["id"]) for row in rows]
+
+    def total_bytes(self) -> int:
+        """Returns the bytes used by stored blobs (each blob counted once)."""
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
@@ -0,0 +1,198 @@
+import os
+import json
+import asyncio
+import uuid
+import time
+import hashlib
+from typing import Optional, Dict, Set, AsyncIterator
+
+from fastapi import UploadFile
+
+from upload_store import UploadStore, sha256_file
+
+# Size of each chunk read from the client and written to disk. Peak memory per
+# upload is bounded by this value regardless of the total file size.
+CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
+# Hard limit on a single upload (matches the 2GB File API maximum)
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", str(2 * 1024 * 1024 * 1024)))
+
+
+class UploadError(Exception):
+    """Raised when an upload cannot be accepted. Carries an HTTP status code."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def safe_filename(filename: Optional[str]) -> str:
+    """Strip any directory components from a client supplied filename."""
+    name = os.path.basename((filename or "").replace("\\", "/")).strip()
+    return name or "upload.mp4"
+
+
+async def stream_upload_to_store(video: UploadFile, store: UploadStore) -> Dict:
+    """Copies an UploadFile into the store in CHUNK_SIZE pieces, hashing as it goes."""
+    tmp_path = store.incoming_path()
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp_path, "wb") as buffer:
+            while True:
+                chunk = await video.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_UPLOAD_SIZE:
+                    raise UploadError(413, "File size too large. Maximum size is 2GB.")
+                digest.update(chunk)
+                buffer.write(chunk)
+        return store.add_file(tmp_path, digest.hexdigest(), size, safe_filename(video.filename), video.content_type)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class ResumableUploads:
+    """Init / PATCH-at-offset / finalize uploads persisted under UPLOAD_DIR.
+
+    Each session keeps a JSON sidecar with its metadata and a partial data file.
+    The current offset is always the size of the partial file on disk, so a
+    session survives server restarts and dropped client connections. Only one
+    request may use a session at a time: a PATCH, finalize or abort that
+    arrives while a chunk is written or the upload is being finalized gets
+    409.
+    """
+
+    def __init__(self, upload_dir: str, store: UploadStore):
+        self.store = store
+        self._writing: Set[str] = set()  # Sessions with a chunk being written
+        self.session_dir = os.path.join(upload_dir, ".sessions")
+        os.makedirs(self.session_dir, exist_ok=True)
+
+    def _meta_path(self, upload_id: str) -> str:
+        return os.path.join(self.session_dir, f"{upload_id}.json")
+
+    def _data_path(self, upload_id: str) -> str:
+        return os.path.join(self.session_dir, f"{upload_id}.part")
+
+    def _check_id(self, upload_id: str) -> None:
+        try:
+            uuid.UUID(hex=upload_id)
+        except ValueError:
+            raise UploadError(404, "Upload session not found")
+
+    def _check_idle(self, upload_id: str) -> None:
+        if upload_id in self._writing:
+            raise UploadError(409, "Another request is writing to this upload")
+
+    def create(self, filename: str, size: int, content_type: str) -> Dict:
+        if not content_type.startswith("video/"):
+            raise UploadError(400, "Only video files are allowed")
+        if size <= 0 or size > MAX_UPLOAD_SIZE:
+            raise UploadError(413, "File size too large. Maximum size is 2GB.")
+
+        upload_id = uuid.uuid4().hex
+        meta = {
+            "id": upload_id,
+            "filename": safe_filename(filename),
+            "size": size,
+            "contentType": content_type,
+            "createdAt": time.time(),
+        }
+        with open(self._meta_path(upload_id), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        open(self._data_path(upload_id), "wb").close()
+        return self.status(upload_id)
+
+    def get(self, upload_id: str) -> Dict:
+        self._check_id(upload_id)
+        try:
+            with open(self._meta_path(upload_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise UploadError(404, "Upload session not found")
+
+    def offset(self, upload_id: str) -> int:
+        try:
+            return os.path.getsize(self._data_path(upload_id))
+        except FileNotFoundError:
+            raise UploadError(404, "Upload session not found")
+
+    def status(self, upload_id: str) -> Dict:
+        meta = self.get(upload_id)
+        return {
+            "uploadId": upload_id,
+            "name": meta["filename"],
+            "size": meta["size"],
+            "offset": self.offset(upload_id),
+            "chunkSize": CHUNK_SIZE,
+        }
+
+    async def write_chunk(self, upload_id: str, offset: int, stream: AsyncIterator[bytes]) -> int:
+        """Appends the request body at offset and returns the new offset.
+
+        The client must send the offset it believes the server has; a mismatch
+        returns 409 so the client can query the real offset and resume from it.
+        """
+        meta = self.get(upload_id)
+        # Checked and marked with no await in between, so two PATCHes cannot both pass
+        self._check_idle(upload_id)
+        current = self.offset(upload_id)
+        if offset != current:
+            raise UploadError(409, f"Offset mismatch: server has {current} bytes")
+
+        self._writing.add(upload_id)
+        written = current
+        try:
+            with open(self._data_path(upload_id), "ab") as f:
+                try:
+                    async for chunk in stream:
+                        if not chunk:
+                            continue
+                        written += len(chunk)
+                        if written > meta["size"]:
+                            raise UploadError(413, "Chunk exceeds declared upload size")
+                        f.write(chunk)
+                except UploadError:
+                    # Drop the bytes of the rejected chunk so the offset stays consistent
+                    f.truncate(current)
+                    raise
+        finally:
+            self._writing.discard(upload_id)
+        return written
+
+    async def finalize(self, upload_id: str) -> Dict:
+        """Hashes a complete session, moves it into the store and returns the file info.
+
+        Chunks may arrive across several requests and restarts, so the digest is
+        computed here with a single streaming pass over the assembled file, in
+        a worker thread since a file can be 2GB.
+        """
+        meta = self.get(upload_id)
+        self._check_idle(upload_id)
+        current = self.offset(upload_id)
+        if current != meta["size"]:
+            raise UploadError(409, f"Upload incomplete: {current} of {meta['size']} bytes received")
+
+        self._writing.add(upload_id)
+        try:
+            data_path = self._data_path(upload_id)
+            digest = await asyncio.to_thread(sha256_file, data_path)
+            file_info = await asyncio.to_thread(
+                self.store.add_file, data_path, digest, current, meta["filename"], meta["contentType"]
+            )
+            os.remove(self._meta_path(upload_id))
+        finally:
+            self._writing.discard(upload_id)
+        return file_info
+
+    def abort(self, upload_id: str) -> None:
+        self.get(upload_id)
+        self._check_idle(upload_id)
+        for path in (self._data_path(upload_id), self._meta_path(upload_id)):
+            if os.path.exists(path):
+                os.remove(path)
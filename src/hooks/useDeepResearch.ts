@@ -1,4 +1,4 @@
-import { useState } from 'react';
+import { useEffect, useRef, useState } from 'react';
 
 interface ResearchProgress {
   currentDepth: number;
@@ -30,6 +30,24 @@ interface ResearchResponse {
   };
 }
 
+type ResearchEvent =
+  | { event: 'followUpQuestions'; followUpQuestions: string[] }
+  | { event: 'progress'; progress: ResearchProgress }
+  | { event: 'learning'; learning: string; query: string }
+  | { event: 'url'; url: string; query: string }
+  | ({ event: 'report' } & Partial<ResearchResponse>)
+  | { event: 'error'; detail: string };
+
+// Parses one server-sent event block; keep-alive comments yield null
+const parseEvent = (block: string): ResearchEvent | null => {
+  const data = block
+    .split('\n')
+    .filter((line) => line.startsWith('data:'))
+    .map((line) => line.slice(5).trim())
+    .join('\n');
+  return data ? JSON.parse(data) : null;
+};
+
 export const useDeepResearch = () => {
   const [report, setReport] = useState<string | null>(null);
   const [learnings, setLearnings] = useState<string[]>([]);
@@ -38,8 +56,41 @@ export const useDeepResearch = () => {
   const [progress, setProgress] = useState<ResearchProgress | null>(null);
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
+  const controllerRef = useRef<AbortController | null>(null);
+
+  // Closing the stream makes the server cancel the remaining research
+  useEffect(() => () => controllerRef.current?.abort(), []);
+
+  const handleEvent = (event: ResearchEvent) => {
+    switch (event.event) {
+      case 'followUpQuestions':
+        setFollowUpQuestions(event.followUpQuestions);
+        break;
+      case 'progress':
+        setProgress(event.progress);
+        break;
+      case 'learning':
+        setLearnings((current) => [...current, event.learning]);
+        break;
+      case 'url':
+        setVisitedUrls((current) => [...current, event.url]);
+        break;
+      case 'report':
+        if (event.report !== undefined) setReport(event.report);
+        if (event.learnings) setLearnings(event.learnings);
+        if (event.visitedUrls) setVisitedUrls(event.visitedUrls);
+        if (event.followUpQuestions) setFollowUpQuestions(event.followUpQuestions);
+        break;
+      case 'error':
+        throw new Error(event.detail);
+    }
+  };
 
   const startResearch = async (request: ResearchRequest) => {
+    controllerRef.current?.abort();
+    const controller = new AbortController();
+    controllerRef.current = controller;
+
     setIsLoading(true);
     setError(null);
     setReport(null);
@@ -49,39 +100,52 @@ export const useDeepResearch = () => {
     setProgress(null);
 
     try {
-      const response = await fetch('/api/deep-research', {
+      const response = await fetch('/api/deep-research/stream', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
         },
         body: JSON.stringify(request),
+        signal: controller.signal,
       });
 
-      if (!response.ok) {
+      if (!response.ok || !response.body) {
         throw new Error(`Research failed: ${response.statusText}`);
       }
 
-      const data: ResearchResponse = await response.json();
-
-      // Update state with research results
-      setReport(data.report);
-      setLearnings(data.learnings);
-      setFollowUpQuestions(data.followUpQuestions);
-      setVisitedUrls(data.visitedUrls);
-
-      // Set the last progress update as the current progress
-      if (data.progress && data.progress.length > 0) {
-        setProgress(data.progress[data.progress.length - 1]);
+      // Apply each event as it arrives instead of waiting for the whole report
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      for (;;) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const blocks = buffer.split('\n\n');
+        buffer = blocks.pop() ?? '';
+        for (const block of blocks) {
+          const event = parseEvent(block);
+          if (event) handleEvent(event);
+        }
       }
     } catch (err) {
+      if (controller.signal.aborted) return;
       setError(err instanceof Error ? err.message : 'An error occurred during research');
     } finally {
-      setIsLoading(false);
+      if (controllerRef.current === controller) {
+        controllerRef.current = null;
+        setIsLoading(false);
+      }
     }
   };
 
+  const cancelResearch = () => {
+    controllerRef.current?.abort();
+  };
+
   return {
     startResearch,
+    cancelResearch,
     report,
     learnings,
     followUpQuestions,